@@ -0,0 +1,273 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Month-partitioned columnar copy of a wide AMI CSV (start_date_time + one column per meter, as written by
+# parse_ami_data and calculate_true_load), so that reading a week of a few meters doesn't parse the whole
+# year of every meter. Per month <YYYY-MM>_times.npy holds the sorted times (int64 ns, on the clock of the
+# CSV, i.e. UTC) and <YYYY-MM>_values.npy the readings, one row per meter. Reads only open the months that
+# overlap the time range, memory-mapped, and slice the rows of the selected meters and the columns of the
+# time range. Only numpy is needed (no Parquet library). The store sits next to the CSV in
+# <csv name>_Store/ and is rebuilt when the CSV changes.
+
+AMI_STORE_FORMAT_VERSION = 1
+META_FILE_NAME = "store_meta.json"
+
+def ami_store_dir(csv_file):
+    return f"{os.path.splitext(csv_file)[0]}_Store"
+
+def source_stamp(csv_file):
+    stat = os.stat(csv_file)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def timestamp_ns(time):
+    # naive times are on the clock of the CSV (UTC), aware times are converted to it, integers are ns already
+    if isinstance(time, (int, np.integer)):
+        return int(time)
+    time = pd.Timestamp(time)
+    if time.tzinfo is not None:
+        time = time.tz_convert("UTC").tz_localize(None)
+    return time.value
+
+def temp_path(path):
+    # name to build a file under before os.replace moves it to path. Readers may have the old file
+    # memory-mapped: replacing it keeps their pages, rewriting it in place would truncate them (SIGBUS).
+    return f"{path}.{os.getpid()}.tmp"
+
+def save_npy(path, array):
+    with open(temp_path(path), 'wb') as file:
+        np.save(file, array)
+    os.replace(temp_path(path), path)
+
+def save_json(path, data):
+    with open(temp_path(path), 'w') as file:
+        json.dump(data, file)
+    os.replace(temp_path(path), path)
+
+def write_ami_store(csv_file, store_dir=None, chunk_rows=744):
+    # Stream the CSV chunk_rows rows at a time, writing each month once all its rows have been read. The
+    # CSV must be sorted by time (up to the order within a month). The unnamed index column written by
+    # to_csv(index=True) is dropped.
+    store_dir = ami_store_dir(csv_file) if store_dir is None else store_dir
+    header = pd.read_csv(csv_file, nrows=0).columns.tolist()
+    meters = [column for column in header if column != "start_date_time" and not column.startswith("Unnamed")]
+
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+    # remove the metadata first so a half-written store is never read
+    meta_file = os.path.join(store_dir, META_FILE_NAME)
+    if os.path.isfile(meta_file):
+        os.remove(meta_file)
+
+    pending = {} # month -> ([times], [values (n_meters,n)])
+    months = []
+
+    def flush(month):
+        times = np.concatenate(pending[month][0])
+        values = np.concatenate(pending[month][1], axis=1)
+        order = np.argsort(times, kind="stable")
+        save_npy(os.path.join(store_dir, f"{month}_times.npy"), times[order])
+        save_npy(os.path.join(store_dir, f"{month}_values.npy"), np.ascontiguousarray(values[:,order]))
+        months.append({"month": month, "start": int(times[order[0]]), "end": int(times[order[-1]]), "rows": len(times)})
+        del pending[month]
+
+    reader = pd.read_csv(csv_file, usecols=["start_date_time"] + meters, dtype=dict.fromkeys(meters, np.float64), chunksize=chunk_rows)
+    for chunk in reader:
+        times = pd.to_datetime(chunk["start_date_time"], utc=True).dt.tz_localize(None).to_numpy("datetime64[ns]")
+        values = chunk[meters].to_numpy(dtype=np.float64).T
+        chunk_months = times.astype("datetime64[M]").astype(str)
+        for month in np.unique(chunk_months).tolist():
+            if any(written["month"] == month for written in months):
+                raise ValueError(f"{csv_file} is not sorted by start_date_time ({month} appears again after later months).")
+            rows = chunk_months == month
+            times_list, values_list = pending.setdefault(month, ([], []))
+            times_list.append(times[rows].astype(np.int64))
+            values_list.append(values[:,rows])
+        # months before the last one of the chunk are complete
+        for month in sorted(pending):
+            if month < chunk_months[-1]:
+                flush(month)
+    for month in sorted(pending):
+        flush(month)
+
+    meta = {
+        "format_version": AMI_STORE_FORMAT_VERSION,
+        "source": source_stamp(csv_file),
+        "meters": meters,
+        "months": months,
+    }
+    save_json(meta_file, meta)
+    return store_dir
+
+class AMIStore:
+    def __init__(self, store_dir, mmap_mode="r"):
+        meta_file = os.path.join(store_dir, META_FILE_NAME)
+        if not os.path.isfile(meta_file):
+            raise ValueError(f"No AMI store found in {store_dir}")
+        with open(meta_file, 'r') as file:
+            meta = json.load(file)
+        if meta["format_version"] != AMI_STORE_FORMAT_VERSION:
+            raise ValueError(f"AMI store format {meta['format_version']} in {store_dir} is not supported (expected {AMI_STORE_FORMAT_VERSION}). Rebuild the store.")
+
+        self.store_dir = store_dir
+        self.mmap_mode = mmap_mode
+        self.source = meta["source"]
+        self.meters = meta["meters"]
+        self.meter_rows = {meter: row for row, meter in enumerate(self.meters)}
+        self.months = meta["months"]
+
+    def is_current(self, csv_file):
+        return not os.path.isfile(csv_file) or source_stamp(csv_file) == self.source
+
+    def month_times(self, month):
+        return np.load(os.path.join(self.store_dir, f"{month}_times.npy"), mmap_mode=self.mmap_mode)
+
+    def month_values(self, month):
+        return np.load(os.path.join(self.store_dir, f"{month}_values.npy"), mmap_mode=self.mmap_mode)
+
+    def read(self, start=None, end=None, meters=None, utc=True):
+        # DataFrame of start_date_time and the readings of the meters (default: all, in the store order;
+        # meters not in the store are left out) from start to end inclusive (default: the whole store).
+        # start_date_time is tz-aware UTC like pd.to_datetime(..., utc=True) unless utc=False, which keeps
+        # the naive times of the CSV.
+        start_ns = np.iinfo(np.int64).min if start is None else timestamp_ns(start)
+        end_ns = np.iinfo(np.int64).max if end is None else timestamp_ns(end)
+        if meters is None:
+            names = self.meters
+            rows = slice(None)
+        else:
+            names = [meter for meter in meters if meter in self.meter_rows]
+            rows = np.array([self.meter_rows[meter] for meter in names], dtype=np.int64)
+
+        times_list = []
+        values_list = []
+        for month in self.months:
+            if month["end"] < start_ns or month["start"] > end_ns:
+                continue
+            times = self.month_times(month["month"])
+            low = np.searchsorted(times, start_ns, side="left")
+            high = np.searchsorted(times, end_ns, side="right")
+            if high <= low:
+                continue
+            times_list.append(np.array(times[low:high]))
+            values_list.append(np.array(self.month_values(month["month"])[rows,low:high]))
+
+        if times_list:
+            times = np.concatenate(times_list)
+            values = np.concatenate(values_list, axis=1)
+        else:
+            times = np.zeros(0, dtype=np.int64)
+            values = np.zeros((len(names),0))
+        times = pd.DatetimeIndex(times.astype("datetime64[ns]"))
+        data = pd.DataFrame(values.T, columns=names)
+        data.insert(0, "start_date_time", times.tz_localize("UTC") if utc else times)
+        return data
+
+def open_ami_store(csv_file, chunk_rows=744):
+    # Store of an AMI CSV, built (or rebuilt) first if it is missing or older than the CSV
+    store_dir = ami_store_dir(csv_file)
+    try:
+        store = AMIStore(store_dir)
+        if store.is_current(csv_file):
+            return store
+    except ValueError:
+        pass # no store yet, or an older format
+    write_ami_store(csv_file, store_dir, chunk_rows)
+    return AMIStore(store_dir)
+
+# Dense float32 (time x meter) matrix of a store, memory-mapped for the federates: an hourly snapshot of
+# every meter is one contiguous row, read without copying. Sidecar indices map a meter number to its column
+# (matrix_meta.json) and a time to its row (matrix_times.npy, and arithmetic when the times are evenly
+# spaced, so a lookup doesn't depend on the length of the data).
+
+MATRIX_META_FILE_NAME = "matrix_meta.json"
+
+def write_ami_matrix(store):
+    # Compile the matrix of an AMIStore into its directory, month by month, under temporary names that
+    # replace the matrix files once complete
+    meta_file = os.path.join(store.store_dir, MATRIX_META_FILE_NAME)
+    if os.path.isfile(meta_file):
+        os.remove(meta_file)
+    times_file = os.path.join(store.store_dir, "matrix_times.npy")
+    values_file = os.path.join(store.store_dir, "matrix_values.npy")
+    num_times = sum(month["rows"] for month in store.months)
+    times = np.lib.format.open_memmap(temp_path(times_file), mode="w+", dtype=np.int64, shape=(num_times,))
+    values = np.lib.format.open_memmap(temp_path(values_file), mode="w+", dtype=np.float32, shape=(num_times,len(store.meters)))
+    row = 0
+    for month in store.months:
+        times[row:row + month["rows"]] = store.month_times(month["month"])
+        values[row:row + month["rows"]] = store.month_values(month["month"]).T
+        row += month["rows"]
+    steps = np.diff(times)
+    step_ns = int(steps[0]) if len(steps) > 0 and steps[0] > 0 and np.all(steps == steps[0]) else 0
+    meta = {
+        "format_version": AMI_STORE_FORMAT_VERSION,
+        "source": store.source,
+        "meters": store.meters,
+        "start_ns": int(times[0]) if num_times > 0 else 0,
+        "step_ns": step_ns,
+    }
+    values.flush()
+    times.flush()
+    del values, times
+    os.replace(temp_path(times_file), times_file)
+    os.replace(temp_path(values_file), values_file)
+    save_json(meta_file, meta)
+
+class AMIMatrix:
+    def __init__(self, store_dir, mmap_mode="r"):
+        meta_file = os.path.join(store_dir, MATRIX_META_FILE_NAME)
+        if not os.path.isfile(meta_file):
+            raise ValueError(f"No AMI matrix found in {store_dir}")
+        with open(meta_file, 'r') as file:
+            meta = json.load(file)
+        if meta["format_version"] != AMI_STORE_FORMAT_VERSION:
+            raise ValueError(f"AMI matrix format {meta['format_version']} in {store_dir} is not supported (expected {AMI_STORE_FORMAT_VERSION}). Rebuild the store.")
+
+        self.store_dir = store_dir
+        self.source = meta["source"]
+        self.meters = meta["meters"]
+        self.meter_cols = {meter: col for col, meter in enumerate(self.meters)}
+        self.start_ns = meta["start_ns"]
+        self.step_ns = meta["step_ns"]
+        self.times = np.load(os.path.join(store_dir, "matrix_times.npy"), mmap_mode=mmap_mode)
+        self.values = np.load(os.path.join(store_dir, "matrix_values.npy"), mmap_mode=mmap_mode)
+
+    def columns_of(self, meters):
+        # column of every meter, -1 for the meters not in the data
+        return np.array([self.meter_cols.get(meter, -1) for meter in meters], dtype=np.int64)
+
+    def row_of(self, time):
+        # row of a time (naive on the CSV clock (UTC) or tz-aware), -1 if it is not in the data
+        time_ns = timestamp_ns(time)
+        if self.step_ns > 0:
+            row, offset = divmod(time_ns - self.start_ns, self.step_ns)
+            return int(row) if offset == 0 and 0 <= row < len(self.times) else -1
+        row = int(np.searchsorted(self.times, time_ns))
+        return row if row < len(self.times) and self.times[row] == time_ns else -1
+
+    def snapshot(self, time):
+        # readings of every meter at a time (n_meters,), a view of the memory-mapped matrix
+        row = self.row_of(time)
+        if row < 0:
+            raise ValueError(f"No AMI data at {time} in {self.store_dir}")
+        return self.values[row]
+
+    def block(self, start, end):
+        # (times (n,) int64 ns, readings (n,n_meters)) from start to end inclusive, views of the matrix
+        low = int(np.searchsorted(self.times, timestamp_ns(start), side="left"))
+        high = int(np.searchsorted(self.times, timestamp_ns(end), side="right"))
+        return self.times[low:high], self.values[low:high]
+
+def open_ami_matrix(csv_file, chunk_rows=744):
+    # Matrix of an AMI CSV, compiled (or recompiled) first if it is missing or older than the CSV
+    store = open_ami_store(csv_file, chunk_rows)
+    try:
+        matrix = AMIMatrix(store.store_dir)
+        if matrix.source == store.source:
+            return matrix
+    except ValueError:
+        pass # no matrix yet, or an older format
+    write_ami_matrix(store)
+    return AMIMatrix(store.store_dir)
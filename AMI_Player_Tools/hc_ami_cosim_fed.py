@@ -6,6 +6,7 @@ import logging
 import os
 os.environ["KMP_DUPLICATE_LIB_OK"]="TRUE" # Note that this is a bad fix. Should create a seperate python environment
 import argparse
+import ami_store # sibling module, the federate runs as a script
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
@@ -86,12 +87,13 @@ if __name__ == "__main__":
     load_ami_data_file = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Load_AMI_Data.csv"
     gen_ami_data_file = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Gen_AMI_Data.csv"
 
-    load_ami_data = pd.read_csv(load_ami_data_file)
-    gen_ami_data = pd.read_csv(gen_ami_data_file)
-
-    # Convert times to datetime
-    load_ami_data['start_date_time'] = pd.to_datetime(load_ami_data['start_date_time'], utc=True)
-    gen_ami_data['start_date_time'] = pd.to_datetime(gen_ami_data['start_date_time'], utc=True)
+    # memory-mapped (hour x meter) matrices, with the column of every meter of the dictionaries (-1 if it has no data)
+    load_ami_matrix = ami_store.open_ami_matrix(load_ami_data_file)
+    gen_ami_matrix = ami_store.open_ami_matrix(gen_ami_data_file)
+    load_ami_cols = load_ami_matrix.columns_of([str(meter) for meter in load_dict['Meter Number']])
+    gen_ami_cols = gen_ami_matrix.columns_of([str(meter) for meter in gen_dict['Meter Number']])
+    load_ami_net_cols = np.unique(load_ami_cols[load_ami_cols >= 0])
+    gen_ami_net_cols = np.unique(gen_ami_cols[gen_ami_cols >= 0])
 
     # Loads to skip: these loads are in GIS but not in WindMil/GLD, need to investigate further...    
     loads_to_skip_file = f"Feeder_Data/{substation_name}/loads_in_gis_but_not_glm.csv"
@@ -245,15 +247,14 @@ if __name__ == "__main__":
         
         ############################   Publishing Load and Gen to GridLAB-D #######################################################
         
-        load_ami_snap = load_ami_data[load_ami_data['start_date_time']==curr_time]
-        gen_ami_snap = gen_ami_data[gen_ami_data['start_date_time']==curr_time]
+        load_ami_snap = load_ami_matrix.snapshot(curr_time)
+        gen_ami_snap = gen_ami_matrix.snapshot(curr_time)
 
         pub_json = "{\n"
 
         # Loop through AMI loads
         for index, row in load_dict.iterrows():
             service_num = row['Service Number']
-            meter_num = row['Meter Number']
             if service_num not in loads_to_skip:
                 load_name = f"_{service_num}_cons"
                 pub_json += "\t\"{name}\": {{\n".format(name=load_name)
@@ -261,10 +262,10 @@ if __name__ == "__main__":
                 num_phases = len(load_phase)
                 for ph_ind in range(num_phases):
                     ph = load_phase[ph_ind]
-                    if str(meter_num) not in load_ami_snap.columns[1:]:
+                    if load_ami_cols[index] < 0:
                         load_value_P = 0.0
                     else:
-                        load_value_P = 1000*(load_ami_snap[str(meter_num)].values[0])
+                        load_value_P = 1000*float(load_ami_snap[load_ami_cols[index]])
                     if int(service_num) in gs_service_number.tolist():
                         building_index = gs_service_number[gs_service_number==int(service_num)].index[0]
                         load_value_P += PS_out[building_index,3]
@@ -284,7 +285,6 @@ if __name__ == "__main__":
         # Loop through AMI Generation
         for index, row in gen_dict.iterrows():
             object_id = row['Object ID']
-            meter_num = row['Meter Number']
             if str(object_id) not in gens_to_skip:
                 gen_name = f"gene_{object_id}_negLdGen"
                 pub_json += "\t\"{name}\": {{\n".format(name=gen_name)
@@ -292,10 +292,10 @@ if __name__ == "__main__":
                 num_phases = len(gen_phase)
                 for ph_ind in range(num_phases):
                     ph = gen_phase[ph_ind]
-                    if str(meter_num) not in gen_ami_snap.columns[1:]:
+                    if gen_ami_cols[index] < 0:
                         gen_value_P = 0.0
                     else:
-                        gen_value_P = -1000*(gen_ami_snap[str(meter_num)].values[0])
+                        gen_value_P = -1000*float(gen_ami_snap[gen_ami_cols[index]])
                     fixed_pf = 1.00
                     gen_value_Q = gen_value_P*np.sign(fixed_pf)*np.sqrt(1/(fixed_pf**2)-1)
                     gen_value_str = f"{gen_value_P/num_phases}+{gen_value_Q/num_phases}j" # For multi-phase gens this divides gen evenly across all phases.
@@ -312,7 +312,7 @@ if __name__ == "__main__":
         # Uncomment this line to print json to log
         logger.info(pub_json)
 
-        logger.info(f"Net load [kW]: {load_ami_snap.iloc[:,2:].sum(axis=1)-gen_ami_snap.iloc[:,2:].sum(axis=1)}")
+        logger.info(f"Net load [kW]: {load_ami_snap[load_ami_net_cols].sum()-gen_ami_snap[gen_ami_net_cols].sum()}")
 
         for i in range(0, pubkeys_count):
             pub = pubid["m{}".format(i)]
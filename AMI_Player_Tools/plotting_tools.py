@@ -1,14 +1,14 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+from AMI_Player_Tools import ami_store
 
-# Function to read CSV and plot data for multiple asset IDs within a specified date range
+# Function to read AMI data and plot data for multiple asset IDs within a specified date range
 def plot_asset_data_by_index(file_path, asset_indices, start_date, end_date):
-    # Read the CSV file
-    data = pd.read_csv(file_path, parse_dates=['start_date_time'])
+    # Open the AMI store of the CSV file
+    store = ami_store.open_ami_store(file_path)
 
-    # Get the list of asset IDs (column names), excluding the 'start_date_time' column
-    asset_ids = data.columns[1:]  # Assuming the first column is 'start_date_time'
+    # Get the list of asset IDs (meter columns of the CSV)
+    asset_ids = store.meters
 
     # Validate the asset indices
     invalid_indices = [idx for idx in asset_indices if idx < 0 or idx >= len(asset_ids)]
@@ -16,9 +16,8 @@ def plot_asset_data_by_index(file_path, asset_indices, start_date, end_date):
         print(f"Invalid asset indices: {invalid_indices}. Available indices: 0 to {len(asset_ids) - 1}.")
         return
 
-    # Filter data for the specified date range
-    mask = (data['start_date_time'] >= start_date) & (data['start_date_time'] <= end_date)
-    filtered_data = data.loc[mask]
+    # Read the selected assets over the specified date range
+    filtered_data = store.read(start_date, end_date, [asset_ids[asset_index] for asset_index in asset_indices], utc=False)
 
     # Check if there's data to plot
     if filtered_data.empty:
@@ -44,20 +43,19 @@ def plot_asset_data_by_index(file_path, asset_indices, start_date, end_date):
     plt.grid()
     plt.tight_layout()
 
-# Function to read CSV and plot data for a specific asset ID and date range
+# Function to read AMI data and plot data for a specific asset ID and date range
 def plot_asset_data_by_ids(file_path, asset_ids, start_date, end_date):
-    # Read the CSV file
-    data = pd.read_csv(file_path, parse_dates=['start_date_time'])
+    # Open the AMI store of the CSV file
+    store = ami_store.open_ami_store(file_path)
 
     # Validate the asset ids
-    invalid_ids = [id for id in asset_ids if id not in data.columns[1:]]
+    invalid_ids = [id for id in asset_ids if id not in store.meter_rows]
     if invalid_ids:
         print(f"Invalid asset ids: {invalid_ids}.")
         print(len(invalid_ids))
 
-    # Filter data for the specified date range
-    mask = (data['start_date_time'] >= start_date) & (data['start_date_time'] <= end_date)
-    filtered_data = data.loc[mask]
+    # Read the valid assets over the specified date range
+    filtered_data = store.read(start_date, end_date, asset_ids, utc=False)
 
     # Check if there's data to plot
     if filtered_data.empty:
@@ -82,33 +80,26 @@ def plot_asset_data_by_ids(file_path, asset_ids, start_date, end_date):
     plt.grid()
     plt.tight_layout()
 
-# Function to read CSV and plot data for a specific asset ID and date range
+# Function to read AMI data and plot data for a specific asset ID and date range
 def plot_comp_asset_data_by_ids(file_path1, file_path2, asset_ids1, asset_ids2, start_date, end_date):
-    # Read the CSV file
-    data1 = pd.read_csv(file_path1, parse_dates=['start_date_time'])
-    data2 = pd.read_csv(file_path2, parse_dates=['start_date_time'])
+    # Open the AMI stores of the CSV files
+    store1 = ami_store.open_ami_store(file_path1)
+    store2 = ami_store.open_ami_store(file_path2)
 
     # Validate the asset ids
-    invalid_ids1 = [id for id in asset_ids1 if id not in data1.columns[1:]]
+    invalid_ids1 = [id for id in asset_ids1 if id not in store1.meter_rows]
     if invalid_ids1:
         print(f"Invalid asset ids: {invalid_ids1}.")
         print(len(invalid_ids1))
 
-    # Filter data for the specified date range
-    mask = (data1['start_date_time'] >= start_date) & (data1['start_date_time'] <= end_date)
-    filtered_data1 = data1.loc[mask]
-
-    invalid_ids2 = [id for id in asset_ids2 if id not in data2.columns[1:]]
+    invalid_ids2 = [id for id in asset_ids2 if id not in store2.meter_rows]
     if invalid_ids2:
         print(f"Invalid asset ids: {invalid_ids2}.")
         print(len(invalid_ids2))
 
-    # Filter data for the specified date range
-    mask = (data1['start_date_time'] >= start_date) & (data1['start_date_time'] <= end_date)
-    filtered_data1 = data1.loc[mask]
-
-    mask = (data2['start_date_time'] >= start_date) & (data2['start_date_time'] <= end_date)
-    filtered_data2 = data2.loc[mask]
+    # Read the valid assets over the specified date range
+    filtered_data1 = store1.read(start_date, end_date, asset_ids1, utc=False)
+    filtered_data2 = store2.read(start_date, end_date, asset_ids2, utc=False)
 
     # Check if there's data to plot
     if filtered_data1.empty:
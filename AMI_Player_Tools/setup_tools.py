@@ -2,10 +2,20 @@ import re
 import json
 import os
 import csv
+import numpy as np
 import pandas as pd
 import glob
-import pickle
+import shutil
+import tempfile
+import importlib
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import GLM_Tools.PowerSystemModel as psm
+from AMI_Player_Tools import ami_store
+from GLM_Tools.glm_reader import load_model
 
 def get_meter_numbers(substation_name):
 
@@ -231,14 +241,284 @@ def query_writer(substation_name,start_time,end_time,max_k=2000):
     print(f"Created folder for {substation_name} AMI data. Located in {ami_fdir} folder.")
 
 
-def parse_ami_data(substation_name,ami_type="Load",save_15min=False):
+# Built-in alternative to running the query_writer files by hand: AMIFetcher runs the same queries (max_k
+# meters each) concurrently, num_connections threads each on its own DB-API connection, and spills
+# the rows of every query as they are fetched, for the chunked ingestion below. The reads go from the
+# database to the AMI CSVs without export files or a second run of setup_cosim.
+
+class ThreadConnections:
+    # One connection of a DB-API module per thread, opened by the first query of the thread and reused by its
+    # later queries. A connection is only used and closed by the thread that opened it (sqlite3 refuses
+    # anything else), and one whose query failed is closed instead of being reused.
+    def __init__(self, db_module, connect_kwargs):
+        self.db_module = db_module
+        self.connect_kwargs = connect_kwargs
+        self.local = threading.local()
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self.db_module.connect(**self.connect_kwargs)
+        try:
+            yield conn
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        # close the connection of the calling thread, if it has one
+        conn = getattr(self.local, "conn", None)
+        self.local.conn = None
+        if conn is not None:
+            conn.close()
+
+def query_params(paramstyle, meter_nums, start_time, end_time):
+    # (placeholders, parameters) of the meter numbers then the time bounds, in a DB-API paramstyle
+    values = [str(meter) for meter in meter_nums] + [start_time, end_time]
+    if paramstyle == "qmark":
+        return ["?"]*len(values), values
+    if paramstyle in ["format", "pyformat"]:
+        return ["%s"]*len(values), values
+    if paramstyle == "numeric":
+        return [f":{ind + 1}" for ind in range(len(values))], values
+    if paramstyle == "named":
+        return [f":p{ind}" for ind in range(len(values))], {f"p{ind}": value for ind, value in enumerate(values)}
+    raise ValueError(f"DB-API paramstyle {paramstyle} is not supported.")
+
+class AMIFetcher:
+    # db_module: DB-API module or its name (e.g. "pymysql", or "sqlite3" for a local copy), connect_kwargs:
+    # the arguments of its connect(). Fetches the reads with start_time <= start_date_time <= end_time of
+    # max_k meters per query, num_connections queries at a time.
+    def __init__(self, db_module, connect_kwargs, start_time, end_time, max_k=2000, num_connections=4,
+                 table="MDM.meter_reads_interval"):
+        self.db_module = importlib.import_module(db_module) if isinstance(db_module, str) else db_module
+        self.connect_kwargs = connect_kwargs
+        self.start_time = start_time
+        self.end_time = end_time
+        self.max_k = max_k
+        self.num_connections = num_connections
+        self.table = table
+
+    def query(self, meter_nums):
+        marks, params = query_params(self.db_module.paramstyle, meter_nums, self.start_time, self.end_time)
+        sql = f"select asset_id, start_date_time, value from {self.table} where asset_id in ({', '.join(marks[:-2])}) " \
+              f"and start_date_time between {marks[-2]} and {marks[-1]}"
+        return sql, params
+
+    def fetch_chunks(self, connections, meter_nums, chunk_rows):
+        # reads of the meters, chunk_rows at a time as they are fetched, with the dtypes of spill_ami_chunks
+        sql, params = self.query(meter_nums)
+        with connections.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    yield pd.DataFrame.from_records(rows, columns=AMI_COLUMNS).astype({"asset_id": "category", "start_date_time": "category", "value": "float32"})
+            finally:
+                cursor.close()
+
+    def spill(self, meter_nums, spill_prefix, chunk_rows):
+        # spill_ami_chunks of every query, merged by merge_ami_spills (in query order). Each of the
+        # num_connections threads runs queries off a shared queue on its own connection, and closes it
+        # when the queue is empty, so no connection crosses threads.
+        meter_chunks = [meter_nums[start:start + self.max_k] for start in range(0, len(meter_nums), self.max_k)]
+        connections = ThreadConnections(self.db_module, self.connect_kwargs)
+        pending = queue.SimpleQueue()
+        for ind in range(len(meter_chunks)):
+            pending.put(ind)
+        spilled = [None]*len(meter_chunks)
+
+        def run_queries():
+            try:
+                while True:
+                    try:
+                        ind = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    spilled[ind] = spill_ami_chunks(self.fetch_chunks(connections, meter_chunks[ind], chunk_rows), f"{spill_prefix}{ind}")
+            finally:
+                connections.close()
+
+        with ThreadPoolExecutor(max_workers=self.num_connections) as executor:
+            workers = [executor.submit(run_queries) for _ in range(min(self.num_connections, len(meter_chunks)))]
+        for worker in workers:
+            worker.result()
+        return merge_ami_spills(spilled, f"{self.table} ({len(meter_nums)} meters)")
+
+def ami_meter_numbers(substation_name, ami_type):
+    # meter numbers queried for the loads ("Load") or generators ("Gen") of a substation
+    meter_data_file = f"Feeder_Data/{substation_name}/meter_number_data.csv" if ami_type == "Load" else f"Feeder_Data/{substation_name}/gen_meter_number_data.csv"
+    return pd.read_csv(meter_data_file)['Meter Number'].dropna().astype(np.int64).tolist()
+
+# Chunked AMI ingestion (parse_ami_data(..., chunked=True)): the exports are read in chunks of chunk_rows
+# reads, in parallel across files, with compact dtypes (categorical ids and times, float32 values). Each
+# chunk is spilled to disk sorted by time, as .npy arrays. The wide (time x meter) table is then built one
+# time partition (partition_freq) at a time from the slices of the spilled chunks, summed per hour and
+# appended to the output CSV. Peak memory is set by chunk_rows and the partition length, not the dataset.
+AMI_COLUMNS = ["asset_id", "start_date_time", "value"]
+HOUR_NS = 3600*10**9
+
+def spill_ami_chunks(chunks, spill_prefix):
+    # Save every chunk of reads (AMI_COLUMNS, categorical ids and times, float32 values) sorted by time
+    # (stable, so reads keep their order within a time). Returns (spilled chunk prefixes, meter ids, first
+    # and last read time in ns).
+    prefixes = []
+    assets = []
+    t_min, t_max = None, None
+    for chunk_ind, chunk in enumerate(chunks):
+        if len(chunk) == 0:
+            continue
+        # parse each distinct meter id and time once
+        asset_codes = chunk["asset_id"].cat
+        asset_ids = asset_codes.categories.astype(np.int64).to_numpy()[asset_codes.codes]
+        time_codes = chunk["start_date_time"].cat
+        times = pd.to_datetime(time_codes.categories).to_numpy().astype("datetime64[ns]").astype(np.int64)[time_codes.codes]
+        order = np.argsort(times, kind="stable")
+        prefix = f"{spill_prefix}_{chunk_ind}"
+        np.save(f"{prefix}_times.npy", times[order])
+        np.save(f"{prefix}_assets.npy", asset_ids[order])
+        np.save(f"{prefix}_values.npy", chunk["value"].to_numpy(dtype=np.float32)[order])
+        prefixes.append(prefix)
+        assets.append(np.unique(asset_ids))
+        t_min = times[order[0]] if t_min is None else min(t_min, times[order[0]])
+        t_max = times[order[-1]] if t_max is None else max(t_max, times[order[-1]])
+    assets = np.unique(np.concatenate(assets)) if assets else np.zeros(0, dtype=np.int64)
+    return prefixes, assets, t_min, t_max
+
+def spill_ami_export(file_path, spill_prefix, chunk_rows):
+    # spill_ami_chunks of one export, read in chunks of chunk_rows reads
+    reader = pd.read_csv(file_path, sep='\t', usecols=AMI_COLUMNS, chunksize=chunk_rows,
+                         dtype={"asset_id": "category", "start_date_time": "category", "value": "float32"})
+    return spill_ami_chunks(reader, spill_prefix)
+
+def pivot_ami_partition(prefixes, assets, negate, start, stop, hour_stop, keep_15min):
+    # Hourly sums (hours in [start, min(stop, hour_stop))) and, with keep_15min, the wide table of the
+    # reads with start <= time < stop. Like pivot_table(aggfunc='first') then resample('h').sum(): the
+    # first read of a meter and time is kept and missing reads count as 0 in the sums.
+    times, asset_ids, values = [], [], []
+    for prefix in prefixes:
+        chunk_times = np.load(f"{prefix}_times.npy", mmap_mode='r')
+        lo, hi = np.searchsorted(chunk_times, [start, stop])
+        if hi > lo:
+            times.append(np.array(chunk_times[lo:hi]))
+            asset_ids.append(np.array(np.load(f"{prefix}_assets.npy", mmap_mode='r')[lo:hi]))
+            values.append(np.array(np.load(f"{prefix}_values.npy", mmap_mode='r')[lo:hi]))
+    hours = np.arange(start, min(stop, hour_stop), HOUR_NS)
+    hourly = np.zeros((len(hours), len(assets)), dtype=np.float32)
+    wide_15min = None
+    if times:
+        times = np.concatenate(times)
+        index = np.unique(times)
+        rows = np.searchsorted(index, times)
+        cols = np.searchsorted(assets, np.concatenate(asset_ids))
+        _, first = np.unique(rows*len(assets) + cols, return_index=True)
+        wide = np.full((len(index), len(assets)), np.nan, dtype=np.float32)
+        wide[rows[first], cols[first]] = np.concatenate(values)[first]
+        wide[:, negate] = -wide[:, negate]
+        # reads sorted by time, so each hour is a contiguous block of rows
+        hour_inds = (index - start)//HOUR_NS
+        hour_starts = np.flatnonzero(np.r_[True, hour_inds[1:] != hour_inds[:-1]])
+        hourly[hour_inds[hour_starts]] = np.add.reduceat(np.nan_to_num(wide), hour_starts, axis=0)
+        if keep_15min:
+            wide_15min = pd.DataFrame(wide, index=pd.DatetimeIndex(index, name='start_date_time'), columns=assets)
+    hourly = pd.DataFrame(hourly, index=pd.DatetimeIndex(hours, name='start_date_time'), columns=assets)
+    return hourly, wide_15min
+
+def spill_ami_exports(executor, file_paths, spill_prefix, chunk_rows):
+    # spill_ami_export of every export (in parallel with an executor), merged by merge_ami_spills
+    spill_args = [(file_path, f"{spill_prefix}{ind}", chunk_rows) for ind, file_path in enumerate(file_paths)]
+    if executor is None:
+        spilled = [spill_ami_export(*args) for args in spill_args]
+    else:
+        spilled = list(executor.map(spill_ami_export, *zip(*spill_args)))
+    return merge_ami_spills(spilled, file_paths)
+
+def merge_ami_spills(spilled, sources):
+    # (spilled chunk prefixes in source order, so the first read of a duplicate is the one pivot_table would
+    # keep, meter ids, first hour, hour after the last read) in ns, of the spill_ami_chunks of every source
+    prefixes = [prefix for file_prefixes, _, _, _ in spilled for prefix in file_prefixes]
+    if not prefixes:
+        raise ValueError(f"No AMI reads found in {sources}.")
+    assets = np.unique(np.concatenate([file_assets for _, file_assets, _, _ in spilled]))
+    t_min = min(file_t_min for _, _, file_t_min, _ in spilled if file_t_min is not None)
+    t_max = max(file_t_max for _, _, _, file_t_max in spilled if file_t_max is not None)
+    return prefixes, assets, t_min - t_min % HOUR_NS, t_max - t_max % HOUR_NS + HOUR_NS
+
+def partition_length_ns(partition_freq):
+    partition_ns = pd.Timedelta(partition_freq).value
+    if partition_ns <= 0 or partition_ns % HOUR_NS != 0:
+        raise ValueError(f"AMI partition length {partition_freq} must be a whole number of hours.")
+    return partition_ns
+
+def parse_ami_data_chunked(file_paths, out_file, out_file_15min=None, meters_to_negate=(), num_workers=1,
+                           chunk_rows=1000000, partition_freq="7D", fetcher=None, meter_nums=()):
+    # fetcher: AMIFetcher to query the reads of meter_nums from the database instead of reading file_paths
+    partition_ns = partition_length_ns(partition_freq)
+    spill_dir = tempfile.mkdtemp(prefix="ami_spill_", dir=os.path.dirname(os.path.abspath(out_file)))
+    executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else None
+    try:
+        if fetcher is None:
+            prefixes, assets, hour_start, hour_stop = spill_ami_exports(executor, file_paths, os.path.join(spill_dir, "export"), chunk_rows)
+        else:
+            prefixes, assets, hour_start, hour_stop = fetcher.spill(meter_nums, os.path.join(spill_dir, "query"), chunk_rows)
+        negate = np.isin(assets, list(meters_to_negate))
+        partitions = [(start, start + partition_ns) for start in range(hour_start, hour_stop, partition_ns)]
+
+        # partitions are pivoted in parallel and written in time order, at most 2*num_workers in flight
+        keep_15min = out_file_15min is not None
+        if executor is None:
+            results = (pivot_ami_partition(prefixes, assets, negate, start, stop, hour_stop, keep_15min) for start, stop in partitions)
+        else:
+            results = iter_in_order(executor, pivot_ami_partition, [(prefixes, assets, negate, start, stop, hour_stop, keep_15min) for start, stop in partitions], 2*num_workers)
+        first_15min = True
+        for ind, (hourly, wide_15min) in enumerate(results):
+            hourly.to_csv(out_file, mode='w' if ind == 0 else 'a', header=ind == 0, index=True)
+            if wide_15min is not None:
+                wide_15min.to_csv(out_file_15min, mode='w' if first_15min else 'a', header=first_15min, index=True)
+                first_15min = False
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+def iter_in_order(executor, fn, args_list, max_in_flight):
+    # results of fn(*args) for args_list in order, with at most max_in_flight tasks submitted at a time
+    in_flight = deque()
+    for args in args_list:
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+        in_flight.append(executor.submit(fn, *args))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def parse_ami_data(substation_name,ami_type="Load",save_15min=False,chunked=False,num_workers=1,chunk_rows=1000000,partition_freq="7D",fetcher=None):
+    # chunked: bounded memory ingestion (see parse_ami_data_chunked) instead of reading every export at once
+    # fetcher: AMIFetcher to query the reads from the database instead of reading the exports (chunked)
 
     valid_ami_types = ["Load","Gen"]
     if ami_type not in valid_ami_types:
         raise ValueError(f"AMI type \"{ami_type}\" not recognized. Valid inputs are: {valid_ami_types}.")
 
-    # List of file paths or use glob to match files
-    file_paths = glob.glob(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_{ami_type}_AMI_Data_*.txt")  # Adjust pattern as needed
+    # List of file paths or use glob to match files, sorted so a read repeated across exports keeps the same
+    # first value in both modes
+    file_paths = sorted(glob.glob(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_{ami_type}_AMI_Data_*.txt"))  # Adjust pattern as needed
+
+    if chunked or fetcher is not None:
+        meters_to_negate = []
+        if ami_type =="Gen":
+            # Need to check if net meter direction is switched
+            meter_data = pd.read_csv(f"Feeder_Data/{substation_name}/gen_meter_number_data.csv")
+            meters_to_negate = meter_data.loc[meter_data['Net Meter Switched'] == 'Y', 'Meter Number'].tolist()
+        out_file = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_{ami_type}_AMI_Data.csv"
+        out_file_15min = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_{ami_type}_AMI_Data_15_min.csv" if save_15min else None
+        meter_nums = ami_meter_numbers(substation_name, ami_type) if fetcher is not None else ()
+        parse_ami_data_chunked(file_paths, out_file, out_file_15min, meters_to_negate, num_workers, chunk_rows, partition_freq, fetcher, meter_nums)
+        print(f"Parsed AMI {ami_type} data for {substation_name} into a CSV file. Located in Feeder_Data/{substation_name}/AMI_Data/ folder.")
+        return
 
     # Initialize an empty list to store DataFrames
     dfs = []
@@ -291,7 +571,74 @@ def parse_ami_data(substation_name,ami_type="Load",save_15min=False):
     print(f"Parsed AMI {ami_type} data for {substation_name} into a CSV file. Located in Feeder_Data/{substation_name}/AMI_Data/ folder.")
 
 
-def calculate_true_load(substation_name): # This function should likely be combined with parse_ami_data() eventually...
+class BTMMapping:
+    # Load meter -> behind-the-meter gen meter of the meters with a separate gen meter, as column indices of a
+    # net load and a gen AMI matrix (load_columns, gen_columns: their meter numbers as str), so the true load
+    # and gen are computed with a few matrix operations. A load meter that is itself one of the gen meters
+    # reads the generation already: its gen meter is zeroed in the true gen (added as a zero column if it has
+    # no AMI data) instead of being added to its load.
+    def __init__(self, sp_meter_df, load_columns, gen_columns):
+        btm_df = sp_meter_df[sp_meter_df['Has Separate Gen Meter'] == 'Y']
+        gen_meter_set = set(btm_df['Gen Meter'].tolist())
+        load_col_inds = {meter: ind for ind, meter in enumerate(load_columns)}
+        self.gen_columns = list(gen_columns)
+        gen_col_inds = {meter: ind for ind, meter in enumerate(self.gen_columns)}
+        load_inds, gen_inds, zero_gen_inds = [], [], []
+        self.missing_loads = []
+        missing_gens = []
+        for load_meter, gen_meter in zip(btm_df['Meter Number'].tolist(), btm_df['Gen Meter'].tolist()):
+            gen_meter = str(int(gen_meter))
+            if load_meter in gen_meter_set:
+                if gen_meter not in gen_col_inds:
+                    gen_col_inds[gen_meter] = len(self.gen_columns)
+                    self.gen_columns.append(gen_meter)
+                zero_gen_inds.append(gen_col_inds[gen_meter])
+            elif str(load_meter) not in load_col_inds:
+                self.missing_loads.append(load_meter)
+            elif gen_meter not in gen_col_inds:
+                missing_gens.append(gen_meter)
+            else:
+                load_inds.append(load_col_inds[str(load_meter)])
+                gen_inds.append(gen_col_inds[gen_meter])
+        if missing_gens:
+            raise ValueError(f"Gen meters {missing_gens} of loads with behind-the-meter generation have no gen AMI data.")
+        self.load_inds = np.array(load_inds, dtype=np.int64)
+        self.gen_inds = np.array(gen_inds, dtype=np.int64)
+        self.zero_gen_inds = np.array(zero_gen_inds, dtype=np.int64)
+
+    def apply(self, load_values, gen_values, gen_rows):
+        # (true load (n_load_times,n_load_meters), true gen (n_gen_times,len(gen_columns))) of the net load and
+        # gen matrices. gen_rows: row of gen_values at the time of every load_values row, -1 if the gen data
+        # has no such time (no generation added).
+        true_gen = np.zeros((len(gen_values), len(self.gen_columns)), dtype=gen_values.dtype)
+        true_gen[:, :gen_values.shape[1]] = gen_values
+        true_gen[:, self.zero_gen_inds] = 0
+        found = gen_rows >= 0
+        added = np.zeros((len(gen_rows), len(self.gen_inds)), dtype=gen_values.dtype)
+        added[found] = true_gen[gen_rows[found]][:, self.gen_inds]
+        true_load = np.array(load_values, dtype=np.result_type(load_values, gen_values))
+        # unbuffered, so a load meter listed with several gen meters gets all of them
+        np.add.at(true_load, (slice(None), self.load_inds), added)
+        return true_load, true_gen
+
+def ami_frame(times, values, columns):
+    # wide AMI table laid out like the true AMI CSVs: start_date_time then one column per meter
+    frame = pd.DataFrame(values, columns=columns)
+    frame.insert(0, 'start_date_time', np.asarray(times))
+    return frame
+
+def finish_true_load(substation_name, missing_loads_with_btm):
+    # Month-partitioned stores of the true AMI data, read by the federates and populate_ami_loads_pkl
+    for kind in ["Load", "Gen"]:
+        ami_store.write_ami_store(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_{kind}_AMI_Data.csv")
+
+    # Store list of loads with btm generation that are missing from AMI data
+    missing_loads_df = pd.DataFrame(missing_loads_with_btm, columns=['Meter Number'])
+    missing_loads_df.to_csv(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_Missing_Loads_With_BTM.csv", index=False)
+
+    print(f"Calculated \"true\" AMI data for loads and generation in {substation_name}. Located in Feeder_Data/{substation_name}/AMI_Data/ folder.")
+
+def calculate_true_load(substation_name):
 
     net_load_file = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_Load_AMI_Data.csv"
     gen_ami_file = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_Gen_AMI_Data.csv"
@@ -303,31 +650,86 @@ def calculate_true_load(substation_name): # This function should likely be combi
     gen_ami_df = pd.read_csv(gen_ami_file)
     sp_meter_df = pd.read_csv(sp_meter_data_file)
 
-    # Get meters with BTM gen
-    meters_with_btm_df = sp_meter_df[sp_meter_df['Has Separate Gen Meter'] == 'Y']
-    meters_with_btm = meters_with_btm_df['Meter Number'].tolist()
-    btm_meters = meters_with_btm_df['Gen Meter'].tolist()
-
-    true_load_df = net_load_df
-    missing_loads_with_btm = []
-    for meter_ind, meter in enumerate(meters_with_btm):
-        if meter in btm_meters:
-            gen_ami_df[str(int(btm_meters[meter_ind]))] = 0
-        else:
-            if str(meter) in net_load_df.columns:
-                true_load_df[str(meter)] = true_load_df[str(meter)] + gen_ami_df[str(int(btm_meters[meter_ind]))]
-            else:
-                missing_loads_with_btm.append(meter)
+    # Add the BTM gen to the loads over the whole matrices, gen rows aligned on the net load times
+    load_columns = net_load_df.columns[1:].tolist()
+    mapping = BTMMapping(sp_meter_df, load_columns, gen_ami_df.columns[1:].tolist())
+    gen_rows = pd.Index(gen_ami_df['start_date_time']).get_indexer(net_load_df['start_date_time'])
+    true_load, true_gen = mapping.apply(net_load_df[load_columns].to_numpy(dtype=float), gen_ami_df.iloc[:, 1:].to_numpy(dtype=float), gen_rows)
+    true_load_df = ami_frame(net_load_df['start_date_time'], true_load, load_columns)
+    gen_ami_df = ami_frame(gen_ami_df['start_date_time'], true_gen, mapping.gen_columns)
 
     # Save the pivot table to a CSV file
     true_load_df.to_csv(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Load_AMI_Data.csv", index=True)  # Set index=False if you don't want to save the index
     gen_ami_df.to_csv(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Gen_AMI_Data.csv", index=True)  # Set index=False if you don't want to save the index
 
-    # Store list of loads with btm generation that are missing from AMI data
-    missing_loads_df = pd.DataFrame(missing_loads_with_btm, columns=['Meter Number'])
-    missing_loads_df.to_csv(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_Missing_Loads_With_BTM.csv", index=False)
-
-    print(f"Calculated \"true\" AMI data for loads and generation in {substation_name}. Located in Feeder_Data/{substation_name}/AMI_Data/ folder.")
+    finish_true_load(substation_name, mapping.missing_loads)
+
+def true_ami_partition(load_spill, gen_spill, mapping, start, stop, keep_15min):
+    # pivot_ami_partition of the net load and gen exports over [start, stop), each within its own hours, and
+    # their true load and gen. *_spill: (prefixes, meter ids, meters to negate, first hour, hour after the last read).
+    hourly, wide_15min = [], []
+    for prefixes, assets, negate, hour_start, hour_stop in [load_spill, gen_spill]:
+        part_hourly, part_15min = pivot_ami_partition(prefixes, assets, negate, max(start, hour_start), stop, hour_stop, keep_15min)
+        hourly.append(part_hourly)
+        wide_15min.append(part_15min)
+    load_hourly, gen_hourly = hourly
+    true_load, true_gen = mapping.apply(load_hourly.to_numpy(), gen_hourly.to_numpy(), gen_hourly.index.get_indexer(load_hourly.index))
+    return (load_hourly, gen_hourly, wide_15min[0], wide_15min[1],
+            ami_frame(load_hourly.index, true_load, load_hourly.columns.astype(str)),
+            ami_frame(gen_hourly.index, true_gen, mapping.gen_columns))
+
+def parse_true_ami_data_chunked(substation_name, save_15min=False, num_workers=1, chunk_rows=1000000, partition_freq="7D", fetcher=None):
+    # parse_ami_data(..., chunked=True) of the Load and Gen exports and calculate_true_load in one pass: every
+    # time partition of both is pivoted and its true load and gen computed before it is appended to the CSVs.
+    # fetcher: AMIFetcher to query the reads of the meters from the database instead of reading the exports.
+    partition_ns = partition_length_ns(partition_freq)
+    ami_dir = f"Feeder_Data/{substation_name}/AMI_Data"
+    gen_meter_data = pd.read_csv(f"Feeder_Data/{substation_name}/gen_meter_number_data.csv")
+    meters_to_negate = gen_meter_data.loc[gen_meter_data['Net Meter Switched'] == 'Y', 'Meter Number'].tolist()
+    sp_meter_df = pd.read_csv(f"Feeder_Data/{substation_name}/meter_number_data.csv")
+    out_files = [f"{ami_dir}/{substation_name}_{name}_AMI_Data.csv" for name in ["Load", "Gen"]] + \
+                [f"{ami_dir}/{substation_name}_{name}_AMI_Data_15_min.csv" if save_15min else None for name in ["Load", "Gen"]] + \
+                [f"{ami_dir}/{substation_name}_True_{name}_AMI_Data.csv" for name in ["Load", "Gen"]]
+    spill_dir = tempfile.mkdtemp(prefix="ami_spill_", dir=ami_dir)
+    executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else None
+    try:
+        spills = []
+        for ami_type, negate_meters in [("Load", []), ("Gen", meters_to_negate)]:
+            if fetcher is None:
+                file_paths = sorted(glob.glob(f"{ami_dir}/{substation_name}_{ami_type}_AMI_Data_*.txt"))
+                prefixes, assets, hour_start, hour_stop = spill_ami_exports(executor, file_paths, os.path.join(spill_dir, ami_type), chunk_rows)
+            else:
+                prefixes, assets, hour_start, hour_stop = fetcher.spill(ami_meter_numbers(substation_name, ami_type), os.path.join(spill_dir, ami_type), chunk_rows)
+            spills.append((prefixes, assets, np.isin(assets, negate_meters), hour_start, hour_stop))
+        load_spill, gen_spill = spills
+        mapping = BTMMapping(sp_meter_df, [str(meter) for meter in load_spill[1]], [str(meter) for meter in gen_spill[1]])
+        hour_start = min(load_spill[3], gen_spill[3])
+        hour_stop = max(load_spill[4], gen_spill[4])
+        partitions = [(start, start + partition_ns) for start in range(hour_start, hour_stop, partition_ns)]
+
+        args_list = [(load_spill, gen_spill, mapping, start, stop, save_15min) for start, stop in partitions]
+        if executor is None:
+            results = (true_ami_partition(*args) for args in args_list)
+        else:
+            results = iter_in_order(executor, true_ami_partition, args_list, 2*num_workers)
+        rows_written = [None]*len(out_files)
+        for frames in results:
+            for ind, (out_file, frame) in enumerate(zip(out_files, frames)):
+                if out_file is None or frame is None:
+                    continue
+                first = rows_written[ind] is None
+                if ind >= 4:
+                    # the true AMI rows are numbered across partitions, like the index written by calculate_true_load
+                    frame.index = frame.index + (0 if first else rows_written[ind])
+                frame.to_csv(out_file, mode='w' if first else 'a', header=first, index=True)
+                rows_written[ind] = (0 if first else rows_written[ind]) + len(frame)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    print(f"Parsed AMI Load and Gen data for {substation_name} into CSV files. Located in Feeder_Data/{substation_name}/AMI_Data/ folder.")
+    finish_true_load(substation_name, mapping.missing_loads)
 
 def modify_runner_json(substation_name,start_time,end_time,ami_load_fixed_pf,include_hc):
 
@@ -422,8 +824,7 @@ def find_diff_GIS_GLM(substation_name):
     pkl_file_name = f"{substation_name}_Model.pkl"
     pkl_file = os.path.join(pkl_file_dir,pkl_file_name)
 
-    with open(pkl_file, 'rb') as file:
-        Model = pickle.load(file)
+    Model = load_model(pkl_file)
 
     # get list of service numbers in GLM loads
     sn_list = []
@@ -1,15 +1,48 @@
 import numpy as np
+from sys import intern
+from GLM_Tools.topology import RadialTopology
+
+LINE_TYPES = ["overhead_line", "underground_line"]
+TRANSFORMER_TYPES = ["transformer"]
+SWITCH_TYPES = ["fuse", "switch", "sectionalizer", "recloser", "regulator"]
+
+# component field -> (stacked array on the model, row shape, dtype)
+BRANCH_ARRAYS = {"Z_ohms_3ph": ("Z_ohms_3ph_br",(3,3),complex), "Z_pu_3ph": ("Z_pu_3ph_br",(3,3),complex),
+                 "A_br": ("A_br",(3,3),float), "B_br": ("B_br",(3,3),complex), "C_br": ("C_br",(3,),float), "D_br": ("D_br",(3,3),float)}
+LOAD_ARRAYS = {"Sload": ("Sload",(3,),complex)}
+GENERATOR_ARRAYS = {"Sgen": ("Sgen",(3,),complex)}
+ARRAY_FIELDS = {**BRANCH_ARRAYS, **LOAD_ARRAYS, **GENERATOR_ARRAYS}
+
+IDENTITY_3 = np.eye(3)
+ZEROS_3 = np.zeros(3)
+
+DIAG_ROWS = [0,1,2]
+DIAG_COLS = [0,1,2]
+
+phase_selection_matrices = {}
+
+def phase_selection_matrix(from_phases,to_phases):
+    # cached, since there are only a handful of distinct phase strings in a feeder
+    key = (from_phases,to_phases)
+    if key not in phase_selection_matrices:
+        if ('N' in from_phases) or ('D' in from_phases):
+            from_phases = from_phases[:-1] # remove N or D
+        if ('N' in to_phases) or ('D' in to_phases):
+            to_phases = to_phases[:-1] # remove N or D
+        M = np.zeros((len(to_phases),len(from_phases)))
+        for t_ind, char in enumerate(to_phases):
+            if char in from_phases:
+                f_ind = from_phases.find(char)
+                M[t_ind,f_ind] = 1.0
+        M.flags.writeable = False
+        phase_selection_matrices[key] = M
+    return phase_selection_matrices[key]
+
+def phase_mask(phases):
+    return [ph in phases for ph in "ABC"]
 
 def convert_phases(val,from_phases,to_phases):
-    if ('N' in from_phases) or ('D' in from_phases):
-        from_phases = from_phases[:-1] # remove N or D
-    if ('N' in to_phases) or ('D' in to_phases):
-        to_phases = to_phases[:-1] # remove N or D
-    M = np.zeros((len(to_phases),len(from_phases)))
-    for t_ind, char in enumerate(to_phases):
-        if char in from_phases:
-            f_ind = from_phases.find(char)
-            M[t_ind,f_ind] = 1.0
+    M = phase_selection_matrix(from_phases,to_phases)
     if val.ndim == 1: # if a vector
         return M @ val
     elif val.ndim == 2: # if a matrix
@@ -49,6 +82,8 @@ class PowerSystemModel:
         self.glm_helics_obj = ""
         self.glm_misc_objs = ""
 
+        self.array_rows_set = {} # stacked array name -> which rows hold a value
+
         for ind, node in enumerate(self.Nodes):
             node.index = ind
             node.outgoing_branches = []
@@ -87,17 +122,17 @@ class PowerSystemModel:
             parent_name = load.parent
             parent_node = self.Node_Dict[parent_name]
             load.parent_node_ind = parent_node.index
-            # convert Sload to per unit
-            Sload = [load.constant_power_A, load.constant_power_B, load.constant_power_C]
-            load.Sload = np.array(Sload)/self.Sbase_1ph
+        # convert Sload to per unit, stacked on the model (load.Sload is its row)
+        Sload = [[load.constant_power_A, load.constant_power_B, load.constant_power_C] for load in self.Loads]
+        self.attach_arrays(self.Loads, {"Sload": np.array(Sload,dtype=complex).reshape(-1,3)/self.Sbase_1ph})
 
         for gen in self.Generators:
             parent_name = gen.parent
             parent_node = self.Node_Dict[parent_name]
             gen.parent_node_ind = parent_node.index
-            # convert Sgen to per unit
-            Sgen = [gen.constant_power_A, gen.constant_power_B, gen.constant_power_C]
-            gen.Sgen = np.array(Sgen)/self.Sbase_1ph
+        # convert Sgen to per unit, stacked on the model (gen.Sgen is its row)
+        Sgen = [[gen.constant_power_A, gen.constant_power_B, gen.constant_power_C] for gen in self.Generators]
+        self.attach_arrays(self.Generators, {"Sgen": np.array(Sgen,dtype=complex).reshape(-1,3)/self.Sbase_1ph})
 
         for shunt in self.Shunts:
             parent_name = shunt.parent
@@ -126,137 +161,140 @@ class PowerSystemModel:
         self.Branch_Dict = {obj.name: obj for obj in self.Branches}
 
 
-    def compute_impedances(self):
-        for branch in self.Branches:
-            if branch.type in ["overhead_line", "underground_line"]:
-                config_name = branch.config
-                if config_name not in self.Config_Dict:
-                    raise ValueError(f"Could not find line config object: {config_name}")
-                branch_config = self.Config_Dict[config_name] 
-                Z_ohms_per_mi = np.array([[branch_config.z11,branch_config.z12,branch_config.z13],
-                                              [branch_config.z21,branch_config.z22,branch_config.z23],
-                                              [branch_config.z31,branch_config.z32,branch_config.z33]])
-                mi_per_foot = 1/5280
-                branch.Z_ohms_3ph = branch.length*mi_per_foot*Z_ohms_per_mi 
-                # convert to pu
-                from_node_name = branch.from_node
-                to_node_name = branch.to_node
-                if from_node_name not in self.Node_Dict:
-                    from_node_name = find_node_parent(from_node_name,self.Node_Dict,self.Shunt_Dict)
-                if to_node_name not in self.Node_Dict:
-                    to_node_name = find_node_parent(to_node_name,self.Node_Dict,self.Shunt_Dict)
-                from_node = self.Node_Dict[from_node_name]
-                to_node = self.Node_Dict[to_node_name]
-                if from_node.Vbase != to_node.Vbase:
-                    raise ValueError(f"Nominal voltages for nodes {from_node_name} ({from_node.Vbase}) and {to_node_name} ({to_node.Vbase}) are not equal, but line {branch.name} connects them!")
-                Vbase_ln = from_node.Vbase
-                branch.Ibase = self.Sbase_1ph/Vbase_ln
-                branch.Zbase = Vbase_ln/branch.Ibase
-                branch.Z_pu_3ph = branch.Z_ohms_3ph/branch.Zbase
-                branch.Z = convert_phases(branch.Z_pu_3ph,"ABCN",branch.phases)
-                # calculate A, B, C, D matrices from Kersting
-                # V_ABC = A*V_abc + B*I_abc
-                # I_ABC = C*V_abc + D*I_abc
-                branch.A_br = np.eye(3)
-                branch.B_br = branch.Z_pu_3ph
-                branch.C_br = np.zeros(3)
-                branch.D_br = np.eye(3)
-            if branch.type in ["transformer"]:
-                config_name = branch.config
-                if config_name not in self.Config_Dict:
-                    raise ValueError(f"Could not find line config object: {config_name}")
-                branch_config = self.Config_Dict[config_name] 
-                branch.ratedKVA = branch_config.power_rating
-                r_pu = (self.Sbase_1ph/(1000*branch.ratedKVA))*branch_config.resistance
-                x_pu = (self.Sbase_1ph/(1000*branch.ratedKVA))*branch_config.reactance
-                branch.Z_pu_3ph = np.zeros((3,3),dtype=complex)
-                for ph in branch.phases:
-                    if ph == 'A':
-                        branch.Z_pu_3ph[0,0] = complex(r_pu,x_pu)
-                    if ph == 'B':
-                        branch.Z_pu_3ph[1,1] = complex(r_pu,x_pu)
-                    if ph == 'C':
-                        branch.Z_pu_3ph[2,2] = complex(r_pu,x_pu)
-                branch.Z = convert_phases(branch.Z_pu_3ph,"ABCN",branch.phases)
-                # calculate A, B, C, D matrices from Kersting
-                # V_ABC = A*V_abc + B*I_abc
-                # I_ABC = C*V_abc + D*I_abc
-                if branch_config.connect_type in ["SINGLE_PHASE","WYE_WYE"]:
-                    branch.A_br = np.eye(3)
-                    branch.B_br = branch.Z_pu_3ph
-                    branch.C_br = np.zeros(3)
-                    branch.D_br = np.eye(3)
-                elif branch_config.connect_type in ["DELTA_GWYE"]:
-                    branch.A_br = -np.array([[0,2,1],[1,0,2],[2,1,0]])/np.sqrt(3)
-                    branch.B_br = np.dot(branch.A_br,branch.Z_pu_3ph)
-                    branch.C_br = np.zeros(3)
-                    branch.D_br = np.array([[1,-1,0],[0,1,-1],[-1,0,1]])/np.sqrt(3)
-                elif branch_config.connect_type in ["DELTA_DELTA"]:
-                    if branch.phases == 'ABCD':
-                        branch.A_br = np.array([[2,-1,-1],[-1,2,-1],[-1,-1,2]])/3
-                        branch.B_br = complex(r_pu,x_pu)/3*np.array([[1,0,0],[0,1,0],[-1,-1,0]])
-                        branch.C_br = np.zeros(3)
-                        branch.D_br = np.eye(3)
-                    elif branch.phases == 'BCD':
-                        branch.A_br = np.array([[2,-1,-1],[-1,2,-1],[-1,-1,2]])/3
-                        branch.B_br = complex(r_pu,x_pu)/3*np.array([[0,-0.5,0.5],[0,-1,1],[0,0,0]])
-                        branch.C_br = np.zeros(3)
-                        branch.D_br = np.array([[0,0,0],[0,1,0],[0,0,1]])
-                    else:
-                        raise ValueError(f"Connection type {branch_config.connect_type} with phases {branch.phases} not yet supported for branch {branch.name}.")
-                else:
+    @property
+    def topology(self):
+        # array index of the feeder graph (see topology.py), built on first use and rebuilt once nodes or
+        # branches were added or reset_topology() was called (e.g. after a switch changed status)
+        topology = self.__dict__.get("_topology")
+        if topology is None or topology.num_nodes != len(self.Nodes) or topology.num_branches != len(self.Branches):
+            topology = RadialTopology(self)
+            self._topology = topology
+        return topology
+
+    def reset_topology(self):
+        self._topology = None
+
+    def compute_impedances(self, branch_inds=None):
+        # The Python loop only sorts branches by type and checks their configs and nominal voltages. The
+        # impedances and Kersting A, B, C, D matrices are then computed per type on stacked (n_branches,3,3)
+        # arrays kept on the model (self.A_br, ...). branch.A_br etc. read their row of these arrays.
+        # With branch_inds only those rows are recomputed (e.g. after an edit), and the shunts are left as is.
+        # V_ABC = A*V_abc + B*I_abc
+        # I_ABC = C*V_abc + D*I_abc
+        num_branches = len(self.Branches)
+        if branch_inds is not None and not all(array_name in self.array_rows_set for array_name, _, _ in BRANCH_ARRAYS.values()):
+            branch_inds = None # nothing computed yet
+        if branch_inds is None:
+            branches = self.Branches
+            self.Z_ohms_3ph_br = np.zeros((num_branches,3,3),dtype=complex)
+            self.Z_pu_3ph_br = np.zeros((num_branches,3,3),dtype=complex)
+            self.A_br = np.zeros((num_branches,3,3))
+            self.B_br = np.zeros((num_branches,3,3),dtype=complex)
+            self.C_br = np.zeros((num_branches,3))
+            self.D_br = np.zeros((num_branches,3,3))
+        else:
+            branch_inds = sorted(set(branch_inds))
+            branches = [self.Branches[ind] for ind in branch_inds]
+            for array_name, _, _ in BRANCH_ARRAYS.values():
+                self.__dict__[array_name][branch_inds] = 0.0
+
+        line_inds, line_config_names, line_lengths, line_Vbase = [], [], [], []
+        xfmr_inds, xfmr_configs = [], []
+        switch_inds, switch_Vbase = [], []
+        fake_inds = []
+        for branch in branches:
+            if branch.type in LINE_TYPES:
+                if branch.config not in self.Config_Dict:
+                    raise ValueError(f"Could not find line config object: {branch.config}")
+                line_inds.append(branch.index)
+                line_config_names.append(branch.config)
+                line_lengths.append(branch.length)
+                line_Vbase.append(self.check_branch_Vbase(branch))
+            elif branch.type in TRANSFORMER_TYPES:
+                if branch.config not in self.Config_Dict:
+                    raise ValueError(f"Could not find line config object: {branch.config}")
+                branch_config = self.Config_Dict[branch.config]
+                if branch_config.connect_type not in ["SINGLE_PHASE","WYE_WYE","DELTA_GWYE","DELTA_DELTA"]:
                     raise ValueError(f"Connection type {branch_config.connect_type} not yet supported for branch {branch.name}.")
-            if branch.type in ["fuse", "switch", "sectionalizer", "recloser", "regulator"]:
-                branch.Z_ohms_3ph = np.zeros((3,3),dtype=complex)
-                for ph in branch.phases:
-                    if ph == 'A':
-                        branch.Z_ohms_3ph[0,0] = complex(self.default_resistance,0.0)
-                    if ph == 'B':
-                        branch.Z_ohms_3ph[1,1] = complex(self.default_resistance,0.0)
-                    if ph == 'C':
-                        branch.Z_ohms_3ph[2,2] = complex(self.default_resistance,0.0)
-                # convert to pu
-                from_node_name = branch.from_node
-                to_node_name = branch.to_node
-                if from_node_name not in self.Node_Dict:
-                    if from_node_name in self.Shunt_Dict:
-                        shunt_obj = self.Shunt_Dict[from_node_name]
-                        from_node_name = shunt_obj.parent
-                    else:
-                        raise ValueError(f"Could not find node object: {from_node_name}")
-                if to_node_name not in self.Node_Dict:
-                    if to_node_name in self.Shunt_Dict:
-                        shunt_obj = self.Shunt_Dict[to_node_name]
-                        to_node_name = shunt_obj.parent
-                    else:
-                        raise ValueError(f"Could not find node object: {from_node_name}")
-                from_node = self.Node_Dict[from_node_name]
-                to_node = self.Node_Dict[to_node_name]
-                if from_node.Vbase != to_node.Vbase:
-                    raise ValueError(f"Nominal voltages for nodes {from_node_name} ({from_node.Vbase}) and {to_node_name} ({to_node.Vbase}) are not equal, but line {branch.name} connects them!")
-                Vbase_ln = from_node.Vbase
-                branch.Ibase = self.Sbase_1ph/Vbase_ln
-                branch.Zbase = Vbase_ln/branch.Ibase
-                branch.Z_pu_3ph = branch.Z_ohms_3ph/branch.Zbase
-                branch.Z = convert_phases(branch.Z_pu_3ph,"ABCN",branch.phases)
-                # calculate A, B, C, D matrices from Kersting
-                # V_ABC = A*V_abc + B*I_abc
-                # I_ABC = C*V_abc + D*I_abc
-                branch.A_br = np.eye(3)
-                branch.B_br = branch.Z_pu_3ph
-                branch.C_br = np.zeros(3)
-                branch.D_br = np.eye(3)
-            if branch.type in ["fake"]:
-                branch.Z_ohms_3ph = np.zeros((3,3),dtype=complex)
-                branch.Z_pu_3ph = np.zeros((3,3),dtype=complex)
-                branch.Z = convert_phases(branch.Z_pu_3ph,"ABCN",branch.phases)
-                # calculate A, B, C, D matrices from Kersting
-                # V_ABC = A*V_abc + B*I_abc
-                # I_ABC = C*V_abc + D*I_abc
-                branch.A_br = np.eye(3)
-                branch.B_br = branch.Z_pu_3ph
-                branch.C_br = np.zeros(3)
-                branch.D_br = np.eye(3)
+                if branch_config.connect_type in ["DELTA_DELTA"] and branch.phases not in ["ABCD","BCD"]:
+                    raise ValueError(f"Connection type {branch_config.connect_type} with phases {branch.phases} not yet supported for branch {branch.name}.")
+                branch.ratedKVA = branch_config.power_rating
+                xfmr_inds.append(branch.index)
+                xfmr_configs.append(branch_config)
+            elif branch.type in SWITCH_TYPES:
+                switch_inds.append(branch.index)
+                switch_Vbase.append(self.check_branch_Vbase(branch))
+            elif branch.type in ["fake"]:
+                fake_inds.append(branch.index)
+
+        if line_inds:
+            # one ohm/mile matrix per config, looked up by index
+            config_names = list(dict.fromkeys(line_config_names))
+            config_inds = {name: ind for ind, name in enumerate(config_names)}
+            Z_ohms_per_mi = np.array([self.Config_Dict[name].Z_ohms_per_mi() for name in config_names])
+            mi_per_foot = 1/5280
+            Z_ohms_3ph = (np.array(line_lengths)*mi_per_foot)[:,None,None]*Z_ohms_per_mi[[config_inds[name] for name in line_config_names]]
+            self.set_series_impedances(line_inds, Z_ohms_3ph, np.array(line_Vbase))
+
+        if switch_inds:
+            phase_masks = np.array([phase_mask(self.Branches[ind].phases) for ind in switch_inds])
+            Z_ohms_3ph = np.zeros((len(switch_inds),3,3),dtype=complex)
+            Z_ohms_3ph[:,DIAG_ROWS,DIAG_COLS] = np.where(phase_masks, complex(self.default_resistance,0.0), 0.0)
+            self.set_series_impedances(switch_inds, Z_ohms_3ph, np.array(switch_Vbase))
+
+        if xfmr_inds:
+            inds = np.array(xfmr_inds)
+            ratedKVA = np.array([config.power_rating for config in xfmr_configs])
+            z_pu = np.empty(len(xfmr_inds),dtype=complex)
+            z_pu.real = (self.Sbase_1ph/(1000*ratedKVA))*np.array([config.resistance for config in xfmr_configs])
+            z_pu.imag = (self.Sbase_1ph/(1000*ratedKVA))*np.array([config.reactance for config in xfmr_configs])
+            phase_masks = np.array([phase_mask(self.Branches[ind].phases) for ind in xfmr_inds])
+            Z_pu_3ph = np.zeros((len(xfmr_inds),3,3),dtype=complex)
+            Z_pu_3ph[:,DIAG_ROWS,DIAG_COLS] = np.where(phase_masks, z_pu[:,None], 0.0)
+            self.Z_pu_3ph_br[inds] = Z_pu_3ph
+            connect_types = np.array([config.connect_type for config in xfmr_configs])
+            phases = np.array([self.Branches[ind].phases for ind in xfmr_inds])
+
+            wye = np.isin(connect_types, ["SINGLE_PHASE","WYE_WYE"])
+            self.A_br[inds[wye]] = np.eye(3)
+            self.B_br[inds[wye]] = Z_pu_3ph[wye]
+            self.D_br[inds[wye]] = np.eye(3)
+
+            delta_gwye = connect_types == "DELTA_GWYE"
+            A_delta_gwye = -np.array([[0,2,1],[1,0,2],[2,1,0]])/np.sqrt(3)
+            self.A_br[inds[delta_gwye]] = A_delta_gwye
+            self.B_br[inds[delta_gwye]] = A_delta_gwye @ Z_pu_3ph[delta_gwye]
+            self.D_br[inds[delta_gwye]] = np.array([[1,-1,0],[0,1,-1],[-1,0,1]])/np.sqrt(3)
+
+            delta_delta = (connect_types == "DELTA_DELTA") & (phases == "ABCD")
+            self.A_br[inds[delta_delta]] = np.array([[2,-1,-1],[-1,2,-1],[-1,-1,2]])/3
+            self.B_br[inds[delta_delta]] = (z_pu[delta_delta]/3)[:,None,None]*np.array([[1,0,0],[0,1,0],[-1,-1,0]])
+            self.D_br[inds[delta_delta]] = np.eye(3)
+
+            delta_delta = (connect_types == "DELTA_DELTA") & (phases == "BCD")
+            self.A_br[inds[delta_delta]] = np.array([[2,-1,-1],[-1,2,-1],[-1,-1,2]])/3
+            self.B_br[inds[delta_delta]] = (z_pu[delta_delta]/3)[:,None,None]*np.array([[0,-0.5,0.5],[0,-1,1],[0,0,0]])
+            self.D_br[inds[delta_delta]] = np.array([[0,0,0],[0,1,0],[0,0,1]])
+
+        if fake_inds:
+            self.A_br[fake_inds] = np.eye(3)
+            self.D_br[fake_inds] = np.eye(3)
+
+        # only the branch types handled above have impedances (transformers have no Z_ohms_3ph)
+        has_Z_ohms = np.zeros(num_branches,dtype=bool)
+        has_Z_ohms[line_inds + switch_inds + fake_inds] = True
+        has_matrices = has_Z_ohms.copy()
+        has_matrices[xfmr_inds] = True
+        if branch_inds is not None:
+            for field, (array_name, _, _) in BRANCH_ARRAYS.items():
+                self.array_rows_set[array_name][branch_inds] = (has_Z_ohms if field == "Z_ohms_3ph" else has_matrices)[branch_inds]
+                for branch in branches:
+                    branch.clear_value(field)
+            return
+
+        self.attach_arrays(self.Branches, {field: getattr(self, array_name) for field, (array_name, _, _) in BRANCH_ARRAYS.items()},
+                           {field: has_Z_ohms if field == "Z_ohms_3ph" else has_matrices for field in BRANCH_ARRAYS})
+
         for shunt in self.Shunts:
             if shunt.type in ["capacitor"]:
                 Vbase = shunt.base_voltage
@@ -274,15 +312,253 @@ class PowerSystemModel:
                 else:
                     raise ValueError(f"Delta-connected cap banks not currently supported. ({shunt.name})")
 
+    def check_branch_Vbase(self, branch):
+        from_node = self.Nodes[branch.from_node_ind]
+        to_node = self.Nodes[branch.to_node_ind]
+        if from_node.Vbase != to_node.Vbase:
+            raise ValueError(f"Nominal voltages for nodes {from_node.name} ({from_node.Vbase}) and {to_node.name} ({to_node.Vbase}) are not equal, but line {branch.name} connects them!")
+        return from_node.Vbase
+
+    def set_series_impedances(self, inds, Z_ohms_3ph, Vbase_ln):
+        # lines, switches and regulators: per unit series impedance with identity A and D
+        Ibase = self.Sbase_1ph/Vbase_ln
+        Zbase = Vbase_ln/Ibase
+        self.Z_ohms_3ph_br[inds] = Z_ohms_3ph
+        self.Z_pu_3ph_br[inds] = Z_ohms_3ph/Zbase[:,None,None]
+        self.A_br[inds] = np.eye(3)
+        self.B_br[inds] = self.Z_pu_3ph_br[inds]
+        self.D_br[inds] = np.eye(3)
+        for ind, branch_Ibase, branch_Zbase in zip(inds, Ibase.tolist(), Zbase.tolist()):
+            self.Branches[ind].Ibase = branch_Ibase
+            self.Branches[ind].Zbase = branch_Zbase
+
+    def attach_arrays(self, components, arrays, rows_set=None):
+        # make the stacked arrays (component field -> array with one row per component) the storage of
+        # those fields, dropping any values held by the components themselves
+        for field, stacked in arrays.items():
+            array_name = ARRAY_FIELDS[field][0]
+            setattr(self, array_name, stacked)
+            if rows_set is not None and field in rows_set:
+                self.array_rows_set[array_name] = np.array(rows_set[field],dtype=bool)
+            else:
+                self.array_rows_set[array_name] = np.ones(len(components),dtype=bool)
+        value_slots = ["_" + field for field in arrays]
+        for obj in components:
+            obj._model = self
+            for value_slot in value_slots:
+                setattr(obj, value_slot, None)
+
+    def stack_component_arrays(self, components, array_specs):
+        # rebuild the stacked arrays from the values held by the components (after loading a pkl, or after
+        # e.g. AMI profiles were assigned to loads). Fields whose values have different shapes are left on
+        # the components.
+        arrays = {}
+        rows_set = {}
+        for field, (array_name, row_shape, dtype) in array_specs.items():
+            if array_name in self.array_rows_set:
+                values = [getattr(obj, field, None) for obj in components]
+            else:
+                # nothing stacked yet (e.g. just unpickled): the values are held by the components
+                values = [getattr(obj, "_" + field, None) for obj in components]
+            shapes = {np.shape(value) for value in values if value is not None}
+            if len(shapes) > 1:
+                # rows still held by the model move to the components
+                for obj, value in zip(components, values):
+                    if value is not None and getattr(obj, "_" + field, None) is None:
+                        setattr(obj, "_" + field, np.array(value))
+                self.__dict__.pop(array_name, None)
+                self.array_rows_set.pop(array_name, None)
+                continue
+            if shapes:
+                row_shape = shapes.pop()
+            missing = np.zeros(row_shape, dtype=dtype)
+            stacked = np.array([missing if value is None else value for value in values]).reshape((len(components),) + row_shape)
+            arrays[field] = stacked.astype(np.result_type(stacked.dtype, dtype), copy=False)
+            rows_set[field] = [value is not None for value in values]
+        self.attach_arrays(components, arrays, rows_set)
+
+    def link_injection_arrays(self):
+        self.stack_component_arrays(self.Loads, LOAD_ARRAYS)
+        self.stack_component_arrays(self.Generators, GENERATOR_ARRAYS)
+
+    def __getstate__(self):
+        # the components pickle their own rows, so the stacked arrays are rebuilt on load instead of being
+        # pickled twice
+        state = self.__dict__.copy()
+        for array_name, _, _ in list(BRANCH_ARRAYS.values()) + list(LOAD_ARRAYS.values()) + list(GENERATOR_ARRAYS.values()):
+            state.pop(array_name, None)
+        state.pop("array_rows_set", None)
+        state.pop("_topology", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.array_rows_set = {}
+        self.link_injection_arrays()
+        if any(hasattr(branch,"A_br") for branch in self.Branches):
+            self.stack_component_arrays(self.Branches, BRANCH_ARRAYS)
+
     def __repr__(self):
         return f"PowerSystemModel(Nodes={len(self.Nodes)},Branches={len(self.Branches)},Loads={len(self.Loads)},Generators={len(self.Generators)},Shunts={len(self.Shunts)})"
 
-class Node:
+class ModelArray:
+    # Component field stored as a row of a stacked array owned by the model, e.g. branch.A_br reads
+    # Model.A_br[branch.index]. A value that doesn't fit the row (e.g. an AMI profile assigned to Sload) is
+    # kept on the component instead. An unset field raises AttributeError like a plain attribute.
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.value_slot = "_" + name
+        self.array_name = ARRAY_FIELDS[name][0]
+
+    def model_row(self, obj):
+        # (stacked array, rows set) of the model obj belongs to, or None
+        model = getattr(obj, "_model", None)
+        if model is None:
+            return None
+        rows_set = model.array_rows_set.get(self.array_name)
+        if rows_set is None:
+            return None
+        return model.__dict__[self.array_name], rows_set
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        stacked = self.model_row(obj)
+        if stacked is not None and obj.index < len(stacked[1]) and stacked[1][obj.index]:
+            return stacked[0][obj.index]
+        value = getattr(obj, self.value_slot, None)
+        if value is None:
+            raise AttributeError(f"'{type(obj).__name__}' object has no attribute '{self.name}'")
+        return value
+
+    def __set__(self, obj, value):
+        stacked = self.model_row(obj)
+        if stacked is not None and obj.index < len(stacked[1]):
+            stacked_array, rows_set = stacked
+            value_array = np.asarray(value)
+            if value_array.shape == stacked_array.shape[1:] and np.can_cast(value_array.dtype, stacked_array.dtype, "same_kind"):
+                stacked_array[obj.index] = value_array
+                rows_set[obj.index] = True
+                obj.clear_value(self.name)
+                return
+            rows_set[obj.index] = False
+        setattr(obj, self.value_slot, value)
+
+    def __delete__(self, obj):
+        stacked = self.model_row(obj)
+        had_value = obj.clear_value(self.name)
+        if stacked is not None and obj.index < len(stacked[1]) and stacked[1][obj.index]:
+            stacked[1][obj.index] = False
+        elif not had_value:
+            raise AttributeError(f"'{type(obj).__name__}' object has no attribute '{self.name}'")
+
+class Component:
+    # Base of the model components. They use __slots__ instead of a per-instance __dict__, which is most
+    # of the model's memory on large feeders, so only the listed fields can be set. Array fields
+    # (ModelArray) live in stacked arrays on the model. An unset field still raises AttributeError, so
+    # hasattr (and PyCall's haskey in the Julia solvers) works as before.
+    __slots__ = ("_model", "_glm_string", "_glm_source", "_glm_offset", "_glm_length")
+    array_fields = ()
+    derived_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # fields that make up the pickled state: the public slots and the array fields
+        cls.state_fields = tuple(field for klass in cls.__mro__ for field in getattr(klass, "__slots__", ()) if not field.startswith("_")) + cls.array_fields
+        # fields copied by detached_copy: the plain slots and the GLM text reference
+        cls.copy_fields = tuple(field for klass in cls.__mro__ for field in getattr(klass, "__slots__", ())
+                                if field != "_model" and field[1:] not in cls.array_fields)
+
+    @property
+    def glm_string(self):
+        # GLM text of the object: an explicitly set string, or read on demand from the span of the GLM
+        # source it was parsed from
+        text = getattr(self, "_glm_string", None)
+        if text is None:
+            source = getattr(self, "_glm_source", None)
+            if source is None:
+                raise AttributeError(f"'{type(self).__name__}' object has no attribute 'glm_string'")
+            text = source.read(self._glm_offset, self._glm_length)
+        return text
+
+    @glm_string.setter
+    def glm_string(self, text):
+        self._glm_string = text
+        self._glm_source = None
+
+    def set_glm_source(self, source, offset, length):
+        # refer to the text at [offset, offset+length) of a GLMSource instead of holding a copy of it
+        self._glm_string = None
+        self._glm_source = source
+        self._glm_offset = offset
+        self._glm_length = length
+
+    def glm_bytes(self):
+        # GLM text as bytes, sliced straight from the source when the object has no explicit string
+        if getattr(self, "_glm_string", None) is None and getattr(self, "_glm_source", None) is not None:
+            return self._glm_source.read_bytes(self._glm_offset, self._glm_length)
+        return self.glm_string.encode()
+
+    def materialize_glm_string(self):
+        # hold a copy of the GLM text instead of a span of the source, for a model saved apart from its GLM
+        if getattr(self, "_glm_string", None) is None and getattr(self, "_glm_source", None) is not None:
+            self.glm_string = self.glm_string
+
+    def detached_copy(self):
+        # copy without the model and the array fields, for building another model from the component (which
+        # computes them again). Lists (e.g. outgoing_branches) are shared until the new model resets them.
+        new = object.__new__(type(self))
+        for field in self.copy_fields:
+            value = getattr(self, field, None)
+            if value is not None:
+                setattr(new, field, value)
+        return new
+
+    def clear_value(self, field):
+        # drop a value of an array field held by the component itself
+        if getattr(self, "_" + field, None) is None:
+            return False
+        delattr(self, "_" + field)
+        return True
+
+    def __getstate__(self):
+        state = {}
+        for field in self.state_fields:
+            value = getattr(self, field, None)
+            if value is not None:
+                state[field] = value
+        if getattr(self, "_glm_string", None) is not None:
+            state["glm_string"] = self._glm_string
+        elif getattr(self, "_glm_source", None) is not None:
+            state["glm_source"] = (self._glm_source, self._glm_offset, self._glm_length)
+        return state
+
+    def __setstate__(self, state):
+        # also accepts the __dict__ of pkls written before the components used __slots__
+        for field in self.array_fields:
+            # not attached to a model yet: keep the value until the model stacks it
+            value = state.pop(field, None)
+            if value is not None:
+                setattr(self, "_" + field, value)
+        for field in self.derived_fields:
+            state.pop(field, None)
+        glm_source = state.pop("glm_source", None)
+        if glm_source is not None:
+            self.set_glm_source(*glm_source)
+        for field, value in state.items():
+            setattr(self, field, value)
+
+COORD_FIELDS = ("X_coord", "Y_coord")
+
+class Node(Component):
+    __slots__ = ("name", "phases", "Vbase", "node_type", "parent", "index", "parent_node_ind",
+                 "outgoing_branches", "incoming_branches", "child_nodes") + COORD_FIELDS
+
     def __init__(self, name, phases, nom_volt, node_type, parent, glm_string):
         self.name = name
-        self.phases = phases
+        self.phases = intern(phases)
         self.Vbase = nom_volt # line-to-neutral, in V
-        self.node_type = node_type
+        self.node_type = intern(node_type)
         if parent is not None:
             self.parent = parent
         self.glm_string = glm_string
@@ -290,40 +566,74 @@ class Node:
     def __repr__(self):
         return f"Node(name={self.name},phases={self.phases},Vbase={self.Vbase},node_type={self.node_type})"
     
-class Branch:
+class Branch(Component):
+    __slots__ = ("type", "name", "from_node", "to_node", "phases", "index", "from_node_ind", "to_node_ind",
+                 "config", "length", "current_limit", "mean_replacement_time", "repair_dist_type", "status",
+                 "max_number_of_tries", "sense_node", "ratedKVA", "Ibase", "Zbase",
+                 "_Z_ohms_3ph", "_Z_pu_3ph", "_A_br", "_B_br", "_C_br", "_D_br",
+                 "X2_coord", "Y2_coord") + COORD_FIELDS
+    array_fields = tuple(BRANCH_ARRAYS)
+    derived_fields = ("Z",)
+    Z_ohms_3ph = ModelArray()
+    Z_pu_3ph = ModelArray()
+    A_br = ModelArray()
+    B_br = ModelArray()
+    C_br = ModelArray()
+    D_br = ModelArray()
+
     def __init__(self, type, name, from_node, to_node, phases, params, glm_string):
-        self.type = type
+        self.type = intern(type)
         self.name = name
         self.from_node = from_node
         self.to_node = to_node
-        self.phases = phases
+        self.phases = intern(phases)
         self.glm_string = glm_string
 
         if self.type in ["overhead_line","underground_line"]:
-            self.config = params[0] 
+            self.config = intern(params[0])
             self.length = params[1] # in ft
         elif self.type in ["transformer"]:
-            self.config = params[0] 
+            self.config = intern(params[0])
         elif self.type in ["fuse"]:
             self.current_limit = params[0] 
             self.mean_replacement_time = params[1] 
-            self.repair_dist_type = params[2] 
+            self.repair_dist_type = intern(params[2])
         elif self.type in ["switch"]:
-            self.status = params[0] 
+            self.status = intern(params[0])
         elif self.type in ["recloser"]:
             self.max_number_of_tries = params[0] 
         elif self.type in ["regulator"]:
-            self.config = params[0] 
+            self.config = intern(params[0])
             self.sense_node = params[1]
 
+    @property
+    def Z(self):
+        # per unit impedance reduced to the branch's own phases
+        return convert_phases(self.Z_pu_3ph,"ABCN",self.phases)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        # pickle the common identity/zero matrices, and B when it equals Z, as one shared object
+        for field, common in [("A_br",IDENTITY_3),("D_br",IDENTITY_3),("C_br",ZEROS_3)]:
+            if field in state and state[field].tobytes() == common.tobytes():
+                state[field] = common
+        if "B_br" in state and "Z_pu_3ph" in state and state["B_br"].tobytes() == state["Z_pu_3ph"].tobytes():
+            state["B_br"] = state["Z_pu_3ph"]
+        return state
+
     def __repr__(self):
         return f"Branch(type={self.type},name={self.name},from_node={self.from_node},to_node={self.to_node},phases={self.phases})"
     
-class Load:
+class Load(Component):
+    __slots__ = ("name", "parent", "phases", "base_voltage", "constant_power_A", "constant_power_B", "constant_power_C",
+                 "index", "parent_node_ind", "_Sload") + COORD_FIELDS
+    array_fields = tuple(LOAD_ARRAYS)
+    Sload = ModelArray()
+
     def __init__(self, name, parent, phases, nom_volt, params, glm_string):
         self.name = name
         self.parent = parent
-        self.phases = phases
+        self.phases = intern(phases)
         self.base_voltage = nom_volt
         self.constant_power_A = params[0]
         self.constant_power_B = params[1]
@@ -335,11 +645,16 @@ class Load:
     def __repr__(self):
         return f"Load(name={self.name},parent={self.parent},phases={self.phases},base_voltage={self.base_voltage})"
     
-class Generator:
+class Generator(Component):
+    __slots__ = ("name", "parent", "phases", "base_voltage", "constant_power_A", "constant_power_B", "constant_power_C",
+                 "index", "parent_node_ind", "_Sgen") + COORD_FIELDS
+    array_fields = tuple(GENERATOR_ARRAYS)
+    Sgen = ModelArray()
+
     def __init__(self, name, parent, phases, nom_volt, params, glm_string):
         self.name = name
         self.parent = parent
-        self.phases = phases
+        self.phases = intern(phases)
         self.base_voltage = nom_volt
         self.constant_power_A = params[0]
         self.constant_power_B = params[1]
@@ -351,12 +666,16 @@ class Generator:
     def __repr__(self):
         return f"Gen(name={self.name},parent={self.parent},phases={self.phases},base_voltage={self.base_voltage})"
     
-class Shunt:
+class Shunt(Component):
+    __slots__ = ("type", "name", "parent", "phases", "base_voltage", "index", "parent_node_ind",
+                 "phases_connected", "capacitor_A", "capacitor_B", "capacitor_C", "control_level", "control", "pt_phase",
+                 "switchA", "switchB", "switchC", "Ibase", "Ybase", "Ycap") + COORD_FIELDS
+
     def __init__(self, type, name, parent, phases, nom_volt, params, glm_string):
-        self.type = type
+        self.type = intern(type)
         self.name = name
         self.parent = parent
-        self.phases = phases
+        self.phases = intern(phases)
         self.base_voltage = nom_volt
         self.glm_string = glm_string
 
@@ -375,9 +694,13 @@ class Shunt:
     def __repr__(self):
         return f"Shunt(type={self.type},name={self.name},parent={self.parent},phases={self.phases},base_voltage={self.base_voltage})"
     
-class Config:
+class Config(Component):
+    __slots__ = ("type", "name", "index",
+                 "z11", "z12", "z13", "z21", "z22", "z23", "z31", "z32", "z33",
+                 "connect_type", "install_type", "power_rating", "primary_voltage", "secondary_voltage", "resistance", "reactance")
+
     def __init__(self, type, name, params, glm_string):
-        self.type = type
+        self.type = intern(type)
         self.name = name
         self.glm_string = glm_string
 
@@ -404,5 +727,10 @@ class Config:
         #elif self.type in ["regulator_configuration"]:
 
 
+    def Z_ohms_per_mi(self):
+        return np.array([[self.z11,self.z12,self.z13],
+                         [self.z21,self.z22,self.z23],
+                         [self.z31,self.z32,self.z33]])
+
     def __repr__(self):
         return f"Config(type={self.type},name={self.name})"
\ No newline at end of file
@@ -0,0 +1,153 @@
+import os
+import json
+import numpy as np
+from GLM_Tools.glm_reader import load_model
+
+# Structure-of-arrays copy of a PowerSystemModel: one .npy file per array plus a JSON file with names and
+# scalars. Only numpy is needed to load it, and the arrays are memory-mapped, so loading is nearly instant
+# and processes that map the same directory share the pages.
+
+COLUMNAR_FORMAT_VERSION = 1
+META_FILE_NAME = "model_meta.json"
+
+def phase_mask(phases):
+    return [ph in phases for ph in "ABC"]
+
+def injection_arrays(components, field):
+    # (constant powers (n,3), profiles (n,T,3) or None, profile mask (n,)) of the loads' Sload or the
+    # generators' Sgen. A component holds either a constant (3,) or a profile (T,3), e.g. AMI data from
+    # populate_ami_loads_pkl. Profiled rows are 0 in the constants, constant rows are repeated over the
+    # profile times, and components without a value are 0 in both.
+    values = [getattr(obj, field, None) for obj in components]
+    constant = np.zeros((len(components),3), dtype=complex)
+    is_profile = np.zeros(len(components), dtype=bool)
+    num_times = None
+    for ind, (obj, value) in enumerate(zip(components, values)):
+        if value is None:
+            continue
+        shape = np.shape(value)
+        if shape == (3,):
+            constant[ind] = value
+        elif len(shape) == 2 and shape[1] == 3:
+            if num_times is not None and shape[0] != num_times:
+                raise ValueError(f"{obj.name} has a {field} profile of {shape[0]} times, other components have {num_times}. "
+                                 "Profiles must all have the same length to be exported.")
+            num_times = shape[0]
+            is_profile[ind] = True
+        else:
+            raise ValueError(f"{obj.name} has a {field} of shape {shape}, expected (3,) or (T,3).")
+    if num_times is None:
+        return constant, None, is_profile
+    profiles = np.repeat(constant[:,None,:], num_times, axis=1)
+    for ind in np.flatnonzero(is_profile).tolist():
+        profiles[ind] = values[ind]
+    return constant, profiles, is_profile
+
+def export_columnar_model(Model, model_dir):
+    # Model must have had compute_impedances() run so every branch has its A, B, C, D matrices
+    for branch in Model.Branches:
+        if not hasattr(branch, "A_br"):
+            raise ValueError(f"Branch {branch.name} has no A_br. Run compute_impedances() before exporting the model.")
+
+    arrays = {}
+    arrays["node_Vbase"] = np.array([node.Vbase for node in Model.Nodes], dtype=float)
+    arrays["node_phases"] = np.array([phase_mask(node.phases) for node in Model.Nodes], dtype=bool).reshape(-1,3)
+    arrays["node_parent_ind"] = np.array([getattr(node, "parent_node_ind", -1) for node in Model.Nodes], dtype=np.int64)
+
+    arrays["branch_from_ind"] = np.array([branch.from_node_ind for branch in Model.Branches], dtype=np.int64)
+    arrays["branch_to_ind"] = np.array([branch.to_node_ind for branch in Model.Branches], dtype=np.int64)
+    arrays["branch_phases"] = np.array([phase_mask(branch.phases) for branch in Model.Branches], dtype=bool).reshape(-1,3)
+    arrays["A_br"] = np.array([branch.A_br for branch in Model.Branches], dtype=float).reshape(-1,3,3)
+    arrays["B_br"] = np.array([branch.B_br for branch in Model.Branches], dtype=complex).reshape(-1,3,3)
+    arrays["C_br"] = np.array([branch.C_br for branch in Model.Branches], dtype=complex).reshape(-1,3)
+    arrays["D_br"] = np.array([branch.D_br for branch in Model.Branches], dtype=float).reshape(-1,3,3)
+
+    arrays["load_parent_ind"] = np.array([load.parent_node_ind for load in Model.Loads], dtype=np.int64)
+    arrays["gen_parent_ind"] = np.array([gen.parent_node_ind for gen in Model.Generators], dtype=np.int64)
+    # Sload/Sgen (n,3) constants, plus Sload_profile/Sgen_profile (n,T,3) and their masks when some loads or
+    # generators hold a profile
+    for components, field in [(Model.Loads, "Sload"), (Model.Generators, "Sgen")]:
+        constant, profiles, is_profile = injection_arrays(components, field)
+        arrays[field] = constant
+        if profiles is not None:
+            arrays[f"{field}_profile"] = profiles
+            arrays[f"{field}_profile_mask"] = is_profile
+
+    capacitors = [shunt for shunt in Model.Shunts if shunt.type in ["capacitor"]]
+    arrays["cap_parent_ind"] = np.array([shunt.parent_node_ind for shunt in capacitors], dtype=np.int64)
+    arrays["Ycap"] = np.array([shunt.Ycap for shunt in capacitors], dtype=complex).reshape(-1,3,3)
+    arrays["cap_status"] = np.array([[getattr(shunt, f"switch{ph}") == "CLOSED" for ph in "ABC"] for shunt in capacitors], dtype=bool).reshape(-1,3)
+
+    meta = {
+        "format_version": COLUMNAR_FORMAT_VERSION,
+        "Sbase_3ph": Model.Sbase_3ph,
+        "Sbase_1ph": Model.Sbase_1ph,
+        "node_names": [node.name for node in Model.Nodes],
+        "node_types": [node.node_type for node in Model.Nodes],
+        "branch_names": [branch.name for branch in Model.Branches],
+        "branch_types": [branch.type for branch in Model.Branches],
+        "load_names": [load.name for load in Model.Loads],
+        "gen_names": [gen.name for gen in Model.Generators],
+        "cap_names": [shunt.name for shunt in capacitors],
+        "arrays": sorted(arrays),
+    }
+
+    if not os.path.exists(model_dir):
+        os.makedirs(model_dir)
+    # remove the metadata first so a half-written directory is never loaded
+    meta_file = os.path.join(model_dir, META_FILE_NAME)
+    if os.path.isfile(meta_file):
+        os.remove(meta_file)
+    for array_name, array in arrays.items():
+        np.save(os.path.join(model_dir, f"{array_name}.npy"), array)
+    with open(meta_file, 'w') as file:
+        json.dump(meta, file)
+
+class ColumnarModel:
+    def __init__(self, model_dir, mmap_mode="r"):
+        meta_file = os.path.join(model_dir, META_FILE_NAME)
+        if not os.path.isfile(meta_file):
+            raise ValueError(f"No columnar model found in {model_dir}")
+        with open(meta_file, 'r') as file:
+            meta = json.load(file)
+        if meta["format_version"] != COLUMNAR_FORMAT_VERSION:
+            raise ValueError(f"Columnar model format {meta['format_version']} in {model_dir} is not supported (expected {COLUMNAR_FORMAT_VERSION}). Re-export the model.")
+
+        self.model_dir = model_dir
+        self.Sbase_3ph = meta["Sbase_3ph"]
+        self.Sbase_1ph = meta["Sbase_1ph"]
+        self.node_names = meta["node_names"]
+        self.node_types = meta["node_types"]
+        self.branch_names = meta["branch_names"]
+        self.branch_types = meta["branch_types"]
+        self.load_names = meta["load_names"]
+        self.gen_names = meta["gen_names"]
+        self.cap_names = meta["cap_names"]
+        for array_name in meta["arrays"]:
+            setattr(self, array_name, np.load(os.path.join(model_dir, f"{array_name}.npy"), mmap_mode=mmap_mode))
+
+        self.num_nodes = len(self.node_names)
+        self.num_branches = len(self.branch_names)
+        self._node_index = None
+
+    def node_index(self, node_name):
+        if self._node_index is None:
+            self._node_index = {name: ind for ind, name in enumerate(self.node_names)}
+        return self._node_index[node_name]
+
+    def __repr__(self):
+        return f"ColumnarModel(Nodes={self.num_nodes},Branches={self.num_branches},Loads={len(self.load_names)},Generators={len(self.gen_names)},Capacitors={len(self.cap_names)})"
+
+def load_columnar_model(model_dir, mmap_mode="r"):
+    return ColumnarModel(model_dir, mmap_mode)
+
+def columnar_model_dir(root_dir, substation_name):
+    return f"{root_dir}/Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model_Columnar"
+
+def export_pkl_to_columnar(root_dir, substation_name):
+    pkl_file = f"{root_dir}/Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model.pkl"
+    Model = load_model(pkl_file)
+    model_dir = columnar_model_dir(root_dir, substation_name)
+    export_columnar_model(Model, model_dir)
+    print(f"Columnar model saved to {model_dir}.")
+    return model_dir
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+# Split a radial feeder into k connected pieces of balanced weight (node count or AMI load), e.g. to
+# simulate or analyse subfeeders in parallel. Pieces are cut at tree branches: a cut branch leaves the
+# subtree below it to another piece, whose boundary node is the node on the parent side of the cut (the
+# voltage the piece is fed from). Fake branches (meters parented to nodes) are never cut.
+# For a bound B on the piece weight, cutting the heaviest child subtrees bottom-up until every node's
+# remaining subtree fits in B gives the fewest pieces (Kundu & Misra). B is bisected to the smallest bound
+# that needs at most k pieces, then the heaviest pieces are split in two until there are k.
+
+def node_weights(Model, weight="nodes"):
+    # "nodes": 1 per energized node, "load": mean real power (per unit) of the loads at each node over their
+    # AMI profile, or an array (n_nodes,) given as is
+    if not isinstance(weight, str):
+        return np.asarray(weight, dtype=float)
+    if weight == "nodes":
+        return Model.topology.reached.astype(float)
+    if weight == "load":
+        weights = np.zeros(len(Model.Nodes))
+        for load in Model.Loads:
+            Sload = getattr(load, "Sload", None)
+            if Sload is not None:
+                Sload = np.asarray(Sload)
+                weights[load.parent_node_ind] += np.sum(Sload.real)/(Sload.shape[0] if Sload.ndim == 2 else 1)
+        return np.abs(weights)
+    raise ValueError(f"Unknown partition weight {weight}. Expected nodes, load or an array of node weights.")
+
+class TreePartitioner:
+    def __init__(self, Model, weights):
+        topology = Model.topology
+        self.topology = topology
+        self.weights = weights
+        # children before parents, and the nodes whose parent branch can be cut
+        self.order = topology.bfs_order[::-1].tolist()
+        self.parent = topology.parent_node.tolist()
+        self.cuttable = [False]*topology.num_nodes
+        for node_ind in topology.bfs_order[len(topology.roots):].tolist():
+            self.cuttable[node_ind] = Model.Branches[topology.parent_branch[node_ind]].type not in ["fake"]
+
+    def greedy_cuts(self, bound, cuts=()):
+        # (fewest cuts so that no piece weighs more than bound, None if it can't be done, remaining subtree
+        # weight of every node), on top of the given cuts
+        cuts = set(cuts)
+        remaining = [0.0]*len(self.parent)
+        children = [[] for _ in self.parent]
+        feasible = True
+        for node_ind in self.order:
+            weight = self.weights[node_ind] + sum(remaining[child] for child in children[node_ind])
+            if weight > bound:
+                for child in sorted(children[node_ind], key=lambda child: remaining[child], reverse=True):
+                    if weight <= bound:
+                        break
+                    if self.cuttable[child]:
+                        cuts.add(child)
+                        weight -= remaining[child]
+                feasible = feasible and weight <= bound
+            remaining[node_ind] = weight
+            parent = self.parent[node_ind]
+            if parent >= 0 and node_ind not in cuts:
+                children[parent].append(node_ind)
+        return (cuts if feasible else None), remaining
+
+    def split_heaviest(self, cuts):
+        # cut the subtree that splits the heaviest piece most evenly
+        _, remaining = self.greedy_cuts(np.inf, cuts)
+        piece_roots = list(cuts) + self.topology.roots.tolist()
+        heaviest = max(piece_roots, key=lambda root: remaining[root])
+        piece = piece_of_nodes(self.topology, cuts)
+        candidates = [node_ind for node_ind in self.topology.bfs_order.tolist()
+                      if piece[node_ind] == piece[heaviest] and node_ind != heaviest and self.cuttable[node_ind]]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda node_ind: abs(remaining[heaviest] - 2*remaining[node_ind]))
+        return cuts | {best}
+
+def piece_of_nodes(topology, cuts):
+    # piece of every node: the node at the top of its piece (a root or a node below a cut), -1 if unreached
+    piece = np.full(topology.num_nodes, -1, dtype=np.int64)
+    piece[topology.roots] = topology.roots
+    parent_node = topology.parent_node
+    for node_ind in topology.bfs_order[len(topology.roots):].tolist():
+        piece[node_ind] = node_ind if node_ind in cuts else piece[parent_node[node_ind]]
+    return piece
+
+def partition_feeder(Model, k, weight="nodes", tol=1e-6):
+    # (piece index of every node (-1 if unreached), pieces DataFrame) of a radial feeder cut into k
+    # connected pieces (fewer if the feeder has fewer cuttable branches), balanced by weight (see
+    # node_weights). Each piece row: its top node (root_node), the cut branch above it, its boundary node
+    # (parent side of the cut, None for the pieces holding a SWING node) and parent piece, its node count
+    # and weight.
+    topology = Model.topology
+    weights = node_weights(Model, weight)
+    partitioner = TreePartitioner(Model, weights)
+    num_roots = len(topology.roots)
+    total = weights[topology.reached].sum()
+
+    low = max(total/max(k, 1), weights[topology.reached].max(initial=0.0))
+    high = total
+    cuts, _ = partitioner.greedy_cuts(high)
+    while high - low > tol*max(total, 1.0):
+        middle = (low + high)/2
+        middle_cuts, _ = partitioner.greedy_cuts(middle)
+        if middle_cuts is not None and len(middle_cuts) + num_roots <= k:
+            high, cuts = middle, middle_cuts
+        else:
+            low = middle
+    if cuts is None:
+        cuts = set()
+    while len(cuts) + num_roots < k:
+        split = partitioner.split_heaviest(cuts)
+        if split is None:
+            break
+        cuts = split
+
+    piece_roots = [node_ind for node_ind in topology.bfs_order.tolist() if node_ind in cuts or topology.parent_node[node_ind] < 0]
+    piece_index = {root: ind for ind, root in enumerate(piece_roots)}
+    top = piece_of_nodes(topology, cuts)
+    node_piece = np.where(top >= 0, [piece_index.get(node_ind, -1) for node_ind in top.tolist()], -1)
+    reached = topology.reached
+    num_nodes = np.bincount(node_piece[reached], minlength=len(piece_roots))
+    piece_weights = np.bincount(node_piece[reached], weights=weights[reached], minlength=len(piece_roots))
+
+    rows = []
+    for ind, root in enumerate(piece_roots):
+        is_cut = root in cuts
+        boundary = topology.parent_node[root] if is_cut else -1
+        rows.append({"piece": ind,
+                     "root_node": Model.Nodes[root].name,
+                     "cut_branch": Model.Branches[topology.parent_branch[root]].name if is_cut else None,
+                     "boundary_node": Model.Nodes[boundary].name if is_cut else None,
+                     "parent_piece": int(node_piece[boundary]) if is_cut else -1,
+                     "num_nodes": int(num_nodes[ind]),
+                     "weight": piece_weights[ind]})
+    return node_piece, pd.DataFrame(rows)
+
+def partition_subfeeder_specs(pieces, prefix="part"):
+    # {subfeeder name: (start node, branches to remove)} of the pieces, for modif_tools.create_subfeeders.
+    # Each piece is cut from its parent by its own cut branch and from its children by theirs.
+    specs = {}
+    for piece in pieces.itertuples():
+        child_cuts = pieces.loc[pieces["parent_piece"] == piece.piece, "cut_branch"].tolist()
+        own_cut = [] if pd.isna(piece.cut_branch) else [piece.cut_branch]
+        specs[f"{prefix}{piece.piece}"] = (piece.root_node, own_cut + child_cuts)
+    return specs
@@ -0,0 +1,235 @@
+import os
+import re
+import mmap
+import pickle
+import threading
+from GLM_Tools import model_cache
+
+# Tokens that change the reader state, told apart by match.lastindex:
+# 1: a whole flat object (no nested blocks, quotes or comments), the common case
+# 2: quoted strings and comments (skipped so braces inside them are ignored)
+# 3: "object <type> {" headers, 4: "object <type>" at the end of a block with its "{" still to come
+# 5/6: bare braces
+GLM_TOKEN_RE = re.compile(rb'\bobject\s+([^\s{};]+)\s*\{[^{}"/]*(?:/(?!/)[^{}"/]*)*\}'
+                          rb'|("[^"\n]*"|//[^\n]*)'
+                          rb'|\bobject\s+([^\s{};]+)\s*\{'
+                          rb'|\bobject\s+([^\s{};]+)\s*$'
+                          rb'|(\{)|(\})')
+FLAT, SKIP, OPEN_OBJ, PENDING_OBJ, OPEN, CLOSE = 1, 2, 3, 4, 5, 6
+GLM_NAME_RE = re.compile(r"\bname\s+([^\s;{}][^;{}]*?)\s*;")
+
+class GLMObject:
+    def __init__(self, obj_type, offset, depth, parent_obj):
+        self.obj_type = obj_type
+        self.offset = offset # byte offset of "object" in the file
+        self.length = None # byte length up to and including the closing brace
+        self.depth = depth # 0 for top level objects
+        self.parent_obj = parent_obj
+        self.children = []
+        self.text = None
+        self.name = None
+        self.parent = None # name of the enclosing object, for nested objects
+        self.contiguous = True # True if text is exactly the bytes at offset (no nested objects cut out, no parent added, no \r\n)
+
+    def __repr__(self):
+        return f"GLMObject(type={self.obj_type},name={self.name},offset={self.offset},length={self.length},parent={self.parent})"
+
+class GLMReader:
+    # Incremental reader for GLM files. Iterating yields every object (nested children included, parents
+    # first) as soon as its enclosing top level object is closed. The file is scanned in blocks of
+    # chunk_size bytes and only the bytes of the currently open top level object are kept, so memory is
+    # bounded by chunk_size plus the largest top level object rather than by the file size. The file must
+    # be opened in binary mode so offsets are byte offsets. Text before the first object is kept in .header.
+    def __init__(self, file, chunk_size=1<<20):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.header = ""
+
+    def __iter__(self):
+        window = b"" # bytes still needed, starting at file offset window_pos
+        window_pos = 0
+        keep_from = 0 # earliest file offset still needed (header or open top level object)
+        tail = b""
+        in_header = True
+        stack = [] # open blocks: GLMObject for objects, None for any other {...} block
+        pending_obj = None # "object <type>" seen at the end of a block, waiting for its "{"
+        top_obj = None
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            data = tail + chunk
+            if chunk:
+                # only scan complete lines so tokens are never split between blocks
+                cut = data.rfind(b"\n") + 1
+                if cut == 0:
+                    tail = data
+                    continue
+            else:
+                cut = len(data)
+            scan_pos = len(window) - (keep_from - window_pos)
+            window = window[keep_from - window_pos:] + data[:cut]
+            window_pos = keep_from
+            tail = data[cut:]
+            for token in GLM_TOKEN_RE.finditer(window, scan_pos):
+                kind = token.lastindex
+                if kind == SKIP:
+                    continue
+                token_pos = window_pos + token.start()
+                if kind == PENDING_OBJ:
+                    pending_obj = (token.group(PENDING_OBJ), token_pos)
+                    continue
+                if kind == FLAT or kind == OPEN_OBJ or (kind == OPEN and pending_obj is not None):
+                    if kind == OPEN:
+                        obj_type, obj_pos = pending_obj
+                    else:
+                        obj_type, obj_pos = token.group(kind), token_pos
+                    pending_obj = None
+                    parent_obj = stack[-1] if stack else None
+                    if stack and parent_obj is None:
+                        # object inside a non-object block (e.g. a class definition): not an object we can use
+                        if kind != FLAT:
+                            stack.append(None)
+                        continue
+                    glm_obj = GLMObject(obj_type.decode().strip('"'), obj_pos, len(stack), parent_obj)
+                    if parent_obj is not None:
+                        parent_obj.children.append(glm_obj)
+                    elif in_header:
+                        in_header = False
+                        self.header = window[:obj_pos - window_pos].decode(errors="replace").replace("\r\n","\n")
+                    if kind == FLAT:
+                        glm_obj.length = window_pos + token.end() - obj_pos
+                        if parent_obj is None:
+                            yield from self._finalize(glm_obj, window, window_pos)
+                            keep_from = window_pos + token.end()
+                        continue
+                    if parent_obj is None:
+                        top_obj = glm_obj
+                        keep_from = obj_pos
+                    stack.append(glm_obj)
+                elif kind == OPEN:
+                    stack.append(None)
+                else:
+                    if not stack:
+                        continue
+                    glm_obj = stack.pop()
+                    if glm_obj is None:
+                        continue
+                    glm_obj.length = token_pos + 1 - glm_obj.offset
+                    if glm_obj is top_obj:
+                        # emit the whole tree from the raw bytes of this top level object
+                        yield from self._finalize(glm_obj, window, window_pos)
+                        top_obj = None
+                        keep_from = token_pos + 1
+            if top_obj is None and not in_header:
+                keep_from = window_pos + len(window)
+            if not chunk:
+                break
+        if in_header:
+            self.header = window.decode(errors="replace").replace("\r\n","\n")
+
+    def _finalize(self, top_obj, raw, base):
+        objs = []
+        self._build_text(top_obj, raw, base, objs)
+        for glm_obj in objs:
+            glm_obj.parent_obj = None
+            glm_obj.children = []
+        return objs
+
+    def _build_text(self, glm_obj, raw, base, objs):
+        # own text of an object: its block with nested object blocks (and a trailing ";") cut out
+        start = glm_obj.offset - base
+        end = start + glm_obj.length
+        pieces = []
+        cursor = start
+        for child in glm_obj.children:
+            child_start = child.offset - base
+            child_end = child_start + child.length
+            pieces.append(raw[cursor:child_start])
+            cursor = child_end
+            while cursor < end and raw[cursor:cursor+1] in (b" ", b"\t"):
+                cursor += 1
+            if raw[cursor:cursor+1] == b";":
+                cursor += 1
+        pieces.append(raw[cursor:end])
+        glm_obj.text = b"".join(pieces).decode(errors="replace").replace("\r\n","\n")
+        glm_obj.contiguous = len(glm_obj.children) == 0 and raw.find(b"\r", start, end) < 0
+        name_match = GLM_NAME_RE.search(glm_obj.text)
+        if name_match:
+            glm_obj.name = name_match.group(1)
+        if glm_obj.parent_obj is not None:
+            glm_obj.parent = glm_obj.parent_obj.name
+            # nested objects inherit their enclosing object as parent unless one is given explicitly
+            if glm_obj.parent is not None and not re.search(r"\bparent\s", glm_obj.text):
+                brace = glm_obj.text.find("{") + 1
+                glm_obj.text = glm_obj.text[:brace] + f"\n\tparent {glm_obj.parent};" + glm_obj.text[brace:]
+                glm_obj.contiguous = False
+        objs.append(glm_obj)
+        for child in glm_obj.children:
+            self._build_text(child, raw, base, objs)
+
+def iter_glm_objects(glm_file):
+    # Convenience wrapper: yield the objects of a GLM file by path
+    with open(glm_file, 'rb') as file:
+        yield from GLMReader(file)
+
+# Feeder_Data/<substation> directory of the pkl being unpickled by load_model on this thread, which the
+# GLM sources in it are resolved against
+LOADING_TREE = threading.local()
+
+class GLMSource:
+    # A GLM file that components read their glm_string from on demand, by (offset, length), instead of
+    # holding a copy of their text. The file is memory-mapped on first use, so processes reading the same
+    # GLM share its pages. entry is the model_cache.file_entry of the file when the model was built: the
+    # file is checked against it before use, so text is never read from a GLM that has changed since.
+    # tree_dir is the Feeder_Data/<substation> directory of the model: the path is pickled relative to it,
+    # so a pkl loaded by load_model finds the GLM of its own tree after the tree is moved or copied.
+    def __init__(self, glm_file, entry=None, tree_dir=None):
+        self.path = os.path.abspath(glm_file)
+        self.tree_path = os.path.relpath(self.path, os.path.abspath(tree_dir)) if tree_dir is not None else None
+        self.entry = entry if entry is not None else model_cache.file_entry(glm_file)
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            if not os.path.isfile(self.path):
+                raise ValueError(f"GLM source {self.path} of the model no longer exists. Re-run parse_glm_to_pkl.")
+            file_stat = os.stat(self.path)
+            if file_stat.st_size != self.entry["size"] or (file_stat.st_mtime_ns != self.entry["mtime_ns"] and model_cache.file_digest(self.path) != self.entry["sha256"]):
+                raise ValueError(f"GLM source {self.path} changed since the model was built. Re-run parse_glm_to_pkl.")
+            with open(self.path, 'rb') as file:
+                self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if file_stat.st_size > 0 else b""
+        return self._data
+
+    def read_bytes(self, offset, length):
+        return self.data[offset:offset+length]
+
+    def read(self, offset, length):
+        return self.read_bytes(offset, length).decode(errors="replace")
+
+    def __getstate__(self):
+        # the mapping is reopened on first use after loading
+        return {"path": self.path, "tree_path": self.tree_path, "entry": self.entry}
+
+    def __setstate__(self, state):
+        # the absolute path it was built from is kept for pkls loaded without load_model, pkls outside a
+        # Feeder_Data/<substation> tree (no GLM at the relative path) and older pkls
+        self.tree_path = state.get("tree_path")
+        self.path = state["path"]
+        tree_dir = getattr(LOADING_TREE, "dir", None)
+        if self.tree_path is not None and tree_dir is not None and os.path.isfile(os.path.join(tree_dir, self.tree_path)):
+            self.path = os.path.join(tree_dir, self.tree_path)
+        self.entry = state["entry"]
+        self._data = None
+
+    def __repr__(self):
+        return f"GLMSource(path={self.path},size={self.entry['size']})"
+
+def load_model(pkl_file):
+    # Unpickle a model saved in Feeder_Data/<substation>/Python_Model/, with its GLM sources resolved
+    # against the Feeder_Data/<substation> directory of the pkl
+    LOADING_TREE.dir = os.path.dirname(os.path.dirname(os.path.abspath(pkl_file)))
+    try:
+        with open(pkl_file, 'rb') as file:
+            return pickle.load(file)
+    finally:
+        LOADING_TREE.dir = None
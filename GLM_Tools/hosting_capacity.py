@@ -0,0 +1,177 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from GLM_Tools.power_flow import POWER_FLOW_SOLVERS, node_injections
+from GLM_Tools.columnar_model import phase_mask
+
+# PV hosting capacity on the native power flow, instead of editing the GLM and re-running GridLAB-D per
+# candidate. For every candidate node and phase, the largest single-phase PV (kW) added there that keeps
+#   - every energized node phase within [V_min, V_max] pu
+#   - every rated branch within its thermal limit: transformers at their kVA rating, fuses at their
+#     current_limit, and any other branch given in branch_current_limits (amps)
+#   - the power flow converging
+# is found by bisection. Candidates are bisected together: each bisection step is one batched power flow
+# with a column per candidate (like the time steps of solve_time_series), warm started from the base case
+# and reusing the solver's factorization. Groups of candidates run on a process pool.
+
+LIMIT_NAMES = np.array(["none", "voltage", "thermal", "convergence", "base case"])
+
+def branch_thermal_limits(Model, branch_current_limits=None):
+    # (branch indices, per unit current limits (n,3), inf on the phases a branch doesn't have)
+    branch_current_limits = {} if branch_current_limits is None else branch_current_limits
+    branch_inds = []
+    limits = []
+    for branch in Model.Branches:
+        Vbase = Model.Nodes[branch.from_node_ind].Vbase
+        if branch.name in branch_current_limits:
+            limit = branch_current_limits[branch.name]/(Model.Sbase_1ph/Vbase)
+        elif branch.type in ["transformer"] and getattr(branch, "ratedKVA", None):
+            # rated current per phase at nominal voltage
+            limit = 1000*branch.ratedKVA/max(sum(phase_mask(branch.phases)), 1)/Model.Sbase_1ph
+        elif branch.type in ["fuse"] and getattr(branch, "current_limit", None):
+            limit = branch.current_limit/(Model.Sbase_1ph/Vbase)
+        else:
+            continue
+        branch_inds.append(branch.index)
+        limits.append(np.where(phase_mask(branch.phases), limit, np.inf))
+    return np.array(branch_inds, dtype=np.int64), np.array(limits, dtype=float).reshape(-1,3)
+
+class HostingCapacityStudy:
+    # Everything a worker needs to bisect candidates: the solver, the base case and the limits
+    def __init__(self, solver, s_base, node_phases, thermal_branches, thermal_limits, V_min, V_max, tol, max_iter):
+        self.solver = solver
+        self.s_base = s_base[solver.nodes]
+        self.node_phases = node_phases[solver.nodes]
+        self.thermal_branches = thermal_branches
+        self.thermal_limits = thermal_limits
+        self.V_min = V_min
+        self.V_max = V_max
+        self.tol = tol
+        self.max_iter = max_iter
+        V, _, converged, _ = solver.iterate(self.s_base[None], solver.initial_voltages(), tol, max_iter)
+        self.V_base = V[0]
+        self.base_limit = self.check(self.s_base[None], V, converged)[0]
+
+    def check(self, s, V, converged):
+        # limit violated by every column (index into LIMIT_NAMES, 0 if none)
+        V_mag = np.abs(V)
+        voltage = np.any(self.node_phases & ((V_mag < self.V_min) | (V_mag > self.V_max)), axis=(1,2))
+        thermal = np.zeros(len(V), dtype=bool)
+        if len(self.thermal_branches) > 0:
+            I_br = self.solver.branch_currents(s, V)[:,self.thermal_branches]
+            thermal = np.any(np.abs(I_br) > self.thermal_limits, axis=(1,2))
+        return np.select([~converged, voltage, thermal], [3, 1, 2], 0)
+
+    def bisect(self, positions, phases, s_pv, max_kw, resolution_kw):
+        # capacities (kW) and limits of the candidates (positions in solver.nodes, phases 0-2). s_pv: per
+        # unit power of 1 kW of PV (negative, generation).
+        num_candidates = len(positions)
+        low = np.zeros(num_candidates)
+        high = np.full(num_candidates, float(max_kw))
+        limit = np.zeros(num_candidates, dtype=np.int64)
+        if self.base_limit != 0:
+            return low, np.full(num_candidates, 4)
+        candidate_inds = np.arange(num_candidates)
+        for _ in range(int(np.ceil(np.log2(max(max_kw/resolution_kw, 1))))):
+            middle = (low + high)/2
+            s = np.repeat(self.s_base[None], num_candidates, axis=0)
+            s[candidate_inds,positions,phases] += middle*s_pv
+            V = np.repeat(self.V_base[None], num_candidates, axis=0)
+            V, _, converged, _ = self.solver.iterate(s, V, self.tol, self.max_iter)
+            step_limit = self.check(s, V, converged)
+            feasible = step_limit == 0
+            low = np.where(feasible, middle, low)
+            high = np.where(feasible, high, middle)
+            limit = np.where(feasible, limit, step_limit)
+        return low, limit
+
+WORKER = {}
+
+def init_worker(study):
+    # Process pool initializer: keep the study (solver factored once per worker) for the worker's tasks
+    WORKER["study"] = study
+
+def bisect_candidates(positions, phases, s_pv, max_kw, resolution_kw):
+    # Process pool worker
+    return WORKER["study"].bisect(positions, phases, s_pv, max_kw, resolution_kw)
+
+def hosting_capacity(Model, node_names=None, t_ind=0, s_net=None, V_min=0.95, V_max=1.05, branch_current_limits=None,
+                     max_kw=5000.0, resolution_kw=1.0, power_factor=1.0, method="fbs", num_workers=1, batch_size=32,
+                     tol=1e-8, max_iter=30):
+    # Per node and phase hosting capacity table (pandas DataFrame).
+    # node_names: candidate nodes (default: every energized node but the SWING node(s)), each on each of its
+    #   phases
+    # t_ind, s_net: base case loading, from the model's loads and generators at time index t_ind (e.g. the
+    #   minimum load hour) unless s_net (n_nodes,3) per unit power consumed is given
+    # max_kw, resolution_kw: bisection range and resolution of the capacities
+    # power_factor: of the added PV, absorbing reactive power below 1
+    # method: power flow solver, "fbs" (radial feeders) or "zbus" (also meshed ones)
+    # limit column: what stopped the PV from growing (voltage, thermal, convergence), "none" if max_kw was
+    #   reached and "base case" if the base case already violates a limit
+    solver = POWER_FLOW_SOLVERS[method](Model)
+    if s_net is None:
+        s_net = node_injections(Model, t_ind)
+    node_phases = np.array([phase_mask(node.phases) for node in Model.Nodes], dtype=bool).reshape(-1,3)
+    thermal_branches, thermal_limits = branch_thermal_limits(Model, branch_current_limits)
+    study = HostingCapacityStudy(solver, np.asarray(s_net, dtype=complex), node_phases, thermal_branches, thermal_limits,
+                                 V_min, V_max, tol, max_iter)
+
+    if node_names is None:
+        node_inds = solver.nodes
+    else:
+        node_inds = np.array([Model.Node_Dict[name].index for name in node_names], dtype=np.int64)
+        if np.any(solver.position_of(node_inds) < 0):
+            raise ValueError("Candidate nodes must be energized and not SWING nodes.")
+    cand_nodes, cand_phases = np.nonzero(node_phases[node_inds])
+    cand_nodes = node_inds[cand_nodes]
+    positions = solver.position_of(cand_nodes)
+    s_pv = -1000*complex(1, -np.tan(np.arccos(power_factor)))/Model.Sbase_1ph
+
+    groups = [slice(start, start + batch_size) for start in range(0, len(cand_nodes), batch_size)]
+    capacity = np.zeros(len(cand_nodes))
+    limit = np.zeros(len(cand_nodes), dtype=np.int64)
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    if num_workers <= 1:
+        results = [study.bisect(positions[group], cand_phases[group], s_pv, max_kw, resolution_kw) for group in groups]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker, initargs=(study,)) as executor:
+            results = list(executor.map(bisect_candidates, [positions[group] for group in groups], [cand_phases[group] for group in groups],
+                                        [s_pv]*len(groups), [max_kw]*len(groups), [resolution_kw]*len(groups)))
+    for group, (group_capacity, group_limit) in zip(groups, results):
+        capacity[group] = group_capacity
+        limit[group] = group_limit
+
+    return pd.DataFrame({"node": [Model.Nodes[ind].name for ind in cand_nodes],
+                         "phase": np.array(["A", "B", "C"])[cand_phases],
+                         "capacity_kW": capacity,
+                         "limit": LIMIT_NAMES[limit],
+                         "X_coord": [getattr(Model.Nodes[ind], "X_coord", np.nan) for ind in cand_nodes],
+                         "Y_coord": [getattr(Model.Nodes[ind], "Y_coord", np.nan) for ind in cand_nodes]})
+
+def node_capacity_table(table):
+    # one row per node: capacity per phase (NaN for the phases it doesn't have) and the smallest of them
+    nodes = table.pivot(index="node", columns="phase", values="capacity_kW")
+    nodes["min_kW"] = nodes.min(axis=1)
+    coords = table.groupby("node")[["X_coord", "Y_coord"]].first()
+    return nodes.join(coords)
+
+def plot_hosting_capacity(Model, table, column="min_kW", ax=None):
+    # Map of the node capacities (node_capacity_table column) over the node coordinates, with the branches
+    # drawn as in parsing_tools.plot_feeder. Needs add_coords_to_pkl to have been run on the model.
+    nodes = node_capacity_table(table)
+    nodes = nodes[nodes["X_coord"].notna() & nodes["Y_coord"].notna()]
+    if len(nodes) == 0:
+        raise ValueError("No candidate node has coordinates. Run add_coords_to_pkl on the model first.")
+    if ax is None:
+        _, ax = plt.subplots(figsize=(10, 8))
+    for branch in Model.Branches:
+        if all(hasattr(branch, field) for field in ["X_coord", "Y_coord", "X2_coord", "Y2_coord"]):
+            ax.plot([branch.X_coord,branch.X2_coord],[branch.Y_coord,branch.Y2_coord],color='lightgray',linewidth=1,zorder=1)
+    points = ax.scatter(nodes["X_coord"], nodes["Y_coord"], c=nodes[column], cmap="viridis", s=12, zorder=2)
+    plt.colorbar(points, ax=ax, label="PV hosting capacity (kW)")
+    ax.set_title("PV Hosting Capacity")
+    ax.set_aspect("equal")
+    return ax
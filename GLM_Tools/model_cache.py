@@ -0,0 +1,83 @@
+import os
+import json
+import hashlib
+
+# Bump whenever a parser change alters the content of the pickled model, so stale caches are rebuilt
+PARSER_VERSION = 5
+
+def file_digest(file_path, block_size=1<<20):
+    # SHA-256 of a file, read in blocks so large GLMs/impedance dumps are never fully loaded
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+def file_entry(file_path, digest=None):
+    file_stat = os.stat(file_path)
+    if digest is None:
+        digest = file_digest(file_path)
+    return {"path": os.path.abspath(file_path), "size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns, "sha256": digest}
+
+def cache_info_file(pkl_file):
+    # sidecar next to the pkl that records which inputs it was built from
+    return os.path.splitext(pkl_file)[0] + "_cache.json"
+
+def check_model_cache(pkl_file, input_files):
+    # Returns True if pkl_file was built from the current content of input_files with the current parser.
+    # Files whose size and mtime still match the recorded ones are trusted without re-hashing.
+    info_file = cache_info_file(pkl_file)
+    if not (os.path.isfile(pkl_file) and os.path.isfile(info_file)):
+        return False
+    try:
+        with open(info_file, 'r') as file:
+            cache_info = json.load(file)
+    except (OSError, ValueError):
+        return False
+    if cache_info.get("parser_version") != PARSER_VERSION:
+        return False
+    # the pkl itself must still be the one written by the parser (not e.g. populated with AMI data since)
+    if cache_info.get("pkl") != pkl_stamp(pkl_file):
+        return False
+    entries = cache_info.get("inputs", [])
+    if len(entries) != len(input_files):
+        return False
+
+    stat_changed = False
+    for ii, input_file in enumerate(input_files):
+        if not os.path.isfile(input_file):
+            return False
+        entry = entries[ii]
+        file_stat = os.stat(input_file)
+        if file_stat.st_size != entry["size"]:
+            return False
+        if file_stat.st_mtime_ns != entry["mtime_ns"]:
+            # touched (e.g. copied or re-exported): only a content change invalidates the cache
+            if file_digest(input_file) != entry["sha256"]:
+                return False
+            entries[ii] = file_entry(input_file, entry["sha256"])
+            stat_changed = True
+
+    if stat_changed:
+        write_cache_info(pkl_file, entries)
+    return True
+
+def pkl_stamp(pkl_file):
+    file_stat = os.stat(pkl_file)
+    return {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns}
+
+def write_cache_info(pkl_file, entries):
+    with open(cache_info_file(pkl_file), 'w') as file:
+        json.dump({"parser_version": PARSER_VERSION, "pkl": pkl_stamp(pkl_file), "inputs": entries}, file, indent=4)
+
+def cache_entries(input_files):
+    # hash the inputs before parsing, so an input edited while parsing invalidates the cache next time
+    return [file_entry(input_file) for input_file in input_files]
+
+def save_model_cache(pkl_file, entries):
+    write_cache_info(pkl_file, entries)
+
+def clear_model_cache(pkl_file):
+    info_file = cache_info_file(pkl_file)
+    if os.path.isfile(info_file):
+        os.remove(info_file)
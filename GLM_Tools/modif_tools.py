@@ -3,9 +3,34 @@ import re
 import pickle
 import numpy as np
 import shutil
+from sys import intern
+from concurrent.futures import ProcessPoolExecutor
 import xml.etree.ElementTree as ET
 import GLM_Tools.PowerSystemModel as psm
 import GLM_Tools.parsing_tools as glm_parser
+from GLM_Tools.glm_reader import iter_glm_objects, load_model
+
+LINE_CONFIG_NAME_RE = re.compile(r"line_configuration[0-9]+")
+LINE_CONFIG_IND_RE = re.compile(r"configuration\s+line_configuration([0-9]+)\s*;")
+GLM_NAME_RE = re.compile(r"name\s+([^\s][^;]*);")
+
+CLOCK_RE = re.compile(r"\bclock\s*\{[^{}]*\}")
+REG_CONFIG_RE = re.compile(r"\bobject\s+regulator_configuration\s*\{[^{}]*\}")
+
+def set_clock_in_glm_text(glm_data, start_time, end_time):
+    # Set the start and stop time of the clock block in a GLM (or GLM header) text
+    clock_match = CLOCK_RE.search(glm_data)
+    if clock_match is None:
+        raise ValueError("Could not find clock object in GLM.")
+    clock_obj = clock_match.group(0)
+    # Note: Times not actually in UTC
+    clock_obj = glm_parser.set_glm_property(clock_obj, "starttime", f"\"{start_time} UTC\"")
+    clock_obj = glm_parser.set_glm_property(clock_obj, "stoptime", f"\"{end_time} UTC\"")
+    return glm_data[:clock_match.start()] + clock_obj + glm_data[clock_match.end():]
+
+def set_reg_control_in_glm_text(glm_data, regulator_control):
+    # Set the Control of every regulator configuration in a GLM (or single object) text
+    return REG_CONFIG_RE.sub(lambda reg_config: glm_parser.set_glm_property(reg_config.group(0), "Control", regulator_control), glm_data)
 
 def modify_glm_clock(substation_name,start_time,end_time):
 
@@ -19,16 +44,7 @@ def modify_glm_clock(substation_name,start_time,end_time):
     with open(glm_file, 'r') as file:
         glm_data = file.read()
 
-    clock_match = re.search(r"clock \{[^{}]*\}", glm_data, re.S)
-    clock_obj = clock_match.group(0)
-
-    old_time_match = re.search(r"starttime ([^;]*); stoptime ([^;]*);", clock_obj, re.S)
-
-    new_time = f"starttime \"{start_time} UTC\"; stoptime \"{end_time} UTC\";" # Note: Times not actually in UTC
-
-    new_clock_obj = clock_obj[:old_time_match.start()] + new_time + clock_obj[old_time_match.end():]
-
-    new_glm_data = glm_data[:clock_match.start()] + new_clock_obj + glm_data[clock_match.end():]
+    new_glm_data = set_clock_in_glm_text(glm_data, start_time, end_time)
 
     with open(new_glm_file, 'w') as file:
         file.write(new_glm_data)
@@ -42,148 +58,203 @@ def modify_reg_controls(substation_name,regulator_control):
     with open(glm_file, 'r') as file:
         glm_data = file.read()
 
-    new_glm_data = glm_data
-    for reg_config_obj in re.finditer(r"object regulator_configuration \{[^{}]*\}", new_glm_data, re.S):
-        reg_config = reg_config_obj.group(0)
-        control_match = re.search(r"Control\s+([^\s][^;]*);", reg_config, re.S)
-        old_control = control_match.group(1)
-        new_config = re.sub(old_control,regulator_control,reg_config)
-        new_glm_data = new_glm_data.replace(reg_config,new_config)
+    new_glm_data = set_reg_control_in_glm_text(glm_data, regulator_control)
         
     with open(glm_file, 'w') as file:
         file.write(new_glm_data)
 
-
-def create_subfeeder(root_dir, substation_name, subfeeder_name, CYME_flag, start_node_name, branches_to_remove):
-
-    new_substation_name = f"{substation_name}_{subfeeder_name}"
-
-    pkl_file_dir = f"{root_dir}/Feeder_Data/{substation_name}/Python_Model/"
-    pkl_file_name = f"{substation_name}_Model.pkl"
-    pkl_file = os.path.join(pkl_file_dir,pkl_file_name)
-
-    with open(pkl_file, 'rb') as file:
-        pkl_model = pickle.load(file)
-
-    start_node = pkl_model.Node_Dict[start_node_name]
-
-    # depth first search
-    New_Nodes = []
-    New_Branches = []
-    has_swing = False
-    visited_nodes = set()
-    visited_branches = set()
-    nodes_to_visit = [start_node.index]
-    while nodes_to_visit:
-        node_ind = nodes_to_visit.pop()
-        if node_ind not in visited_nodes:
+# Edits applied to a PowerSystemModel in memory. Each one updates the parsed fields and the object's
+# glm_string together (so write_glm_from_model writes the edited feeder) and recomputes only what the edit
+# affects, instead of editing the GLM and re-running parse_glm_to_pkl.
+
+def set_model_clock(Model, start_time, end_time):
+    Model.glm_header = set_clock_in_glm_text(Model.glm_header, start_time, end_time)
+
+def set_model_reg_controls(Model, regulator_control, config_names=None):
+    # the regulator configs don't keep Control as a field, only their text changes
+    for Config in Model.Configs:
+        if Config.type in ["regulator_configuration"] and (config_names is None or Config.name in config_names):
+            Config.glm_string = set_reg_control_in_glm_text(Config.glm_string, regulator_control)
+
+def check_switch_status(status, obj_desc):
+    if status not in ["OPEN","CLOSED"]:
+        raise ValueError(f"Invalid status {status} for {obj_desc}. Expected OPEN or CLOSED.")
+
+def set_switch_status(Model, switch_name, status):
+    if switch_name not in Model.Branch_Dict or Model.Branch_Dict[switch_name].type not in ["switch"]:
+        raise ValueError(f"Could not find switch object: {switch_name}")
+    check_switch_status(status, f"switch {switch_name}")
+    Branch = Model.Branch_Dict[switch_name]
+    Branch.status = intern(status)
+    Branch.glm_string = glm_parser.set_glm_property(Branch.glm_string, "status", status)
+    Model.reset_topology()
+
+def set_capacitor_switches(Model, capacitor_name, switch_states):
+    # switch_states: {phase: "OPEN"/"CLOSED"}, e.g. {"A": "OPEN"}
+    if capacitor_name not in Model.Shunt_Dict or Model.Shunt_Dict[capacitor_name].type not in ["capacitor"]:
+        raise ValueError(f"Could not find capacitor object: {capacitor_name}")
+    Shunt = Model.Shunt_Dict[capacitor_name]
+    glm_string = Shunt.glm_string
+    for ph, status in switch_states.items():
+        if ph not in ["A","B","C"]:
+            raise ValueError(f"Invalid phase {ph} for capacitor {capacitor_name}.")
+        check_switch_status(status, f"capacitor {capacitor_name} phase {ph}")
+        setattr(Shunt, f"switch{ph}", intern(status))
+        glm_string = glm_parser.set_glm_property(glm_string, f"switch{ph}", status)
+    Shunt.glm_string = glm_string
+
+def set_load_power(Model, load_name, constant_power):
+    # constant_power: {phase: complex power in VA}. Works for loads and for the negative loads used as
+    # generators. Fields are set from the written text, so they match what a re-parse would give.
+    if load_name in Model.Load_Dict:
+        Load = Model.Load_Dict[load_name]
+    elif load_name in Model.Generator_Dict:
+        Load = Model.Generator_Dict[load_name]
+    else:
+        raise ValueError(f"Could not find load object: {load_name}")
+    glm_string = Load.glm_string
+    for ph, power in constant_power.items():
+        if ph not in ["A","B","C"] or ph not in Load.phases:
+            raise ValueError(f"Invalid phase {ph} for load {load_name} with phases {Load.phases}.")
+        power = complex(power)
+        power_str = f"{power.real:+.6f}{power.imag:+.6f}j"
+        glm_string = glm_parser.set_glm_property(glm_string, f"constant_power_{ph}", power_str)
+        setattr(Load, f"constant_power_{ph}", complex(power_str))
+    Load.glm_string = glm_string
+    S = np.array([Load.constant_power_A, Load.constant_power_B, Load.constant_power_C])/Model.Sbase_1ph
+    if isinstance(Load, psm.Generator):
+        Load.Sgen = S
+    else:
+        Load.Sload = S
+
+
+class SubfeederIndex:
+    # Index of a loaded model for extracting many subfeeders from it without reloading the pkl: the loads,
+    # generators and shunts attached to each node and the branch indices by name. Extracted components are
+    # copies, so the model itself is never modified.
+    def __init__(self, Model):
+        self.Model = Model
+        self.attachments = {}
+        for field, components in [("Loads", Model.Loads), ("Generators", Model.Generators), ("Shunts", Model.Shunts)]:
+            attached = [[] for _ in Model.Nodes]
+            for obj in components:
+                attached[obj.parent_node_ind].append(obj.index)
+            self.attachments[field] = attached
+        self.branch_inds = {branch.name: branch.index for branch in Model.Branches}
+
+    def extract(self, start_node_name, branches_to_remove):
+        # (node indices in DFS order from start_node_name, branch indices in visit order), without crossing
+        # branches_to_remove. Fake branches are left out: PowerSystemModel adds them again for parented nodes.
+        Model = self.Model
+        if start_node_name not in Model.Node_Dict:
+            raise ValueError(f"Could not find node object: {start_node_name}")
+        removed = {self.branch_inds[name] for name in branches_to_remove if name in self.branch_inds}
+        node_inds = []
+        branch_inds = []
+        visited_nodes = set()
+        visited_branches = set()
+        nodes_to_visit = [Model.Node_Dict[start_node_name].index]
+        while nodes_to_visit:
+            node_ind = nodes_to_visit.pop()
+            if node_ind in visited_nodes:
+                continue
             visited_nodes.add(node_ind)
-            node = pkl_model.Nodes[node_ind]
-            New_Nodes.append(node)
-            if node.node_type == "SWING":
-                has_swing = True
-            for branch_ind in node.outgoing_branches:
-                branch = pkl_model.Branches[branch_ind]
-                if branch.name not in branches_to_remove:
-                    if branch.from_node_ind != node_ind:
-                        ValueError(f"Outgoing branch ({branch_ind}) from_node_ind ({branch.from_node_ind}) doesn't match node_ind {node_ind}")
-                    if branch.to_node_ind not in visited_nodes:
-                        nodes_to_visit.append(branch.to_node_ind)
-                    if branch.index not in visited_branches:
-                        New_Branches.append(branch)
-                        visited_branches.add(branch.index)
-
-            for branch_ind in node.incoming_branches:
-                branch = pkl_model.Branches[branch_ind]
-                if branch.name not in branches_to_remove:
-                    if branch.to_node_ind != node_ind:
-                        ValueError(f"Incoming branch ({branch_ind}) to_node_ind ({branch.to_node_ind}) doesn't match node_ind {node_ind}")
-                    if branch.from_node_ind not in visited_nodes:
-                        nodes_to_visit.append(branch.from_node_ind)
-                    if branch.index not in visited_branches:
-                        New_Branches.append(branch)
-                        visited_branches.add(branch.index)
-            
-            for child_ind in node.child_nodes:
-                nodes_to_visit.append(child_ind)
-
-    # add relevant loads to the new model
-    New_Loads = []
-    for Load in pkl_model.Loads:
-        if Load.parent_node_ind in visited_nodes:
-            New_Loads.append(Load)
-
-    # add relevant loads to the new model
-    New_Generators = []
-    for Generator in pkl_model.Generators:
-        if Generator.parent_node_ind in visited_nodes:
-            New_Generators.append(Generator)
-
-    # add relevant shunts to the new model
-    New_Shunts = []
-    for Shunt in pkl_model.Shunts:
-        if Shunt.parent_node_ind in visited_nodes:
-            New_Shunts.append(Shunt)
-
-    # add relevant configs to the new model
-    New_Configs = []
-    configs_visited = set()
-    for Branch in New_Branches:
-        if hasattr(Branch, 'config'):
-            config_name = Branch.config
-            if config_name not in pkl_model.Config_Dict:
+            node_inds.append(node_ind)
+            node = Model.Nodes[node_ind]
+            for branch_ind in node.outgoing_branches + node.incoming_branches:
+                branch = Model.Branches[branch_ind]
+                if branch_ind in removed or branch.type in ["fake"]:
+                    continue
+                other_ind = branch.to_node_ind if branch.from_node_ind == node_ind else branch.from_node_ind
+                if other_ind not in visited_nodes:
+                    nodes_to_visit.append(other_ind)
+                if branch_ind not in visited_branches:
+                    branch_inds.append(branch_ind)
+                    visited_branches.add(branch_ind)
+            parent_node_ind = getattr(node, "parent_node_ind", None)
+            if getattr(node, "parent", None) is not None and parent_node_ind is not None and parent_node_ind not in visited_nodes:
+                nodes_to_visit.append(parent_node_ind)
+            nodes_to_visit.extend(node.child_nodes)
+        return node_inds, branch_inds
+
+    def build(self, substation_name, subfeeder_name, start_node_name, branches_to_remove):
+        # the subfeeder as a new PowerSystemModel with its impedances computed
+        Model = self.Model
+        new_substation_name = f"{substation_name}_{subfeeder_name}"
+        node_inds, branch_inds = self.extract(start_node_name, branches_to_remove)
+        New_Nodes = [Model.Nodes[ind].detached_copy() for ind in node_inds]
+        New_Branches = [Model.Branches[ind].detached_copy() for ind in branch_inds]
+        attached = {}
+        for field, components in [("Loads", Model.Loads), ("Generators", Model.Generators), ("Shunts", Model.Shunts)]:
+            inds = sorted(ind for node_ind in node_inds for ind in self.attachments[field][node_ind])
+            attached[field] = [components[ind].detached_copy() for ind in inds]
+
+        # configs of the branches, in the order they are first used
+        New_Configs = []
+        configs_visited = set()
+        for Branch in New_Branches:
+            config_name = getattr(Branch, 'config', None)
+            if config_name is None:
+                continue
+            if config_name not in Model.Config_Dict:
                 raise ValueError(f"Could not find line config object: {config_name}")
-            branch_config = pkl_model.Config_Dict[config_name] 
+            branch_config = Model.Config_Dict[config_name]
             if branch_config.index not in configs_visited:
-                New_Configs.append(branch_config)
+                New_Configs.append(branch_config.detached_copy())
                 configs_visited.add(branch_config.index)
 
-    # make sure there is a swing node in the model
-    if not has_swing:
-        # change first node (start_node) to swing node
-        New_Nodes[0].node_type = "SWING"
-        Vbase = New_Nodes[0].Vbase
-        voltage_A = Vbase
-        voltage_B = Vbase*np.exp(1j*(-2*np.pi/3))
-        voltage_C = Vbase*np.exp(1j*(2*np.pi/3))
-        voltage_A_str = "{:+}{:+}j".format(voltage_A.real, voltage_A.imag)
-        voltage_B_str = "{:+}{:+}j".format(voltage_B.real, voltage_B.imag)
-        voltage_C_str = "{:+}{:+}j".format(voltage_C.real, voltage_C.imag)
-        old_glm_string = New_Nodes[0].glm_string 
-        add_swing_string = f"bustype SWING; voltage_A {voltage_A_str}; voltage_B {voltage_B_str}; voltage_C {voltage_C_str}; "
-        new_glm_string = old_glm_string[:-1] + add_swing_string + old_glm_string[-1]
-        New_Nodes[0].glm_string = new_glm_string
-    
-    # Create a new model
-    New_Model = psm.PowerSystemModel(New_Nodes,New_Branches,New_Loads,New_Generators,New_Shunts,New_Configs)
-
-    New_Model.compute_impedances()
-
-    # update header, helics object, and recorder objects
-    New_Model.glm_header = pkl_model.glm_header
-    New_Model.glm_helics_obj = pkl_model.glm_helics_obj.replace(substation_name,new_substation_name)
-    new_glm_misc_objs = []
-    for misc_obj in pkl_model.glm_misc_objs:
-        new_misc_obj = misc_obj.replace(substation_name,new_substation_name)
-        # update substation recorder parent
-        if "substation_power.csv" in new_misc_obj:
-            parent_match = re.search(r"parent\s+([^\s][^;]*);", new_misc_obj, re.S)
-            if parent_match:
-                parent = parent_match.group(1)
-            else:
-                raise ValueError(f"Could not find parent of substation recorder object: {new_misc_obj}")
-            new_parent = New_Branches[0].name
-            new_misc_obj = new_misc_obj.replace(parent,new_parent)
-        new_glm_misc_objs.append(new_misc_obj)
-    New_Model.glm_misc_objs = new_glm_misc_objs
-    
+        # make sure there is a swing node in the model
+        if not any(node.node_type == "SWING" for node in New_Nodes):
+            # change first node (start_node) to swing node
+            New_Nodes[0].node_type = "SWING"
+            Vbase = New_Nodes[0].Vbase
+            voltage_A = Vbase
+            voltage_B = Vbase*np.exp(1j*(-2*np.pi/3))
+            voltage_C = Vbase*np.exp(1j*(2*np.pi/3))
+            voltage_A_str = "{:+}{:+}j".format(voltage_A.real, voltage_A.imag)
+            voltage_B_str = "{:+}{:+}j".format(voltage_B.real, voltage_B.imag)
+            voltage_C_str = "{:+}{:+}j".format(voltage_C.real, voltage_C.imag)
+            old_glm_string = New_Nodes[0].glm_string
+            add_swing_string = f"bustype SWING; voltage_A {voltage_A_str}; voltage_B {voltage_B_str}; voltage_C {voltage_C_str}; "
+            new_glm_string = old_glm_string[:-1] + add_swing_string + old_glm_string[-1]
+            New_Nodes[0].glm_string = new_glm_string
+
+        # Create a new model
+        New_Model = psm.PowerSystemModel(New_Nodes,New_Branches,attached["Loads"],attached["Generators"],attached["Shunts"],New_Configs)
+
+        New_Model.compute_impedances()
+
+        # update header, helics object, and recorder objects
+        New_Model.glm_header = Model.glm_header
+        New_Model.glm_helics_obj = Model.glm_helics_obj.replace(substation_name,new_substation_name)
+        new_glm_misc_objs = []
+        for misc_obj in Model.glm_misc_objs:
+            new_misc_obj = misc_obj.replace(substation_name,new_substation_name)
+            # update substation recorder parent
+            if "substation_power.csv" in new_misc_obj:
+                parent_match = re.search(r"parent\s+([^\s][^;]*);", new_misc_obj, re.S)
+                if parent_match:
+                    parent = parent_match.group(1)
+                else:
+                    raise ValueError(f"Could not find parent of substation recorder object: {new_misc_obj}")
+                new_parent = New_Branches[0].name
+                new_misc_obj = new_misc_obj.replace(parent,new_parent)
+            new_glm_misc_objs.append(new_misc_obj)
+        New_Model.glm_misc_objs = new_glm_misc_objs
+        return New_Model
+
+def write_subfeeder(root_dir, substation_name, subfeeder_name, CYME_flag, New_Model):
+    new_substation_name = f"{substation_name}_{subfeeder_name}"
 
     # Save the new power system model to a .pkl
     new_pkl_file_dir = f"{root_dir}/Feeder_Data/{new_substation_name}/Python_Model/"
     new_pkl_file_name = f"{new_substation_name}_Model.pkl"
     new_pkl_file = os.path.join(new_pkl_file_dir,new_pkl_file_name)
-    if not os.path.exists(new_pkl_file_dir):
-        os.makedirs(new_pkl_file_dir)
+    os.makedirs(new_pkl_file_dir, exist_ok=True)
+    # the components still refer to spans of the parent GLM: copy their text so the pkl stands on its own
+    for components in [New_Model.Nodes, New_Model.Branches, New_Model.Loads, New_Model.Generators, New_Model.Shunts, New_Model.Configs]:
+        for component in components:
+            component.materialize_glm_string()
     with open(new_pkl_file, 'wb') as file:
         pickle.dump(New_Model, file)
 
@@ -191,10 +262,8 @@ def create_subfeeder(root_dir, substation_name, subfeeder_name, CYME_flag, start
     new_glm_file_dir = f"{root_dir}/Feeder_Data/{new_substation_name}/Input_Data/"
     new_glm_file_name = f"{new_substation_name}.glm"
     new_glm_file = os.path.join(new_glm_file_dir,new_glm_file_name)
-
-    if not os.path.exists(new_glm_file_dir):
-        os.makedirs(new_glm_file_dir)
-    glm_parser.create_glm_from_pkl(new_pkl_file,new_glm_file)
+    os.makedirs(new_glm_file_dir, exist_ok=True)
+    glm_parser.write_glm_from_model(New_Model,new_glm_file)
 
     print(f"Created a new subfeeder ({subfeeder_name}) for {substation_name}. Python model saved to {new_pkl_file}. GridLAB-D model saved to {new_glm_file}")
 
@@ -202,72 +271,110 @@ def create_subfeeder(root_dir, substation_name, subfeeder_name, CYME_flag, start
     if CYME_flag != 1:
         shutil.copy(f"Feeder_Data/{substation_name}/meter_number_data.csv",f"Feeder_Data/{new_substation_name}/")
         shutil.copy(f"Feeder_Data/{substation_name}/gen_meter_number_data.csv",f"Feeder_Data/{new_substation_name}/")
-        if not os.path.exists(f"Feeder_Data/{new_substation_name}/AMI_Data/"):
-            os.makedirs(f"Feeder_Data/{new_substation_name}/AMI_Data/")
+        os.makedirs(f"Feeder_Data/{new_substation_name}/AMI_Data/", exist_ok=True)
         shutil.copy(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Load_AMI_Data.csv",f"Feeder_Data/{new_substation_name}/AMI_Data/{new_substation_name}_True_Load_AMI_Data.csv")
         shutil.copy(f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Gen_AMI_Data.csv",f"Feeder_Data/{new_substation_name}/AMI_Data/{new_substation_name}_True_Gen_AMI_Data.csv")
-        if not os.path.exists(f"Feeder_Data/{new_substation_name}/Coordinate_Data/"):
-            os.makedirs(f"Feeder_Data/{new_substation_name}/Coordinate_Data/")
+        os.makedirs(f"Feeder_Data/{new_substation_name}/Coordinate_Data/", exist_ok=True)
         shutil.copy(f"Feeder_Data/{substation_name}/Coordinate_Data/{substation_name}_Branch_Coords.xls",f"Feeder_Data/{new_substation_name}/Coordinate_Data/{new_substation_name}_Branch_Coords.xls")
+    return new_pkl_file, new_glm_file
+
+SUBFEEDER_WORKER = {}
+
+def init_subfeeder_worker(index, root_dir, substation_name, CYME_flag):
+    # Process pool initializer: every worker indexes the model once (inherited, not pickled, when forked)
+    SUBFEEDER_WORKER.update(index=index, root_dir=root_dir, substation_name=substation_name, CYME_flag=CYME_flag)
+
+def build_and_write_subfeeder(subfeeder_name, start_node_name, branches_to_remove):
+    # Process pool worker
+    worker = SUBFEEDER_WORKER
+    New_Model = worker["index"].build(worker["substation_name"], subfeeder_name, start_node_name, branches_to_remove)
+    return write_subfeeder(worker["root_dir"], worker["substation_name"], subfeeder_name, worker["CYME_flag"], New_Model)
+
+def create_subfeeders(root_dir, substation_name, subfeeder_specs, CYME_flag, Model=None, num_workers=1):
+    # Extract many subfeeders from one loaded model. subfeeder_specs: {subfeeder_name: (start_node_name,
+    # branches_to_remove)}. The pkl is loaded once (or Model is used as is); the subfeeders are built and
+    # written by num_workers processes. Returns {subfeeder_name: (pkl file, glm file)}.
+    if Model is None:
+        pkl_file = f"{root_dir}/Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model.pkl"
+        Model = load_model(pkl_file)
+    index = SubfeederIndex(Model)
+    names = list(subfeeder_specs)
+    initargs = (index, root_dir, substation_name, CYME_flag)
+    if num_workers <= 1 or len(names) <= 1:
+        init_subfeeder_worker(*initargs)
+        try:
+            files = [build_and_write_subfeeder(name, *subfeeder_specs[name]) for name in names]
+        finally:
+            SUBFEEDER_WORKER.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_subfeeder_worker, initargs=initargs) as executor:
+            files = list(executor.map(build_and_write_subfeeder, names, *zip(*[subfeeder_specs[name] for name in names])))
+    return dict(zip(names, files))
 
-def pull_line_impedances(root_dir, substation_name, impedance_dump_name):
-    impedance_matrices = []
-    lengths = []
-    line_names = []
-
-    xml_file = root_dir + "/Feeder_Data/" + substation_name + "/Output_Data/" + impedance_dump_name + ".xml"
-    glm_file = root_dir + "/Feeder_Data/" + substation_name + "/Input_Data/" + substation_name + ".glm"
+def create_subfeeder(root_dir, substation_name, subfeeder_name, CYME_flag, start_node_name, branches_to_remove):
+    create_subfeeders(root_dir, substation_name, {subfeeder_name: (start_node_name, branches_to_remove)}, CYME_flag)
 
-    # Open and parse the XML file
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-
-    # Pull three-phase impedance matrix for every line (cables assumed to already have impedance matrices)
-    for line in root.findall('.//overhead_line'):
-        temp_impedance = np.zeros((3,3),dtype=complex)
-        for name in line.findall('.//name'):
-            line_names.append(name.text)
-        for b_matrix in line.findall('.//b_matrix'):
-            for b_entry in b_matrix:
-                row_ind = int(b_entry.tag[1]) - 1
-                col_ind = int(b_entry.tag[2]) - 1
-                temp_impedance[row_ind, col_ind] = b_entry.text
-        for l in line.findall('.//length'):
-            lengths.append(float(l.text))
-        impedance_matrices.append(temp_impedance)
-
-    # Convert line impedance matrices to configuration matrices in ohm/mile 
+def read_line_impedances(xml_file):
+    # Stream the impedance dump and return {overhead line name: 3x3 impedance matrix in ohm/mile}.
+    # Elements are dropped from the tree as soon as they are read, so memory does not grow with the dump size.
     ft2mi = 1.0/5280.0
     impedance_matrices_puLength = {}
-    for ii in range(len(lengths)):
-        impedance_matrices_puLength[line_names[ii]] = impedance_matrices[ii]/(lengths[ii]*ft2mi)
+    open_elems = []
+    line_depth = 0
+    for event, elem in ET.iterparse(xml_file, events=("start","end")):
+        if event == "start":
+            open_elems.append(elem)
+            if elem.tag == "overhead_line":
+                line_depth += 1
+            continue
+        open_elems.pop()
+        if elem.tag == "overhead_line":
+            line_depth -= 1
+            # Pull three-phase impedance matrix for the line (cables assumed to already have impedance matrices)
+            temp_impedance = np.zeros((3,3),dtype=complex)
+            for b_matrix in elem.iter('b_matrix'):
+                for b_entry in b_matrix:
+                    row_ind = int(b_entry.tag[1]) - 1
+                    col_ind = int(b_entry.tag[2]) - 1
+                    temp_impedance[row_ind, col_ind] = b_entry.text
+            line_name = elem.find('.//name').text
+            length = float(elem.find('.//length').text)
+            # Convert line impedance matrix to configuration matrix in ohm/mile
+            impedance_matrices_puLength[line_name] = temp_impedance/(length*ft2mi)
+        if line_depth == 0 and open_elems:
+            open_elems[-1].remove(elem)
+    return impedance_matrices_puLength
 
-    with open(glm_file, 'r') as file:
-        glm_data = file.read()
-
-    # Get number of configurations to initialize config_impedance_matrices
-    unique_configs = []
-    for obj in re.finditer(r"object (\S*) \{[^{}]*\}", glm_data, re.S):
-        obj_type = obj.group(1).strip('"')
-        if obj_type in ["line_configuration"]:
-            name = re.search(fr"line_configuration[0-9]+", obj.group(0), re.S)
-            if name not in unique_configs:
-                unique_configs.append(name)
+def pull_line_impedances(root_dir, substation_name, impedance_dump_name):
+    xml_file = root_dir + "/Feeder_Data/" + substation_name + "/Output_Data/" + impedance_dump_name + ".xml"
+    glm_file = root_dir + "/Feeder_Data/" + substation_name + "/Input_Data/" + substation_name + ".glm"
 
-    num_configs = len(unique_configs)
+    impedance_matrices_puLength = read_line_impedances(xml_file)
+
+    # Single pass over the GLM: count the line configurations and pick up the impedance of each
+    # numbered configuration from one of the overhead lines that use it
+    config_names = set()
+    unnumbered_configs = False
+    config_impedances = {}
+    for glm_obj in iter_glm_objects(glm_file):
+        obj_type = glm_obj.obj_type
+        if obj_type == "line_configuration":
+            config_match = LINE_CONFIG_NAME_RE.search(glm_obj.text)
+            if config_match:
+                config_names.add(config_match.group(0))
+            else:
+                unnumbered_configs = True
+        elif obj_type == "overhead_line":
+            line_string = glm_obj.text
+            name_match = GLM_NAME_RE.search(line_string)
+            config_match = LINE_CONFIG_IND_RE.search(line_string)
+            if config_match:
+                config_impedances[int(config_match.group(1))] = impedance_matrices_puLength[name_match.group(1)]
+
+    # configurations without a number (cables with explicit impedances) share one extra slot
+    num_configs = len(config_names) + (1 if unnumbered_configs else 0)
     config_impedance_matrices = np.zeros((num_configs, 3, 3), dtype=complex)
-
-    # Extract line configuration impedance matrices
-    for obj in re.finditer(r"object (\S*) \{[^{}]*\}", glm_data, re.S):
-        obj_type = obj.group(1).strip('"')
-        config_params = []
-        if obj_type in ["overhead_line"]:
-            line_string = obj.group(0)
-            name_match = re.search(r"name\s+([^\s][^;]*);", line_string, re.S)
-            config_match = re.search(r"configuration\s+([^\s][^;]*);", line_string, re.S)
-            name_match = re.search(r"name\s+([^\s][^;]*);", line_string, re.S)
-            config_ind = int(config_match.group(0)[32:-1])
-            z = impedance_matrices_puLength[name_match.group(0)[5:-1]]
-            config_impedance_matrices[config_ind] = np.copy(z)
+    for config_ind, z in config_impedances.items():
+        config_impedance_matrices[config_ind] = z
 
     return config_impedance_matrices
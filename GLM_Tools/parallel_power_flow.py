@@ -0,0 +1,159 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from GLM_Tools.PowerSystemModel import ARRAY_FIELDS
+from GLM_Tools.power_flow import TimeSeriesResult, num_profile_times
+
+# Time-series power flow over a process pool. The horizon is split into windows of time steps that are
+# solved in parallel. Nothing per step is pickled:
+#   - every worker gets the solver once (its arrays and sparse matrices, see PowerFlowSolver.__getstate__)
+#     and factors it itself
+#   - the (T,n_injections,3) load and generation tensor and the outputs (voltages (T,3,n_nodes),
+#     substation power, iterations...) are numpy arrays in shared memory, read and written in place
+#   - a task is only (start, stop) of its window
+
+class SharedArrays:
+    # numpy arrays in shared memory blocks, created by the parent and attached to by the workers by name
+    def __init__(self, specs=None):
+        self.blocks = {}
+        self.arrays = {}
+        self.specs = {} # name -> (block name, shape, dtype), enough to attach to the arrays
+        if specs is not None:
+            for name, (block_name, shape, dtype) in specs.items():
+                self.blocks[name] = shared_memory.SharedMemory(name=block_name)
+                self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=self.blocks[name].buf)
+                self.specs[name] = (block_name, shape, dtype)
+
+    def create(self, name, shape, dtype, fill=0):
+        num_bytes = max(int(np.prod(shape))*np.dtype(dtype).itemsize, 1)
+        self.blocks[name] = shared_memory.SharedMemory(create=True, size=num_bytes)
+        self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=self.blocks[name].buf)
+        self.arrays[name][...] = fill
+        self.specs[name] = (self.blocks[name].name, tuple(shape), np.dtype(dtype).str)
+        return self.arrays[name]
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self, unlink=False):
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+        self.blocks = {}
+
+def injection_components(Model):
+    # parent node indices and signs (+1 loads, -1 generators) of the columns of the injection tensor
+    parent_inds = [obj.parent_node_ind for obj in Model.Loads if getattr(obj, "Sload", None) is not None]
+    signs = [1]*len(parent_inds)
+    gen_inds = [obj.parent_node_ind for obj in Model.Generators if getattr(obj, "Sgen", None) is not None]
+    return np.array(parent_inds + gen_inds, dtype=np.int64), np.array(signs + [-1]*len(gen_inds), dtype=float)
+
+def fill_injection_tensor(Model, t_inds, tensor):
+    # per unit powers (T,n_injections,3) of the loads then the generators at the time indices t_inds,
+    # written one component at a time so no second copy of the tensor is needed
+    col = 0
+    for components, field in [(Model.Loads, "Sload"), (Model.Generators, "Sgen")]:
+        array_name = ARRAY_FIELDS[field][0]
+        rows_set = Model.array_rows_set.get(array_name)
+        if rows_set is not None and len(rows_set) == len(components) and rows_set.all():
+            stacked = Model.__dict__[array_name]
+            if stacked.ndim == 3:
+                # profiles stacked as (n,T,3): the rows of each time step
+                for step, t_ind in enumerate(t_inds):
+                    tensor[step,col:col + len(components)] = stacked[:,t_ind]
+            else:
+                # constant powers for every time step
+                tensor[:,col:col + len(components)] = stacked[None]
+            col += len(components)
+            continue
+        for obj in components:
+            value = getattr(obj, field, None)
+            if value is None:
+                continue
+            value = np.asarray(value)
+            tensor[:,col] = value[t_inds] if value.ndim == 2 else value
+            col += 1
+
+WORKER = {}
+
+def init_worker(solver, specs, parent_inds, signs, num_nodes):
+    # Process pool initializer: keep the solver and the shared arrays for the worker's tasks
+    WORKER["solver"] = solver
+    WORKER["shared"] = SharedArrays(specs)
+    WORKER["incidence"] = sp.csr_matrix((signs.astype(complex), (parent_inds, np.arange(len(parent_inds)))), shape=(num_nodes,len(parent_inds)))
+
+def solve_window(start, stop, batch_size, tol, max_iter):
+    # Process pool worker: solve time steps start:stop in batches of batch_size, writing the results to the
+    # shared output arrays
+    solver = WORKER["solver"]
+    shared = WORKER["shared"]
+    incidence = WORKER["incidence"]
+    num_nodes = incidence.shape[0]
+    for batch_start in range(start, stop, batch_size):
+        batch = slice(batch_start, min(batch_start + batch_size, stop))
+        injections = shared["injections"][batch]
+        num_times = injections.shape[0]
+        s_net = incidence @ np.ascontiguousarray(injections.transpose(1,0,2)).reshape(injections.shape[1],-1)
+        s = np.ascontiguousarray(s_net.reshape(num_nodes,num_times,3).transpose(1,0,2)[:,solver.nodes])
+        V, iterations, converged, max_change = solver.iterate(s, solver.initial_voltages(num_times), tol, max_iter)
+        shared["V"][batch][:,:,solver.nodes] = V.transpose(0,2,1)
+        shared["S_sub"][batch] = np.sum(solver.V0*np.conj(solver.substation_currents(s, V)), axis=1)
+        shared["iterations"][batch] = iterations
+        shared["converged"][batch] = converged
+        shared["max_change"][batch] = max_change
+    return stop - start
+
+def solve_time_series_parallel(solver, t_inds=None, num_workers=None, window_size=None, batch_size=32, tol=1e-9, max_iter=100):
+    # Same results as solver.solve_time_series(t_inds), computed by num_workers processes (default: all
+    # cores). solver is a FBSPowerFlow or ZBusPowerFlow built on the model holding the load profiles.
+    # window_size: time steps per task, by default the horizon split in 4 windows per worker so the
+    # workers stay busy when some windows converge slower than others.
+    Model = solver.Model
+    if Model is None:
+        raise ValueError("The solver has no model to read the load profiles from (unpickled solver).")
+    if t_inds is None:
+        t_inds = np.arange(num_profile_times(Model))
+    t_inds = np.asarray(t_inds)
+    num_times = len(t_inds)
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    if window_size is None:
+        window_size = max(-(-num_times//(4*num_workers)), 1)
+    parent_inds, signs = injection_components(Model)
+
+    shared = SharedArrays()
+    try:
+        fill_injection_tensor(Model, t_inds, shared.create("injections", (num_times,len(parent_inds),3), complex))
+        V = shared.create("V", (num_times,3,solver.num_nodes), complex)
+        V[:,:,solver.roots] = solver.V0[None,:,None]
+        shared.create("S_sub", (num_times,3), complex)
+        shared.create("iterations", (num_times,), np.int64)
+        shared.create("converged", (num_times,), bool, fill=len(solver.nodes) == 0)
+        shared.create("max_change", (num_times,), float)
+
+        windows = [(start, min(start + window_size, num_times)) for start in range(0, num_times, window_size)]
+        if len(solver.nodes) == 0:
+            windows = []
+        initargs = (solver, shared.specs, parent_inds, signs, solver.num_nodes)
+        if num_workers <= 1:
+            init_worker(*initargs)
+            for start, stop in windows:
+                solve_window(start, stop, batch_size, tol, max_iter)
+            WORKER["shared"].close()
+            WORKER.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker, initargs=initargs) as executor:
+                futures = [executor.submit(solve_window, start, stop, batch_size, tol, max_iter) for start, stop in windows]
+                for future in futures:
+                    future.result()
+
+        result = TimeSeriesResult(t_inds, solver.num_nodes)
+        for name in ["V", "S_sub", "iterations", "converged", "max_change"]:
+            getattr(result, name)[...] = shared[name]
+    finally:
+        shared.close(unlink=True)
+    return result
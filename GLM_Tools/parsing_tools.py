@@ -9,454 +9,269 @@ from GLM_Tools import modif_tools
 import pickle
 import matplotlib.pyplot as plt
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from GLM_Tools.glm_reader import GLMReader, GLMSource, load_model
+from GLM_Tools import model_cache
+from AMI_Player_Tools import ami_store
+
+# Compiled patterns used by the GLM object lexer
+GLM_PROPERTY_RE = re.compile(r"//[^\n]*|([A-Za-z_][\w.:]*)\s+([^;{}]*[^\s;{}])\s*;")
+
+PHASES_RE = re.compile(r"([ABCDN]*)")
+FLOAT_RE = re.compile(r"(\d+(\.\d+)?)")
+INT_RE = re.compile(r"(\d+)")
+UPPER_RE = re.compile(r"([A-Z]*)")
+PT_PHASE_RE = re.compile(r"([ABC]*)")
+REG_TYPE_RE = re.compile(r"([AB])")
+CURRENT_LIMIT_RE = re.compile(r"(\d+(\.\d+)?)(\s?A)?")
+POWER_RE = re.compile(r"([+-]?\d+(?:\.\d+)?[+-]\d+(?:\.\d+)?j)")
+IMPEDANCE_RE = re.compile(r"([+-]?\d*\.\d+[+-]?\d*\.\d+j)")
+LINE_CONFIG_IND_RE = re.compile(r"line_configuration([0-9]+)")
+
+def tokenize_glm_object(obj_string):
+    # Split the body of a single "object <type> { ... }" block into a {property: value} dict in one pass.
+    # The first occurrence of a property wins, matching the behavior of the old per-field re.search calls.
+    props = dict(reversed(GLM_PROPERTY_RE.findall(obj_string, obj_string.find("{") + 1)))
+    props.pop("", None) # comments
+    return props
+
+def set_glm_property(obj_string, key, value):
+    # Set a property in the text of a single GLM object (or block), leaving the rest of the text untouched.
+    # The first occurrence is replaced, since that is the one tokenize_glm_object reads. A missing property
+    # is added before the closing brace.
+    for prop_match in GLM_PROPERTY_RE.finditer(obj_string, obj_string.find("{") + 1):
+        if prop_match.group(1) == key:
+            return obj_string[:prop_match.start(2)] + value + obj_string[prop_match.end(2):]
+    close_brace = obj_string.rfind("}")
+    if close_brace < 0:
+        raise ValueError(f"Could not find the end of GLM object: {obj_string}")
+    before = obj_string[:close_brace].rstrip(" \t")
+    if before.endswith("\n"):
+        return before + f"\t{key} {value};\n" + obj_string[len(before):]
+    return before + f" {key} {value}; " + obj_string[close_brace:]
+
+def get_glm_property(props, key, value_re=None, obj_desc=None, obj_string=None, default=None):
+    # Look up a tokenized property and (optionally) check it against value_re. If obj_desc is given the
+    # property is required and a missing/malformed value raises "Could not find <obj_desc>: <obj_string>".
+    value = props.get(key)
+    if value is not None:
+        if value_re is None:
+            return value
+        value_match = value_re.fullmatch(value)
+        if value_match:
+            return value_match.group(1)
+    if obj_desc is not None:
+        raise ValueError(f"Could not find {obj_desc}: {obj_string}")
+    return default
+
+def parse_node(node_string, props=None):
+
+    if props is None:
+        props = tokenize_glm_object(node_string)
+
+    name = get_glm_property(props, "name", None, "name of node object", node_string)
+    phases = get_glm_property(props, "phases", PHASES_RE, "phases of node object", node_string)
+    nom_volt = float(get_glm_property(props, "nominal_voltage", FLOAT_RE, "phases of node object", node_string))
+    bus_type = get_glm_property(props, "bustype", UPPER_RE, default="")
+    parent = get_glm_property(props, "parent", None)
 
-def parse_node(node_string):
+    return psm.Node(name,phases,nom_volt,bus_type,parent,node_string)
 
-    name_match = re.search(r"name\s+([^\s][^;]*);", node_string, re.S)
-    if name_match:
-        name = name_match.group(1)
-    else:
-        raise ValueError(f"Could not find name of node object: {node_string}")
-    
-    phases_match = re.search(r"phases\s+([ABCDN]*);", node_string, re.S)
-    if phases_match:
-        phases = phases_match.group(1)
-    else:
-        raise ValueError(f"Could not find phases of node object: {node_string}")
-    
-    nom_volt_match = re.search(r"nominal_voltage\s+(\d+(\.\d+)?);", node_string, re.S)
-    if nom_volt_match:
-        nom_volt = float(nom_volt_match.group(1))
-    else:
-        raise ValueError(f"Could not find phases of node object: {node_string}")
-    
-    bus_type_match = re.search(r"bustype\s+([A-Z]*);", node_string, re.S)
-    if bus_type_match:
-        bus_type = bus_type_match.group(1)
-    else:
-        bus_type = ""
 
-    parent_match = re.search(r"parent\s+([^\s][^;]*);", node_string, re.S)
-    if parent_match:
-        parent = parent_match.group(1)
-    else:
-        parent = None
-
-    return psm.Node(name,phases,nom_volt,bus_type,parent,node_string)
+def parse_branch(branch_type,branch_string,props=None):
 
+    if props is None:
+        props = tokenize_glm_object(branch_string)
 
-def parse_branch(branch_type,branch_string):
+    name = get_glm_property(props, "name", None, "name of branch object", branch_string)
+    from_bus = get_glm_property(props, "from", None, "from bus of branch object", branch_string)
+    to_bus = get_glm_property(props, "to", None, "to bus of branch object", branch_string)
+    phases = get_glm_property(props, "phases", PHASES_RE, "phases of branch object", branch_string)
 
-    name_match = re.search(r"name\s+([^\s][^;]*);", branch_string, re.S)
-    if name_match:
-        name = name_match.group(1)
-    else:
-        raise ValueError(f"Could not find name of branch object: {branch_string}")
-    
-    from_bus_match = re.search(r"from\s+([^\s][^;]*);", branch_string, re.S)
-    if from_bus_match:
-        from_bus = from_bus_match.group(1)
-    else:
-        raise ValueError(f"Could not find from bus of branch object: {branch_string}")
-    
-    to_bus_match = re.search(r"to\s+([^\s][^;]*);", branch_string, re.S)
-    if to_bus_match:
-        to_bus = to_bus_match.group(1)
-    else:
-        raise ValueError(f"Could not find to bus of branch object: {branch_string}")
-    
-    phases_match = re.search(r"phases\s+([ABCDN]*);", branch_string, re.S)
-    if phases_match:
-        phases = phases_match.group(1)
-    else:
-        raise ValueError(f"Could not find phases of branch object: {branch_string}")
-    
     branch_params = []
-    
+
     if branch_type in ["overhead_line","underground_line","transformer","regulator"]:
-        config_match = re.search(r"configuration\s+([^\s][^;]*);", branch_string, re.S)
-        if config_match:
-            config = config_match.group(1)
-        else:
-            raise ValueError(f"Could not find configuration of branch object: {branch_string}")
-        branch_params.append(config)
-    
+        branch_params.append(get_glm_property(props, "configuration", None, "configuration of branch object", branch_string))
+
     if branch_type in ["overhead_line","underground_line"]:
-        length_match = re.search(r"length\s+(\d+(\.\d+)?);", branch_string, re.S)
-        if length_match:
-            length = float(length_match.group(1))
-        else:
-            raise ValueError(f"Could not find length of branch object: {branch_string}")
-        branch_params.append(length)
+        branch_params.append(float(get_glm_property(props, "length", FLOAT_RE, "length of branch object", branch_string)))
 
     if branch_type in ["fuse"]:
-        current_limit_match = re.search(r"current_limit\s+(\d+(\.\d+)?)(\s?A)?;", branch_string, re.S)
-        if current_limit_match:
-            current_limit = float(current_limit_match.group(1))
-        else:
-            raise ValueError(f"Could not find current limit of branch object: {branch_string}")
-        branch_params.append(current_limit)
-
-        mean_replacement_time_match = re.search(r"mean_replacement_time\s+(\d+(\.\d+)?)\s*;", branch_string, re.S)
-        if mean_replacement_time_match:
-            mean_replacement_time = float(mean_replacement_time_match.group(1))
-        else:
-            raise ValueError(f"Could not find mean replacement time of branch object: {branch_string}")
-        branch_params.append(mean_replacement_time)
-
-        repair_dist_type_match = re.search(r"repair_dist_type\s+([A-Z]*);", branch_string, re.S)
-        if repair_dist_type_match:
-            repair_dist_type = repair_dist_type_match.group(1)
-        else:
-            raise ValueError(f"Could not find repair dist type of branch object: {branch_string}")
-        branch_params.append(repair_dist_type)
+        branch_params.append(float(get_glm_property(props, "current_limit", CURRENT_LIMIT_RE, "current limit of branch object", branch_string)))
+        branch_params.append(float(get_glm_property(props, "mean_replacement_time", FLOAT_RE, "mean replacement time of branch object", branch_string)))
+        branch_params.append(get_glm_property(props, "repair_dist_type", UPPER_RE, "repair dist type of branch object", branch_string))
 
     if branch_type in ["switch"]:
-        status_match = re.search(r"status\s+([A-Z]*);", branch_string, re.S)
-        if status_match:
-            status = status_match.group(1)
-        else:
-            raise ValueError(f"Could not find status of branch object: {branch_string}")
-        branch_params.append(status)
+        branch_params.append(get_glm_property(props, "status", UPPER_RE, "status of branch object", branch_string))
 
     if branch_type in ["recloser"]:
-        max_number_of_tries_match = re.search(r"max_number_of_tries\s+([0-9]*);", branch_string, re.S)
-        if max_number_of_tries_match:
-            max_number_of_tries = int(max_number_of_tries_match.group(1))
-        else:
-            raise ValueError(f"Could not find max number of tries of branch object: {branch_string}")
-        branch_params.append(max_number_of_tries)
+        branch_params.append(int(get_glm_property(props, "max_number_of_tries", INT_RE, "max number of tries of branch object", branch_string)))
 
     if branch_type in ["regulator"]:
-        sense_node_match = re.search(r"sense_node\s+([^\s][^;]*);", branch_string, re.S)
-        if sense_node_match:
-            sense_node = sense_node_match.group(1)
-        else:
-            raise ValueError(f"Could not find sense node of branch object: {branch_string}")
-        branch_params.append(sense_node)
-    
+        branch_params.append(get_glm_property(props, "sense_node", None, "sense node of branch object", branch_string))
+
     return psm.Branch(branch_type,name,from_bus,to_bus,phases,branch_params,branch_string)
 
-def parse_load(load_string):
+def parse_load(load_string, props=None):
+
+    if props is None:
+        props = tokenize_glm_object(load_string)
+
+    name = get_glm_property(props, "name", None, "name of load object", load_string)
+    parent = get_glm_property(props, "parent", None, "parent of load object", load_string)
+    phases = get_glm_property(props, "phases", PHASES_RE, "phases of load object", load_string)
+    nom_volt = float(get_glm_property(props, "nominal_voltage", FLOAT_RE, "phases of load object", load_string))
 
-    name_match = re.search(r"name\s+([^\s][^;]*);", load_string, re.S)
-    if name_match:
-        name = name_match.group(1)
-    else:
-        raise ValueError(f"Could not find name of load object: {load_string}")
-    
-    parent_match = re.search(r"parent\s+([^\s][^;]*);", load_string, re.S)
-    if parent_match:
-        parent = parent_match.group(1)
-    else:
-        raise ValueError(f"Could not find parent of load object: {load_string}")
-    
-    phases_match = re.search(r"phases\s+([ABCDN]*);", load_string, re.S)
-    if phases_match:
-        phases = phases_match.group(1)
-    else:
-        raise ValueError(f"Could not find phases of load object: {load_string}")
-    
-    nom_volt_match = re.search(r"nominal_voltage\s+(\d+(\.\d+)?);", load_string, re.S)
-    if nom_volt_match:
-        nom_volt = float(nom_volt_match.group(1))
-    else:
-        raise ValueError(f"Could not find phases of load object: {load_string}")
-    
     load_params = []
 
     for ph in ["A","B","C"]:
-        constant_power_match = re.search(fr"constant_power_{ph}\s+([+-]?\d+(?:\.\d+)?[+-]\d+(?:\.\d+)?j);", load_string, re.S)
-        if constant_power_match:
-            constant_power = complex(constant_power_match.group(1))
-        else:
-            constant_power = complex(0,0)
-        load_params.append(constant_power)
+        constant_power = get_glm_property(props, f"constant_power_{ph}", POWER_RE)
+        load_params.append(complex(constant_power) if constant_power is not None else complex(0,0))
 
     return psm.Load(name,parent,phases,nom_volt,load_params,load_string)
 
-def parse_generator(gen_string):
+def parse_generator(gen_string, props=None):
+
+    if props is None:
+        props = tokenize_glm_object(gen_string)
+
+    name = get_glm_property(props, "name", None, "name of gen object", gen_string)
+    parent = get_glm_property(props, "parent", None, "parent of gen object", gen_string)
+    phases = get_glm_property(props, "phases", PHASES_RE, "phases of gen object", gen_string)
+    nom_volt = float(get_glm_property(props, "nominal_voltage", FLOAT_RE, "phases of gen object", gen_string))
 
-    name_match = re.search(r"name\s+([^\s][^;]*);", gen_string, re.S)
-    if name_match:
-        name = name_match.group(1)
-    else:
-        raise ValueError(f"Could not find name of gen object: {gen_string}")
-    
-    parent_match = re.search(r"parent\s+([^\s][^;]*);", gen_string, re.S)
-    if parent_match:
-        parent = parent_match.group(1)
-    else:
-        raise ValueError(f"Could not find parent of gen object: {gen_string}")
-    
-    phases_match = re.search(r"phases\s+([ABCDN]*);", gen_string, re.S)
-    if phases_match:
-        phases = phases_match.group(1)
-    else:
-        raise ValueError(f"Could not find phases of gen object: {gen_string}")
-    
-    nom_volt_match = re.search(r"nominal_voltage\s+(\d+(\.\d+)?);", gen_string, re.S)
-    if nom_volt_match:
-        nom_volt = float(nom_volt_match.group(1))
-    else:
-        raise ValueError(f"Could not find phases of gen object: {gen_string}")
-    
     gen_params = []
 
     for ph in ["A","B","C"]:
-        constant_power_match = re.search(fr"constant_power_{ph}\s+([+-]?\d+(?:\.\d+)?[+-]\d+(?:\.\d+)?j);", gen_string, re.S)
-        if constant_power_match:
-            constant_power = complex(constant_power_match.group(1))
-        else:
-            constant_power = complex(0,0)
-        gen_params.append(constant_power)
+        constant_power = get_glm_property(props, f"constant_power_{ph}", POWER_RE)
+        gen_params.append(complex(constant_power) if constant_power is not None else complex(0,0))
 
     return psm.Generator(name,parent,phases,nom_volt,gen_params,gen_string)
 
-def parse_shunt(shunt_type,shunt_string):
+def parse_shunt(shunt_type,shunt_string,props=None):
+
+    if props is None:
+        props = tokenize_glm_object(shunt_string)
+
+    name = get_glm_property(props, "name", None, "name of shunt object", shunt_string)
+    parent = get_glm_property(props, "parent", None, "parent of shunt object", shunt_string)
+    phases = get_glm_property(props, "phases", PHASES_RE, "phases of shunt object", shunt_string)
+    nom_volt = float(get_glm_property(props, "nominal_voltage", FLOAT_RE, "phases of shunt object", shunt_string))
 
-    name_match = re.search(r"name\s+([^\s][^;]*);", shunt_string, re.S)
-    if name_match:
-        name = name_match.group(1)
-    else:
-        raise ValueError(f"Could not find name of shunt object: {shunt_string}")
-    
-    parent_match = re.search(r"parent\s+([^\s][^;]*);", shunt_string, re.S)
-    if parent_match:
-        parent = parent_match.group(1)
-    else:
-        raise ValueError(f"Could not find parent of shunt object: {shunt_string}")
-    
-    phases_match = re.search(r"phases\s+([ABCDN]*);", shunt_string, re.S)
-    if phases_match:
-        phases = phases_match.group(1)
-    else:
-        raise ValueError(f"Could not find phases of shunt object: {shunt_string}")
-    
-    nom_volt_match = re.search(r"nominal_voltage\s+(\d+(\.\d+)?);", shunt_string, re.S)
-    if nom_volt_match:
-        nom_volt = float(nom_volt_match.group(1))
-    else:
-        raise ValueError(f"Could not find phases of shunt object: {shunt_string}")
-    
     shunt_params = []
 
     if shunt_type in ["capacitor"]:
-        phases_connected_match = re.search(r"phases_connected\s+([ABCDN]*);", shunt_string, re.S)
-        if phases_connected_match:
-            phases_connected = phases_connected_match.group(1)
-        else:
-            raise ValueError(f"Could not find phases_connected of shunt object: {shunt_string}")
-        shunt_params.append(phases_connected)
-
+        shunt_params.append(get_glm_property(props, "phases_connected", PHASES_RE, "phases_connected of shunt object", shunt_string))
         for ph in ["A","B","C"]:
-            capacitor_match = re.search(fr"capacitor_{ph}\s+(\d+(\.\d+)?);", shunt_string, re.S)
-            if capacitor_match:
-                capacitor = float(capacitor_match.group(1))
-            else:
-                raise ValueError(f"Could not find capacitor_{ph} of shunt object: {shunt_string}")
-            shunt_params.append(capacitor)
-
-        control_level_match = re.search(r"control_level\s+([A-Z]*);", shunt_string, re.S)
-        if control_level_match:
-            control_level = control_level_match.group(1)
-        else:
-            raise ValueError(f"Could not find control_level of shunt object: {shunt_string}")
-        shunt_params.append(control_level)
-
-        control_match = re.search(r"control\s+([A-Z]*);", shunt_string, re.S)
-        if control_match:
-            control = control_match.group(1)
-        else:
-            raise ValueError(f"Could not find control of shunt object: {shunt_string}")
-        shunt_params.append(control)
-
-        pt_phase_match = re.search(r"pt_phase\s+([ABC]*);", shunt_string, re.S)
-        if pt_phase_match:
-            pt_phase = pt_phase_match.group(1)
-        else:
-            raise ValueError(f"Could not find pt_phase of shunt object: {shunt_string}")
-        shunt_params.append(pt_phase)
-
+            shunt_params.append(float(get_glm_property(props, f"capacitor_{ph}", FLOAT_RE, f"capacitor_{ph} of shunt object", shunt_string)))
+        shunt_params.append(get_glm_property(props, "control_level", UPPER_RE, "control_level of shunt object", shunt_string))
+        shunt_params.append(get_glm_property(props, "control", UPPER_RE, "control of shunt object", shunt_string))
+        shunt_params.append(get_glm_property(props, "pt_phase", PT_PHASE_RE, "pt_phase of shunt object", shunt_string))
         for ph in ["A","B","C"]:
-            switch_match = re.search(fr"switch{ph}\s+([A-Z]*);", shunt_string, re.S)
-            if switch_match:
-                switch = switch_match.group(1)
-            else:
-                raise ValueError(f"Could not find switch{ph} of shunt object: {shunt_string}")
-            shunt_params.append(switch)
+            shunt_params.append(get_glm_property(props, f"switch{ph}", UPPER_RE, f"switch{ph} of shunt object", shunt_string))
 
     return psm.Shunt(shunt_type,name,parent,phases,nom_volt,shunt_params,shunt_string)
 
-def parse_config(config_type,config_string,config_impedance_matrices):
+def parse_config(config_type,config_string,config_impedance_matrices,props=None):
+
+    if props is None:
+        props = tokenize_glm_object(config_string)
+
+    name = get_glm_property(props, "name", None, "name of config object", config_string)
 
-    name_match = re.search(r"name\s+([^\s][^;]*);", config_string, re.S)
-    if name_match:
-        name = name_match.group(1)
-    else:
-        raise ValueError(f"Could not find name of config object: {config_string}")
-    
     config_params = []
 
     if config_type in ["line_configuration"]:
         z_strs = ['11','12','13','21','22','23','31','32','33']
-        z_test = re.search(fr"z{'11'}\s+([+-]?\d*\.\d+[+-]?\d*\.\d+j);", config_string, re.S)
-        if z_test:
+        if get_glm_property(props, "z11", IMPEDANCE_RE) is not None:
             for z_str in z_strs:
-                z_match = re.search(fr"z{z_str}\s+([+-]?\d*\.\d+[+-]?\d*\.\d+j);", config_string, re.S)
-                if z_match:
-                    z = complex(z_match.group(1))
-                else:
-                    raise ValueError(f"Could not find z{z_str} of line config object: {config_string}")
-                config_params.append(z)
+                config_params.append(complex(get_glm_property(props, f"z{z_str}", IMPEDANCE_RE, f"z{z_str} of line config object", config_string)))
         else:
-            ind_match = re.search(fr"line_configuration[0-9]+", config_string, re.S)
-            ind = int(ind_match.group(0)[18:])
+            ind = int(LINE_CONFIG_IND_RE.search(config_string).group(1))
             for row in range(3):
                 for col in range(3):
                     z = np.copy(config_impedance_matrices[ind][row, col])
                     config_params.append(z)
 
     elif config_type in ["transformer_configuration"]:
-        connect_type_match = re.search(r"connect_type\s+([^\s][^;]*);", config_string, re.S)
-        if connect_type_match:
-            connect_type = connect_type_match.group(1)
-        else:
-            raise ValueError(f"Could not find connect_type of transformer config object: {config_string}")
-        config_params.append(connect_type)
-
-        install_type_match = re.search(r"install_type\s+([^\s][^;]*);", config_string, re.S)
-        if install_type_match:
-            install_type = install_type_match.group(1)
-        else:
-            raise ValueError(f"Could not find install_type of transformer config object: {config_string}")
-        config_params.append(install_type)
-
-        power_rating_match = re.search(r"power_rating\s+(\d+(\.\d+)?);", config_string, re.S)
-        if power_rating_match:
-            power_rating = float(power_rating_match.group(1))
-        else:
-            raise ValueError(f"Could not find power_rating of transformer config object: {config_string}")
-        config_params.append(power_rating)
-
-        primary_voltage_match = re.search(r"primary_voltage\s+(\d+(\.\d+)?);", config_string, re.S)
-        if primary_voltage_match:
-            primary_voltage = float(primary_voltage_match.group(1))
-        else:
-            raise ValueError(f"Could not find primary_voltage of transformer config object: {config_string}")
-        config_params.append(primary_voltage)
-
-        secondary_voltage_match = re.search(r"secondary_voltage\s+(\d+(\.\d+)?);", config_string, re.S)
-        if secondary_voltage_match:
-            secondary_voltage = float(secondary_voltage_match.group(1))
-        else:
-            raise ValueError(f"Could not find secondary_voltage of transformer config object: {config_string}")
-        config_params.append(secondary_voltage)
-
-        resistance_match = re.search(r"resistance\s+(\d+(\.\d+)?);", config_string, re.S)
-        if resistance_match:
-            resistance = float(resistance_match.group(1))
-        else:
-            raise ValueError(f"Could not find resistance of transformer config object: {config_string}")
-        config_params.append(resistance)
-
-        reactance_match = re.search(r"reactance\s+(\d+(\.\d+)?);", config_string, re.S)
-        if reactance_match:
-            reactance = float(reactance_match.group(1))
-        else:
-            raise ValueError(f"Could not find reactance of transformer config object: {config_string}")
-        config_params.append(reactance)
+        config_params.append(get_glm_property(props, "connect_type", None, "connect_type of transformer config object", config_string))
+        config_params.append(get_glm_property(props, "install_type", None, "install_type of transformer config object", config_string))
+        for key in ["power_rating", "primary_voltage", "secondary_voltage", "resistance", "reactance"]:
+            config_params.append(float(get_glm_property(props, key, FLOAT_RE, f"{key} of transformer config object", config_string)))
 
     elif config_type in ["regulator_configuration"]:
-        connect_type_match = re.search(r"connect_type\s+([^\s][^;]*);", config_string, re.S)
-        if connect_type_match:
-            connect_type = connect_type_match.group(1)
-        else:
-            raise ValueError(f"Could not find connect_type of regulator config object: {config_string}")
-        config_params.append(connect_type)
-
-        band_center_match = re.search(r"band_center\s+(\d+(\.\d+)?);", config_string, re.S)
-        if band_center_match:
-            band_center = float(band_center_match.group(1))
-        else:
-            raise ValueError(f"Could not find band_center of regulator config object: {config_string}")
-        config_params.append(band_center)
-
-        band_width_match = re.search(r"band_width\s+(\d+(\.\d+)?);", config_string, re.S)
-        if band_width_match:
-            band_width = float(band_width_match.group(1))
-        else:
-            raise ValueError(f"Could not find band_width of regulator config object: {config_string}")
-        config_params.append(band_width)
-
-        regulation_match = re.search(r"regulation\s+(\d+(\.\d+)?);", config_string, re.S)
-        if regulation_match:
-            regulation = float(regulation_match.group(1))
-        else:
-            raise ValueError(f"Could not find regulation of regulator config object: {config_string}")
-        config_params.append(regulation)
-
-        raise_taps_match = re.search(r"raise_taps\s+(\d+);", config_string, re.S)
-        if raise_taps_match:
-            raise_taps = int(raise_taps_match.group(1))
-        else:
-            raise ValueError(f"Could not find raise_taps of regulator config object: {config_string}")
-        config_params.append(raise_taps)
-
-        lower_taps_match = re.search(r"lower_taps\s+(\d+);", config_string, re.S)
-        if lower_taps_match:
-            lower_taps = int(lower_taps_match.group(1))
-        else:
-            raise ValueError(f"Could not find lower_taps of regulator config object: {config_string}")
-        config_params.append(lower_taps)
-
-        CT_phase_match = re.search(r"CT_phase\s+([ABCDN]*);", config_string, re.S)
-        if CT_phase_match:
-            CT_phase = CT_phase_match.group(1)
-        else:
-            raise ValueError(f"Could not find CT_phase of regulator config object: {config_string}")
-        config_params.append(CT_phase)
-
-        PT_phase_match = re.search(r"PT_phase\s+([ABCDN]*);", config_string, re.S)
-        if PT_phase_match:
-            PT_phase = PT_phase_match.group(1)
-        else:
-            raise ValueError(f"Could not find PT_phase of regulator config object: {config_string}")
-        config_params.append(PT_phase)
-
-        Type_match = re.search(r"Type\s+([AB]);", config_string, re.S)
-        if Type_match:
-            Type = Type_match.group(1)
-        else:
-            raise ValueError(f"Could not find Type of regulator config object: {config_string}")
-        config_params.append(Type)
-
-        Control_match = re.search(r"Control\s+([^\s][^;]*);", config_string, re.S)
-        if Control_match:
-            Control = Control_match.group(1)
-        else:
-            raise ValueError(f"Could not find Control of regulator config object: {config_string}")
-        config_params.append(Control)
-
-        control_level_match = re.search(r"control_level\s+([^\s][^;]*);", config_string, re.S)
-        if control_level_match:
-            control_level = control_level_match.group(1)
-        else:
-            raise ValueError(f"Could not find control_level of regulator config object: {config_string}")
-        config_params.append(control_level)
-
+        config_params.append(get_glm_property(props, "connect_type", None, "connect_type of regulator config object", config_string))
+        for key in ["band_center", "band_width", "regulation"]:
+            config_params.append(float(get_glm_property(props, key, FLOAT_RE, f"{key} of regulator config object", config_string)))
+        for key in ["raise_taps", "lower_taps"]:
+            config_params.append(int(get_glm_property(props, key, INT_RE, f"{key} of regulator config object", config_string)))
+        config_params.append(get_glm_property(props, "CT_phase", PHASES_RE, "CT_phase of regulator config object", config_string))
+        config_params.append(get_glm_property(props, "PT_phase", PHASES_RE, "PT_phase of regulator config object", config_string))
+        config_params.append(get_glm_property(props, "Type", REG_TYPE_RE, "Type of regulator config object", config_string))
+        config_params.append(get_glm_property(props, "Control", None, "Control of regulator config object", config_string))
+        config_params.append(get_glm_property(props, "control_level", None, "control_level of regulator config object", config_string))
         for ph in ["A","B","C"]:
-            tap_pos_match = re.search(fr"tap_pos_{ph}\s+(\d+);", config_string, re.S)
-            if tap_pos_match:
-                tap_pos = int(tap_pos_match.group(1))
-            else:
-                raise ValueError(f"Could not find tap_pos_{ph} of regulator config object: {config_string}")
-            config_params.append(tap_pos)
+            config_params.append(int(get_glm_property(props, f"tap_pos_{ph}", INT_RE, f"tap_pos_{ph} of regulator config object", config_string)))
 
     return psm.Config(config_type,name,config_params,config_string)
 
 
-def parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name):
+def parse_glm_object(obj_type,obj_string,config_impedance_matrices):
+    # Tokenize a single GLM object once and build the matching psm component from it.
+    # Returns (object class, component), where component is None for helics/misc/unrecognized objects.
+    if obj_type in ["node","meter"]:
+        return "node", parse_node(obj_string,tokenize_glm_object(obj_string))
+    elif obj_type in ["overhead_line", "underground_line", "transformer", "fuse", "switch", "sectionalizer", "recloser", "regulator"]:
+        return "branch", parse_branch(obj_type,obj_string,tokenize_glm_object(obj_string))
+    elif obj_type in ["load"]:
+        props = tokenize_glm_object(obj_string)
+        name = get_glm_property(props, "name", None, "name of load object", obj_string)
+        if "negLdGen" in name or "PV" in name:
+            return "generator", parse_generator(obj_string,props)
+        else:
+            return "load", parse_load(obj_string,props)
+    elif obj_type in ["capacitor"]:
+        return "shunt", parse_shunt(obj_type,obj_string,tokenize_glm_object(obj_string))
+    elif obj_type in ["regulator_configuration", "transformer_configuration", "line_configuration"]:
+        return "config", parse_config(obj_type,obj_string,config_impedance_matrices,tokenize_glm_object(obj_string))
+    elif obj_type in ["helics_msg"]:
+        return "helics", None
+    elif obj_type in ["voltdump", "currdump", "impedance_dump", "group_recorder", "recorder"]:
+        return "misc", None
+    else:
+        return None, None
+
+
+def parse_glm_object_chunk(obj_chunk,config_impedance_matrices):
+    # Process pool worker: parse a list of GLMObjects, keeping their order
+    return [parse_glm_object(glm_obj.obj_type,glm_obj.text,config_impedance_matrices) for glm_obj in obj_chunk]
+
+def parse_glm_objects(glm_objs,config_impedance_matrices,num_workers=1,chunk_size=2000):
+    # Parse a stream of GLMObjects, yielding (GLMObject, object class, component) in stream order.
+    # With num_workers > 1 the stream is split into contiguous chunks that are parsed in a process pool
+    # and merged back in their original order, so the result is identical to the serial path. At most
+    # 2*num_workers chunks are in flight, so the stream is never held in memory all at once.
+    if num_workers <= 1:
+        for glm_obj in glm_objs:
+            yield (glm_obj,) + parse_glm_object(glm_obj.obj_type,glm_obj.text,config_impedance_matrices)
+        return
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        in_flight = deque()
+        glm_objs = iter(glm_objs)
+        while True:
+            obj_chunk = list(islice(glm_objs,chunk_size))
+            if obj_chunk:
+                in_flight.append((obj_chunk, executor.submit(parse_glm_object_chunk,obj_chunk,config_impedance_matrices)))
+            if in_flight and (not obj_chunk or len(in_flight) >= 2*num_workers):
+                done_chunk, future = in_flight.popleft()
+                for glm_obj, parsed_obj in zip(done_chunk,future.result()):
+                    yield (glm_obj,) + parsed_obj
+            elif not obj_chunk:
+                break
+
+def parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name, num_workers=1, use_cache=True):
 
     glm_file_dir = f"{root_dir}/Feeder_Data/{substation_name}/Input_Data/"
     glm_file_name = f"{substation_name}.glm"
@@ -466,24 +281,21 @@ def parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name):
     pkl_file_name = f"{substation_name}_Model.pkl"
     pkl_file = os.path.join(pkl_file_dir,pkl_file_name)
 
-    print(f"Parsing {glm_file_name}...")
+    xml_file = f"{root_dir}/Feeder_Data/{substation_name}/Output_Data/{impedance_dump_name}.xml"
 
-    with open(glm_file, 'r') as file:
-        glm_data = file.read()
+    # Skip parsing if the pkl was built from the same GLM and impedance dump by the same parser version
+    if use_cache and model_cache.check_model_cache(pkl_file, [glm_file, xml_file]):
+        print(f"{glm_file_name} and {impedance_dump_name}.xml unchanged. Using cached Python model {pkl_file}.")
+        return pkl_file
+    cache_entries = model_cache.cache_entries([glm_file, xml_file])
+
+    print(f"Parsing {glm_file_name}...")
 
     # Get line impedance data
     config_impedance_matrices = modif_tools.pull_line_impedances(root_dir, substation_name, impedance_dump_name)
 
-    # Parse GLM file
-    first_obj = re.search(r"object (\S*) \{[^{}]*\}", glm_data, re.S)
-    header = glm_data[:first_obj.start()]
-
-    objects = []
-    node_objs = []
-    branch_objs = []
-    load_objs = []
-    shunt_objs = []
-    config_objs = []
+    obj_counts = {"node": 0, "branch": 0, "load": 0, "shunt": 0, "config": 0, "helics": 0, "misc": 0}
+    num_objs = 0
     helics_objs = []
     misc_objs = []
 
@@ -494,56 +306,50 @@ def parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name):
     Shunts = []
     Configs = []
 
-    for obj in re.finditer(r"object (\S*) \{[^{}]*\}", glm_data, re.S):
-        objects.append(obj.group(0))
-        obj_type = obj.group(1).strip('"')
-        if obj_type in ["node","meter"]:
-            node_string = obj.group(0)
-            node_objs.append(node_string)
-            Nodes.append(parse_node(node_string))
-        elif obj_type in ["overhead_line", "underground_line", "transformer", "fuse", "switch", "sectionalizer", "recloser", "regulator"]:
-            branch_string = obj.group(0)
-            branch_objs.append(branch_string)
-            Branches.append(parse_branch(obj_type,branch_string))
-        elif obj_type in ["load"]:
-            load_string = obj.group(0)
-            load_objs.append(load_string)
-            name_match = re.search(r"name\s+([^\s][^;]*);", load_string, re.S)
-            if name_match:
-                name = name_match.group(1)
-            else:
-                raise ValueError(f"Could not find name of load object: {load_string}")
-            if "negLdGen" in name or "PV" in name:
-                Generators.append(parse_generator(load_string))
+    # components of contiguous objects keep a span of the GLM instead of a copy of their text
+    glm_source = GLMSource(glm_file, cache_entries[0], f"{root_dir}/Feeder_Data/{substation_name}")
+
+    # Parse GLM file (streamed, nested objects included)
+    with open(glm_file, 'rb') as file:
+        glm_reader = GLMReader(file)
+        for glm_obj, obj_class, component in parse_glm_objects(glm_reader,config_impedance_matrices,num_workers):
+            num_objs += 1
+            if component is not None and glm_obj.contiguous:
+                component.set_glm_source(glm_source, glm_obj.offset, glm_obj.length)
+            if obj_class == "node":
+                Nodes.append(component)
+            elif obj_class == "branch":
+                Branches.append(component)
+            elif obj_class == "load":
+                Loads.append(component)
+            elif obj_class == "generator":
+                Generators.append(component)
+            elif obj_class == "shunt":
+                Shunts.append(component)
+            elif obj_class == "config":
+                Configs.append(component)
+            elif obj_class == "helics":
+                helics_objs.append(glm_obj.text)
+            elif obj_class == "misc":
+                misc_objs.append(glm_obj.text)
             else:
-                Loads.append(parse_load(load_string))
-        elif obj_type in ["capacitor"]:
-            shunt_string = obj.group(0)
-            shunt_objs.append(shunt_string)
-            Shunts.append(parse_shunt(obj_type,shunt_string))
-        elif obj_type in ["regulator_configuration", "transformer_configuration", "line_configuration"]:
-            config_string = obj.group(0)
-            config_objs.append(config_string)
-            Configs.append(parse_config(obj_type,config_string, config_impedance_matrices))
-        elif obj_type in ["helics_msg"]:
-            helics_objs.append(obj.group(0))
-        elif obj_type in ["voltdump", "currdump", "impedance_dump", "group_recorder", "recorder"]:
-            misc_objs.append(obj.group(0))
-        else:
-            print(f"Unrecognized object type: {obj_type}")
+                print(f"Unrecognized object type: {glm_obj.obj_type}")
+                continue
+            obj_counts["load" if obj_class == "generator" else obj_class] += 1
+    header = glm_reader.header
 
-    miss_objs = len(objects) - (len(node_objs) + len(branch_objs) + len(load_objs) + len(shunt_objs) + len(config_objs) + len(helics_objs) + len(misc_objs))
+    miss_objs = num_objs - sum(obj_counts.values())
     if miss_objs > 0:
         print(f"Missing {miss_objs} objects.")
     else:
-        print(f"  Found all {len(objects)} objects.")
-        print(f"  Found {len(node_objs)} node objects.")
-        print(f"  Found {len(branch_objs)} branch objects.")
-        print(f"  Found {len(load_objs)} load objects.")
-        print(f"  Found {len(shunt_objs)} shunt objects.")
-        print(f"  Found {len(config_objs)} config objects.")
-        print(f"  Found {len(helics_objs)} helics_msg objects.")
-        print(f"  Found {len(misc_objs)} misc objects.")
+        print(f"  Found all {num_objs} objects.")
+        print(f"  Found {obj_counts['node']} node objects.")
+        print(f"  Found {obj_counts['branch']} branch objects.")
+        print(f"  Found {obj_counts['load']} load objects.")
+        print(f"  Found {obj_counts['shunt']} shunt objects.")
+        print(f"  Found {obj_counts['config']} config objects.")
+        print(f"  Found {obj_counts['helics']} helics_msg objects.")
+        print(f"  Found {obj_counts['misc']} misc objects.")
 
     # Create a model from the components
     Model = psm.PowerSystemModel(Nodes,Branches,Loads,Generators,Shunts,Configs)
@@ -560,15 +366,17 @@ def parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name):
         os.makedirs(pkl_file_dir)
     with open(pkl_file, 'wb') as file:
         pickle.dump(Model, file)
+    model_cache.save_model_cache(pkl_file, cache_entries)
 
     print(f"Done parsing {glm_file_name}. Python model saved to {pkl_file}.")
 
+    return pkl_file
+
 def populate_ami_loads_pkl(substation_name, start_date, end_date, load_fixed_pf):
 
     # Open pkl file
     pkl_file = f"Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model.pkl"
-    with open(pkl_file, 'rb') as file:
-        pkl_model = pickle.load(file)
+    pkl_model = load_model(pkl_file)
 
     Sbase_1ph = pkl_model.Sbase_1ph
 
@@ -589,13 +397,6 @@ def populate_ami_loads_pkl(substation_name, start_date, end_date, load_fixed_pf)
     load_ami_data_file = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Load_AMI_Data.csv"
     gen_ami_data_file = f"Feeder_Data/{substation_name}/AMI_Data/{substation_name}_True_Gen_AMI_Data.csv"
 
-    load_ami_data = pd.read_csv(load_ami_data_file)
-    gen_ami_data = pd.read_csv(gen_ami_data_file)
-
-    # Convert times to datetime
-    load_ami_data['start_date_time'] = pd.to_datetime(load_ami_data['start_date_time'], utc=True)
-    gen_ami_data['start_date_time'] = pd.to_datetime(gen_ami_data['start_date_time'], utc=True)
-
     # Loads to skip: these loads are in GIS but not in WindMil/GLD, need to investigate further...    
     loads_to_skip_file = f"Feeder_Data/{substation_name}/loads_in_gis_but_not_glm.csv"
     gens_to_skip_file = f"Feeder_Data/{substation_name}/gens_in_gis_but_not_glm.csv"
@@ -606,9 +407,9 @@ def populate_ami_loads_pkl(substation_name, start_date, end_date, load_fixed_pf)
     loads_to_skip = [str(load) for load in loads_to_skip_data['Service Number'].tolist()]
     gens_to_skip = [str(gen) for gen in gens_to_skip_data['Object ID'].tolist()]
 
-    # Filter AMI data between relevant dates
-    load_ami_filt = load_ami_data[(load_ami_data['start_date_time']>=datetimes_list[0]) & (load_ami_data['start_date_time']<=datetimes_list[-1])]
-    gen_ami_filt = gen_ami_data[(gen_ami_data['start_date_time']>=datetimes_list[0]) & (gen_ami_data['start_date_time']<=datetimes_list[-1])]
+    # Read the AMI data of the meters in the dictionaries between the relevant dates
+    load_ami_filt = ami_store.open_ami_store(load_ami_data_file).read(datetimes_list[0], datetimes_list[-1], [str(meter) for meter in load_dict['Meter Number']])
+    gen_ami_filt = ami_store.open_ami_store(gen_ami_data_file).read(datetimes_list[0], datetimes_list[-1], [str(meter) for meter in gen_dict['Meter Number']])
 
     # Update start and end dates in PowerSystemModel object
     pkl_model.ami_datetimes = load_ami_filt['start_date_time'].values
@@ -673,8 +474,12 @@ def populate_ami_loads_pkl(substation_name, start_date, end_date, load_fixed_pf)
                 else:
                     ValueError(f"Phase {ph} not recognized in load: {gen_name}")
             pkl_model.Generators[gen_obj_ind].Sgen = gen_value_vect
+
+    # keep the model's stacked Sload/Sgen in step with the new profiles
+    pkl_model.link_injection_arrays()
     
-    # Save updated pkl file
+    # Save updated pkl file, no longer a cached parse of the GLM
+    model_cache.clear_model_cache(pkl_file)
     with open(pkl_file, 'wb') as file:
         pickle.dump(pkl_model, file)
 
@@ -683,8 +488,7 @@ def add_coords_to_pkl(root_dir,substation_name):
 
     # Open pkl file
     pkl_file = f"{root_dir}/Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model.pkl"
-    with open(pkl_file, 'rb') as file:
-        pkl_model = pickle.load(file)
+    pkl_model = load_model(pkl_file)
 
     # Check if GLD file is from WindMil or CYME
     branch_coord_file = f"{root_dir}/Feeder_Data/{substation_name}/Coordinate_Data/{substation_name}_Branch_Coords.xls"
@@ -830,7 +634,8 @@ def add_coords_to_pkl(root_dir,substation_name):
             to_node.X_coord = branch.X_coord
             to_node.Y_coord = branch.Y_coord
 
-    # Save updated pkl file
+    # Save updated pkl file, no longer a cached parse of the GLM
+    model_cache.clear_model_cache(pkl_file)
     with open(pkl_file, 'wb') as file:
         pickle.dump(pkl_model, file)
 
@@ -838,8 +643,7 @@ def plot_feeder(substation_name):
 
     # Open pkl file
     pkl_file = f"Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model.pkl"
-    with open(pkl_file, 'rb') as file:
-        pkl_model = pickle.load(file)
+    pkl_model = load_model(pkl_file)
 
     for Branch in pkl_model.Branches:
         plt.plot([Branch.X_coord,Branch.X2_coord],[Branch.Y_coord,Branch.Y2_coord],color='black')
@@ -856,8 +660,7 @@ def plot_CYME_feeder(root_dir, substation_name):
 
     # Open pkl file
     pkl_file = f"{root_dir}/Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model.pkl"
-    with open(pkl_file, 'rb') as file:
-        pkl_model = pickle.load(file)
+    pkl_model = load_model(pkl_file)
 
     # Get indices of substation nodes 
     node_file = f"{root_dir}/Feeder_Data/{substation_name}/Coordinate_Data/Nodes.csv"
@@ -892,33 +695,22 @@ def plot_CYME_feeder(root_dir, substation_name):
 
     plt.show()
 
+def write_glm_from_model(Model,glm_file):
+    # Objects parsed from a GLM are written by slicing their span of the (memory-mapped) source file
+    with open(glm_file, 'wb') as file:
+        file.write(Model.glm_header.encode())
+        file.write(Model.glm_helics_obj.encode())
+        file.write(b"\n\n")
+        for components in [Model.Nodes, Model.Branches, Model.Loads, Model.Generators, Model.Shunts, Model.Configs]:
+            for component in components:
+                file.write(component.glm_bytes())
+                file.write(b"\n\n")
+        for misc_obj in Model.glm_misc_objs:
+            file.write(misc_obj.encode())
+            file.write(b"\n\n")
+
 def create_glm_from_pkl(pkl_file,glm_file):
 
-    with open(pkl_file, 'rb') as file:
-        pkl_model = pickle.load(file)
-
-    with open(glm_file, 'w') as file:
-        file.write(pkl_model.glm_header)
-        file.write(pkl_model.glm_helics_obj)
-        file.write("\n\n")
-        for Node in pkl_model.Nodes:
-            file.write(Node.glm_string)
-            file.write("\n\n")
-        for Branch in pkl_model.Branches:
-            file.write(Branch.glm_string)
-            file.write("\n\n")
-        for Load in pkl_model.Loads:
-            file.write(Load.glm_string)
-            file.write("\n\n")
-        for Generator in pkl_model.Generators:
-            file.write(Generator.glm_string)
-            file.write("\n\n")
-        for Shunt in pkl_model.Shunts:
-            file.write(Shunt.glm_string)
-            file.write("\n\n")
-        for Config in pkl_model.Configs:
-            file.write(Config.glm_string)
-            file.write("\n\n")
-        for misc_obj in pkl_model.glm_misc_objs:
-            file.write(misc_obj)
-            file.write("\n\n")
+    pkl_model = load_model(pkl_file)
+
+    write_glm_from_model(pkl_model,glm_file)
@@ -0,0 +1,613 @@
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from GLM_Tools.PowerSystemModel import ARRAY_FIELDS
+
+# Native three-phase power flow on a PowerSystemModel. It solves the same equations as
+# Opt_Tools/solve_3ph_pf.jl, in per unit on the model's bases:
+#   V_from = A_br*V_to + B_br*I_br for every closed branch
+#   sum_out V.*conj(D_br*I_br) - sum_in V.*conj(I_br) = s_gen - s_load at every node but the SWING node(s)
+# where s_load includes the closed capacitor phases, diag(V*V'*conj(Ycap)).
+#
+# The sweeps follow the tree of Model.topology. With J_n the current node n draws through its parent
+# branch, the backward sweep is J_n = conj(s_n/V_n) + sum over children c of M3_c*J_c and the forward
+# sweep is V_n = M1_n*V_parent - M2_n*J_n. Ordered by BFS these are unit triangular block systems, so
+# each sweep is one sparse triangular solve (factored once) over all tree levels at once, instead of a
+# Python loop over the levels.
+#
+# FBSPowerFlow only handles radial feeders. ZBusPowerFlow also solves meshed ones: it factors the
+# admittance matrix of the energized nodes once and iterates V = Y_uu^-1*(I_load(V) - Y_ur*V_swing).
+# Both solve one time step (solve) or many at once (solve_time_series) with the same fixed-point driver.
+
+V0_REF = np.array([1, np.exp(-2j*np.pi/3), np.exp(2j*np.pi/3)])
+
+def invert_3x3(M):
+    # inverse of a stack of 3x3 matrices, pseudo-inverse for the singular ones (e.g. DELTA_DELTA A_br)
+    M_inv = np.empty_like(M)
+    singular = np.abs(np.linalg.det(M)) < 1e-12
+    if np.any(~singular):
+        M_inv[~singular] = np.linalg.inv(M[~singular])
+    if np.any(singular):
+        M_inv[singular] = np.linalg.pinv(M[singular])
+    return M_inv
+
+def block_matrix(rows, cols, blocks, size):
+    # sparse (3*size,3*size) matrix from 3x3 blocks placed at block positions (rows, cols)
+    ii, jj = np.meshgrid(np.arange(3), np.arange(3), indexing="ij")
+    block_rows = (3*rows[:,None,None] + ii).ravel()
+    block_cols = (3*cols[:,None,None] + jj).ravel()
+    M = sp.csc_matrix((blocks.ravel(), (block_rows, block_cols)), shape=(3*size, 3*size), dtype=complex)
+    M.eliminate_zeros()
+    return M
+
+def apply_blocks(M_T, x):
+    # M[n] @ x[t,n] for 3x3 blocks M (n,3,3) and x (T,n,3), given M_T = M with every block transposed
+    return np.matmul(x.transpose(1,0,2), M_T).transpose(1,0,2)
+
+def lu_solve(lu, x):
+    # solve with a factored matrix for (T,n,3) time steps at once: they are the columns of a Fortran
+    # ordered (3n,T) right-hand side, no copies needed
+    return lu.solve(x.reshape(x.shape[0],-1).T).T.reshape(x.shape)
+
+def component_powers(Model, components, field, t_inds):
+    # (parent node indices, per unit powers) of the loads or generators at time index t_inds. A field
+    # holding a profile (e.g. AMI data, shape (T,3)) uses rows t_inds, like Load.Sload[t_ind,:] in the Julia
+    # solvers, a constant (3,) field is used at every time. Powers are (n,3) for a single time index and
+    # (n,len(t_inds),3) for an array of them. Components without the field are skipped.
+    array_name = ARRAY_FIELDS[field][0]
+    rows_set = Model.array_rows_set.get(array_name)
+    if rows_set is not None and len(rows_set) == len(components) and rows_set.all():
+        parent_inds = np.array([obj.parent_node_ind for obj in components], dtype=np.int64)
+        powers = Model.__dict__[array_name]
+        if powers.ndim == 3:
+            # profiles of one length, stacked as (n,T,3) by link_injection_arrays
+            return parent_inds, powers[:,t_inds]
+        if np.ndim(t_inds) > 0:
+            powers = np.broadcast_to(powers[:,None,:], (len(components),len(t_inds),3))
+        return parent_inds, powers
+    parent_inds = []
+    powers = []
+    for obj in components:
+        value = getattr(obj, field, None)
+        if value is None:
+            continue
+        value = np.asarray(value)
+        parent_inds.append(obj.parent_node_ind)
+        if value.ndim == 2:
+            powers.append(value[t_inds])
+        elif np.ndim(t_inds) > 0:
+            powers.append(np.broadcast_to(value, (len(t_inds),3)))
+        else:
+            powers.append(value)
+    shape = (-1,3) if np.ndim(t_inds) == 0 else (-1,len(t_inds),3)
+    return np.array(parent_inds, dtype=np.int64), np.array(powers, dtype=complex).reshape(shape)
+
+def node_injections(Model, t_ind=0):
+    # net per unit power consumed at each node (n_nodes,3) by loads minus generators, without capacitors
+    s_net = np.zeros((len(Model.Nodes),3), dtype=complex)
+    for components, field, sign in [(Model.Loads, "Sload", 1), (Model.Generators, "Sgen", -1)]:
+        parent_inds, powers = component_powers(Model, components, field, t_ind)
+        np.add.at(s_net, parent_inds, sign*powers)
+    return s_net
+
+def node_injection_profiles(Model, t_inds):
+    # node_injections at every time index of t_inds, as (len(t_inds),n_nodes,3)
+    num_nodes = len(Model.Nodes)
+    num_times = len(t_inds)
+    s_net = np.zeros((num_nodes,num_times*3), dtype=complex)
+    for components, field, sign in [(Model.Loads, "Sload", 1), (Model.Generators, "Sgen", -1)]:
+        parent_inds, powers = component_powers(Model, components, field, np.asarray(t_inds))
+        if len(parent_inds) == 0:
+            continue
+        # sum the components of each node with a sparse (n_nodes,n_components) incidence matrix
+        incidence = sp.csr_matrix((np.full(len(parent_inds), sign, dtype=complex), (parent_inds, np.arange(len(parent_inds)))),
+                                  shape=(num_nodes,len(parent_inds)))
+        s_net += incidence @ powers.reshape(len(parent_inds),-1)
+    return np.ascontiguousarray(s_net.reshape(num_nodes,num_times,3).transpose(1,0,2))
+
+def num_profile_times(Model):
+    # number of time steps of the load/generation profiles (1 if every injection is constant)
+    num_times = 1
+    for components, field in [(Model.Loads, "Sload"), (Model.Generators, "Sgen")]:
+        array_name = ARRAY_FIELDS[field][0]
+        if array_name in Model.array_rows_set and Model.array_rows_set[array_name].all():
+            # every row stacked: constants (n,3) or profiles (n,T,3)
+            if Model.__dict__[array_name].ndim == 3:
+                num_times = max(num_times, Model.__dict__[array_name].shape[1])
+            continue
+        for obj in components:
+            value = getattr(obj, field, None)
+            if value is not None and np.ndim(value) == 2:
+                num_times = max(num_times, np.shape(value)[0])
+    return num_times
+
+class PowerFlowResult:
+    def __init__(self, V, I_br, I_sub, iterations, converged, max_change):
+        self.V = V # (n_nodes,3) per unit node voltages, 0 for nodes cut off by open switches
+        self.I_br = I_br # (n_branches,3) per unit branch currents (I_br of the Julia equations)
+        self.I_sub = I_sub # (n_roots,3) per unit currents sent from the SWING node(s) into the feeder
+        self.S_sub = None # (n_roots,3) per unit power sent from the SWING node(s), pb_rhs-pb_lhs at node 1 in Julia
+        self.iterations = iterations
+        self.converged = converged
+        self.max_change = max_change # largest voltage change of the last iteration
+
+    def __repr__(self):
+        return f"PowerFlowResult(converged={self.converged},iterations={self.iterations},max_change={self.max_change:.3e})"
+
+class TimeSeriesResult:
+    def __init__(self, t_inds, num_nodes):
+        num_times = len(t_inds)
+        self.t_inds = np.asarray(t_inds)
+        self.V = np.zeros((num_times,3,num_nodes), dtype=complex) # per unit node voltages per time, like Vph_out in Julia
+        self.S_sub = np.zeros((num_times,3), dtype=complex) # per unit power sent from the SWING node(s) per time
+        self.iterations = np.zeros(num_times, dtype=np.int64)
+        self.converged = np.zeros(num_times, dtype=bool)
+        self.max_change = np.zeros(num_times)
+        self.trace = None # per step convergence trace of solve_sequence (pandas DataFrame)
+
+    def __repr__(self):
+        return f"TimeSeriesResult(times={len(self.t_inds)},converged={np.count_nonzero(self.converged)},max_iterations={self.iterations.max(initial=0)})"
+
+class PowerFlowSolver:
+    # Fixed-point driver shared by the solvers. Voltages and currents of the unknown nodes (self.nodes)
+    # are (T,n,3) arrays, T being the number of time steps solved together. A solver defines factor()
+    # (factors its matrices), initial_voltages(T), update(s, V) (one iteration, s being the power
+    # consumed at self.nodes), branch_currents(s, V) (T,n_branches,3) and substation_currents(s, V)
+    # (T,n_roots,3).
+    def __getstate__(self):
+        # A solver pickles as its arrays and sparse matrices (e.g. to send it to worker processes once):
+        # the factors (SuperLU objects) can't be pickled and are recomputed on loading, and the model is
+        # left behind. Unpickled solvers take the powers explicitly (iterate, or solve with s_net).
+        state = self.__dict__.copy()
+        for key in ["Model", "topology", "lu", "backward_lu", "forward_lu"]:
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.Model = None
+        self.topology = None
+        self.factor()
+
+    def position_of(self, node_inds):
+        # positions of nodes in self.nodes, -1 for the roots and the nodes cut off by open switches
+        position = np.full(self.num_nodes, -1, dtype=np.int64)
+        position[self.nodes] = np.arange(len(self.nodes))
+        return position[node_inds]
+
+    def iterate(self, s, V, tol, max_iter):
+        # iterate all time steps together until each one has converged. Converged time steps are dropped
+        # from the later iterations.
+        num_times = V.shape[0]
+        iterations = np.zeros(num_times, dtype=np.int64)
+        converged = np.zeros(num_times, dtype=bool)
+        max_change = np.full(num_times, np.inf)
+        active = np.arange(num_times)
+        for _ in range(max_iter):
+            V_active = V[active]
+            V_new = self.update(s[active], V_active)
+            change = np.max(np.abs(V_new - V_active), axis=(1,2))
+            V[active] = V_new
+            iterations[active] += 1
+            max_change[active] = change
+            done = change < tol
+            converged[active[done]] = True
+            active = active[~done]
+            if len(active) == 0:
+                break
+        return V, iterations, converged, max_change
+
+    def solve(self, t_ind=0, s_net=None, V_init=None, tol=1e-9, max_iter=100):
+        # s_net: per unit power consumed at each node (n_nodes,3), by default from the model's loads and
+        # generators at time index t_ind. V_init: starting voltages (n_nodes,3), e.g. the previous solution.
+        if s_net is None:
+            s_net = node_injections(self.Model, t_ind)
+        V_all = np.zeros((self.num_nodes,3), dtype=complex)
+        V_all[self.roots] = self.V0
+        if len(self.nodes) == 0:
+            result = PowerFlowResult(V_all, np.zeros((self.num_branches,3), dtype=complex), np.zeros((len(self.roots),3), dtype=complex), 0, True, 0.0)
+            result.S_sub = np.zeros((len(self.roots),3), dtype=complex)
+            return result
+        V = self.initial_voltages() if V_init is None else np.asarray(V_init, dtype=complex)[None,self.nodes]
+        s = np.asarray(s_net, dtype=complex)[None,self.nodes]
+        V, iterations, converged, max_change = self.iterate(s, V, tol, max_iter)
+        V_all[self.nodes] = V[0]
+        I_sub = self.substation_currents(s, V)[0]
+        result = PowerFlowResult(V_all, self.branch_currents(s, V)[0], I_sub, int(iterations[0]), bool(converged[0]), float(max_change[0]))
+        result.S_sub = V_all[self.roots]*np.conj(I_sub)
+        return result
+
+    def solve_time_series(self, t_inds=None, tol=1e-9, max_iter=100, chunk_size=32):
+        # Solve all time steps t_inds (default: every step of the AMI profiles) together, chunk_size steps
+        # per batch: the sparse triangular solves are fastest with a few dozen right-hand sides and this
+        # bounds the working memory of a year of hours. Returns a TimeSeriesResult with V as (T,3,n_nodes)
+        # and the substation power as (T,3).
+        if t_inds is None:
+            t_inds = np.arange(num_profile_times(self.Model))
+        result = TimeSeriesResult(t_inds, self.num_nodes)
+        result.V[:,:,self.roots] = self.V0[None,:,None]
+        if len(self.nodes) == 0:
+            result.converged[:] = True
+            return result
+        for start in range(0, len(t_inds), chunk_size):
+            chunk = slice(start, min(start + chunk_size, len(t_inds)))
+            s = node_injection_profiles(self.Model, result.t_inds[chunk])[:,self.nodes]
+            V, result.iterations[chunk], result.converged[chunk], result.max_change[chunk] = self.iterate(s, self.initial_voltages(len(s)), tol, max_iter)
+            result.V[chunk][:,:,self.nodes] = V.transpose(0,2,1)
+            result.S_sub[chunk] = np.sum(self.V0*np.conj(self.substation_currents(s, V)), axis=1)
+        return result
+
+    def solve_sequence(self, t_inds=None, tol=1e-9, max_iter=100, warm_start=True, adaptive_tol=True, residuals=True, chunk_size=168):
+        # Solve the time steps t_inds one after the other (default: every step of the AMI profiles).
+        # warm_start: start each step from the previous solution instead of the no-load voltages, which is
+        #   close since consecutive hours have similar loads.
+        # adaptive_tol: stop once the estimated error of the voltages is below tol instead of the last
+        #   change. For the fixed point's linear convergence at rate r (from the last two changes) the
+        #   error is about change*r/(1-r): fast converging steps stop earlier, slow ones iterate longer.
+        # residuals: also compute the residuals of the solve_3ph_pf.jl equations at every step.
+        # Returns a TimeSeriesResult like solve_time_series with a trace (pandas DataFrame, one row per
+        # step): time index, AMI datetime, iterations, converged, last change, error estimate, residuals
+        # and wall time of the solve.
+        if t_inds is None:
+            t_inds = np.arange(num_profile_times(self.Model))
+        result = TimeSeriesResult(t_inds, self.num_nodes)
+        result.V[:,:,self.roots] = self.V0[None,:,None]
+        num_times = len(t_inds)
+        error_estimate = np.zeros(num_times)
+        ohm_residual = np.full(num_times, np.nan)
+        balance_residual = np.full(num_times, np.nan)
+        wall_time = np.zeros(num_times)
+        V_start = self.initial_voltages() if len(self.nodes) > 0 else None
+        V_previous = None
+        for start in range(0, num_times, chunk_size):
+            s_chunk = node_injection_profiles(self.Model, result.t_inds[start:start + chunk_size])
+            for step, s_net in enumerate(s_chunk, start):
+                if len(self.nodes) == 0:
+                    result.converged[step] = True
+                    continue
+                t_start = time.perf_counter()
+                s = s_net[None,self.nodes]
+                V = (V_previous if warm_start and V_previous is not None else V_start).copy()
+                change = np.inf
+                error = np.inf
+                for iteration in range(1, max_iter + 1):
+                    V_new = self.update(s, V)
+                    change, previous_change = np.max(np.abs(V_new - V)), change
+                    V = V_new
+                    rate = change/previous_change
+                    error = change*rate/(1 - rate) if adaptive_tol and 0 < rate < 1 else change
+                    if error < tol:
+                        break
+                I_sub = self.substation_currents(s, V)[0]
+                wall_time[step] = time.perf_counter() - t_start
+                result.iterations[step] = iteration
+                result.converged[step] = error < tol
+                result.max_change[step] = change
+                error_estimate[step] = error
+                result.V[step][:,self.nodes] = V[0].T
+                result.S_sub[step] = np.sum(self.V0*np.conj(I_sub), axis=0)
+                if result.converged[step]:
+                    V_previous = V
+                if residuals:
+                    ohm_residual[step], balance_residual[step] = power_flow_residuals(self.Model, result.V[step].T, self.branch_currents(s, V)[0], s_net=s_net)
+        ami_datetimes = getattr(self.Model, "ami_datetimes", None)
+        result.trace = pd.DataFrame({"t_ind": result.t_inds,
+                                     "datetime": np.asarray(ami_datetimes)[result.t_inds] if ami_datetimes is not None and len(ami_datetimes) > 0 else pd.NaT,
+                                     "iterations": result.iterations,
+                                     "converged": result.converged,
+                                     "max_change": result.max_change,
+                                     "error_estimate": error_estimate,
+                                     "ohm_residual": ohm_residual,
+                                     "balance_residual": balance_residual,
+                                     "wall_time": wall_time})
+        return result
+
+class FBSPowerFlow(PowerFlowSolver):
+    # Set up once per model and topology (matrices are factored here), then solve() for any loading, or
+    # solve_time_series() for many time steps at once. The model must have had compute_impedances() run.
+    def __init__(self, Model, V0=None):
+        self.Model = Model
+        topology = Model.topology
+        self.topology = topology
+        self.num_nodes = topology.num_nodes
+        self.num_branches = topology.num_branches
+        self.V0 = V0_REF if V0 is None else np.asarray(V0, dtype=complex)
+
+        # the sweeps need a radial feeder: every energized closed branch must be a tree branch
+        tree_branches = topology.parent_branch[topology.parent_branch >= 0]
+        if np.count_nonzero(topology.branch_closed & topology.reached[topology.from_node]) != len(tree_branches):
+            raise ValueError("The feeder has loops (closed branches outside of the tree), the sweep solver needs a radial feeder.")
+        for array_name in ["A_br", "B_br", "D_br"]:
+            if array_name not in Model.array_rows_set:
+                raise ValueError(f"The model has no {array_name}. Run compute_impedances() before solving the power flow.")
+            if not Model.array_rows_set[array_name][tree_branches].all():
+                raise ValueError(f"Some branches have no {array_name}. Run compute_impedances() before solving the power flow.")
+
+        # unknowns: energized nodes below the roots, in BFS order
+        self.nodes = topology.bfs_order[len(topology.roots):]
+        self.roots = topology.roots
+        self.position = np.full(self.num_nodes, -1, dtype=np.int64)
+        self.position[self.nodes] = np.arange(len(self.nodes))
+        parents = topology.parent_node[self.nodes]
+        self.branches = topology.parent_branch[self.nodes]
+        forward = topology.parent_branch_forward[self.nodes]
+
+        A = Model.A_br[self.branches]
+        B = Model.B_br[self.branches]
+        D = Model.D_br[self.branches].astype(complex)
+        # forward branches (parent -> node): V_n = A^-1*(V_p - B*J_n), parent current D*J_n, I_br = J_n
+        # reversed branches (node -> parent): V_n = A*V_p - B*D^-1*J_n, parent current D^-1*J_n, I_br = -D^-1*J_n
+        M1 = np.empty_like(B)
+        M2 = np.empty_like(B)
+        M3 = np.empty_like(B)
+        M4 = np.empty_like(B)
+        if np.any(forward):
+            A_inv = invert_3x3(A[forward].astype(complex))
+            M1[forward] = A_inv
+            M2[forward] = A_inv @ B[forward]
+            M3[forward] = D[forward]
+            M4[forward] = np.eye(3)
+        if np.any(~forward):
+            D_inv = invert_3x3(D[~forward])
+            M1[~forward] = A[~forward]
+            M2[~forward] = B[~forward] @ D_inv
+            M3[~forward] = D_inv
+            M4[~forward] = -D_inv
+        self.M2_T = np.ascontiguousarray(M2.transpose(0,2,1))
+        self.M4_T = np.ascontiguousarray(M4.transpose(0,2,1))
+
+        # backward sweep: J - T*J = i, T holds M3 of each node at (parent, node)
+        parent_pos = self.position[parents]
+        below_root = parent_pos >= 0
+        node_pos = np.arange(len(self.nodes))
+        eye = np.broadcast_to(np.eye(3), (len(self.nodes),3,3))
+        num_nodes = len(self.nodes)
+        backward = block_matrix(np.concatenate([node_pos, parent_pos[below_root]]), np.concatenate([node_pos, node_pos[below_root]]),
+                                np.concatenate([eye, -M3[below_root]]), num_nodes)
+        forward_matrix = block_matrix(np.concatenate([node_pos, node_pos[below_root]]), np.concatenate([node_pos, parent_pos[below_root]]),
+                                      np.concatenate([eye, -M1[below_root]]), num_nodes)
+        # the root currents are the sum of their children's parent currents
+        root_pos = np.full(self.num_nodes, -1, dtype=np.int64)
+        root_pos[self.roots] = np.arange(len(self.roots))
+        at_root = ~below_root
+        self.root_children = node_pos[at_root]
+        self.root_of_child = root_pos[parents[at_root]]
+        self.M3_T_root_children = np.ascontiguousarray(M3[at_root].transpose(0,2,1))
+        # the voltage at the roots enters the forward sweep of their children
+        self.V_root_term = np.zeros((num_nodes,3), dtype=complex)
+        self.V_root_term[at_root] = M1[at_root] @ self.V0
+        self.backward_matrix = backward
+        self.forward_matrix = forward_matrix
+        self.factor()
+
+        # capacitors below the roots: s = status.*V.*conj(Ycap.'*V). Capacitors at the roots don't change
+        # the sweeps and those cut off by open switches have no voltage.
+        capacitors = [shunt for shunt in Model.Shunts if shunt.type in ["capacitor"] and self.position[shunt.parent_node_ind] >= 0]
+        self.cap_pos = self.position[np.array([shunt.parent_node_ind for shunt in capacitors], dtype=np.int64)]
+        self.Ycap = np.array([shunt.Ycap for shunt in capacitors], dtype=complex).reshape(-1,3,3)
+        self.cap_status = np.array([[getattr(shunt, f"switch{ph}") == "CLOSED" for ph in "ABC"] for shunt in capacitors], dtype=bool).reshape(-1,3)
+
+    def factor(self):
+        if len(self.nodes) > 0:
+            self.backward_lu = splu(self.backward_matrix, permc_spec="NATURAL", diag_pivot_thresh=0.0)
+            self.forward_lu = splu(self.forward_matrix, permc_spec="NATURAL", diag_pivot_thresh=0.0)
+
+    def initial_voltages(self, num_times=1):
+        # no-load voltages: a forward sweep with zero currents (carries the transformer phase shifts)
+        return self.forward_sweep(np.zeros((num_times,len(self.nodes),3), dtype=complex))
+
+    def forward_sweep(self, J):
+        rhs = self.V_root_term - apply_blocks(self.M2_T, J)
+        return lu_solve(self.forward_lu, rhs)
+
+    def backward_sweep(self, i_inj):
+        return lu_solve(self.backward_lu, i_inj)
+
+    def injection_currents(self, s, V):
+        # currents drawn at the non-root nodes by the powers s (T,n,3) at voltages V (T,n,3), capacitors included
+        if len(self.cap_pos) > 0:
+            V_cap = V[:,self.cap_pos]
+            s = s.copy()
+            np.add.at(s, (slice(None), self.cap_pos), self.cap_status*V_cap*np.conj(apply_blocks(self.Ycap, V_cap)))
+        return np.divide(np.conj(s), np.conj(V), out=np.zeros_like(V), where=V != 0)
+
+    def update(self, s, V):
+        return self.forward_sweep(self.backward_sweep(self.injection_currents(s, V)))
+
+    def branch_currents(self, s, V):
+        J = self.backward_sweep(self.injection_currents(s, V))
+        I_br = np.zeros((V.shape[0],self.num_branches,3), dtype=complex)
+        I_br[:,self.branches] = apply_blocks(self.M4_T, J)
+        return I_br
+
+    def substation_currents(self, s, V):
+        # currents sent from the roots into their children's branches
+        J = self.backward_sweep(self.injection_currents(s, V))
+        I_sub = np.zeros((V.shape[0],len(self.roots),3), dtype=complex)
+        if len(self.root_children) > 0:
+            np.add.at(I_sub, (slice(None), self.root_of_child), apply_blocks(self.M3_T_root_children, J[:,self.root_children]))
+        return I_sub
+
+class ZBusPowerFlow(PowerFlowSolver):
+    # Current injection fixed point on the three-phase admittance matrix of the energized nodes, for
+    # radial and meshed feeders. The matrix is factored once in the setup and reused by every iteration
+    # and time step, only the load currents change. The model must have had compute_impedances() run.
+    # A closed branch draws I_br = B_br^-1*(V_from - A_br*V_to) from its to node and sends D_br*I_br into
+    # it at its from node (C_br is left out, as in solve_3ph_pf.jl). Phases without impedance (fake
+    # branches and the phases a branch doesn't have, whose rows and columns of B_br are zero) and
+    # branches with a singular B_br have no admittance: their currents are extra unknowns, with
+    # V_from - A_br*V_to - B_br*I_br = 0 as extra equations.
+    def __init__(self, Model, V0=None):
+        self.Model = Model
+        topology = Model.topology
+        self.topology = topology
+        self.num_nodes = topology.num_nodes
+        self.num_branches = topology.num_branches
+        self.V0 = V0_REF if V0 is None else np.asarray(V0, dtype=complex)
+        self.roots = topology.roots
+        is_root = np.zeros(self.num_nodes, dtype=bool)
+        is_root[self.roots] = True
+        self.nodes = np.flatnonzero(topology.reached & ~is_root)
+
+        self.branches = np.flatnonzero(topology.branch_closed & topology.reached[topology.from_node])
+        for array_name in ["A_br", "B_br", "D_br"]:
+            if array_name not in Model.array_rows_set:
+                raise ValueError(f"The model has no {array_name}. Run compute_impedances() before solving the power flow.")
+            if not Model.array_rows_set[array_name][self.branches].all():
+                raise ValueError(f"Some branches have no {array_name}. Run compute_impedances() before solving the power flow.")
+        num_branches = len(self.branches)
+        from_inds = topology.from_node[self.branches]
+        to_inds = topology.to_node[self.branches]
+        A = Model.A_br[self.branches].astype(complex)
+        B = Model.B_br[self.branches]
+        D = Model.D_br[self.branches].astype(complex)
+        singular_A = np.abs(np.linalg.det(A)) < 1e-12
+        if np.any(singular_A):
+            branch = Model.Branches[self.branches[np.argmax(singular_A)]]
+            raise ValueError(f"Branch {branch.name} has a singular A_br (e.g. a DELTA_DELTA transformer), the voltages behind it have no ground reference. Use FBSPowerFlow for this feeder.")
+
+        # admittances of the phases with impedance: invert B_br with 1 on the diagonal of the others
+        no_impedance = ~(np.any(B != 0, axis=2) | np.any(B != 0, axis=1))
+        B_fixed = B + no_impedance[:,:,None]*np.eye(3)
+        singular = np.abs(np.linalg.det(B_fixed)) <= 1e-12*np.prod(np.linalg.norm(B_fixed, axis=2), axis=1)
+        B_fixed[singular] = np.eye(3)
+        Y_br = np.linalg.inv(B_fixed)
+        has_current = ~(no_impedance | singular[:,None])
+        Y_br *= has_current[:,:,None]*has_current[:,None,:]
+
+        # branch current unknowns: one per phase without admittance
+        self.current_branch, self.current_phase = np.nonzero(~has_current)
+        num_currents = len(self.current_branch)
+        current_pos = np.full((num_branches,3), -1, dtype=np.int64)
+        current_pos[self.current_branch, self.current_phase] = np.arange(num_currents)
+
+        # Kirchhoff's current law at every node phase, Y*V + K*I = current drawn by the loads:
+        #   from node: D*Y_br*V_from - D*Y_br*A*V_to, to node: -Y_br*V_from + Y_br*A*V_to
+        #   a closed capacitor phase draws status.*(Ycap.'*V), from diag(V*V'*conj(Ycap))
+        capacitors = [shunt for shunt in Model.Shunts if shunt.type in ["capacitor"] and topology.reached[shunt.parent_node_ind]]
+        cap_inds = np.array([shunt.parent_node_ind for shunt in capacitors], dtype=np.int64)
+        cap_status = np.array([[getattr(shunt, f"switch{ph}") == "CLOSED" for ph in "ABC"] for shunt in capacitors], dtype=bool).reshape(-1,3,1)
+        Y_cap = cap_status*np.array([np.transpose(shunt.Ycap) for shunt in capacitors], dtype=complex).reshape(-1,3,3)
+        DY = D @ Y_br
+        Y = block_matrix(np.concatenate([from_inds, from_inds, to_inds, to_inds, cap_inds]),
+                         np.concatenate([from_inds, to_inds, from_inds, to_inds, cap_inds]),
+                         np.concatenate([DY, -DY @ A, -Y_br, Y_br @ A, Y_cap]), self.num_nodes)
+        num_phases = 3*self.num_nodes
+        b, k = self.current_branch, self.current_phase
+        K = sp.csr_matrix((np.concatenate([D[b,:,k].ravel(), -np.ones(num_currents)]),
+                           (np.concatenate([(3*from_inds[b,None] + np.arange(3)).ravel(), 3*to_inds[b] + k]),
+                            np.concatenate([np.repeat(np.arange(num_currents), 3), np.arange(num_currents)]))),
+                          shape=(num_phases,num_currents))
+        # V_from - A*V_to - B*I = 0 for every current unknown
+        K_V = sp.csr_matrix((np.concatenate([np.ones(num_currents), -A[b,k,:].ravel()]),
+                             (np.concatenate([np.arange(num_currents), np.repeat(np.arange(num_currents), 3)]),
+                              np.concatenate([3*from_inds[b] + k, (3*to_inds[b,None] + np.arange(3)).ravel()]))),
+                            shape=(num_currents,num_phases))
+        coupled = current_pos[b] # (num_currents,3) unknowns of the same branch
+        K_I = sp.csr_matrix((-B[b[:,None],k[:,None],np.arange(3)][coupled >= 0], (np.repeat(np.arange(num_currents), 3)[(coupled >= 0).ravel()], coupled[coupled >= 0])),
+                            shape=(num_currents,num_currents))
+        system = sp.bmat([[Y, K], [K_V, K_I]], format="csr")
+
+        unknowns = np.concatenate([(3*self.nodes[:,None] + np.arange(3)).ravel(), num_phases + np.arange(num_currents)])
+        root_phases = (3*self.roots[:,None] + np.arange(3)).ravel()
+        system = system[unknowns]
+        self.num_node_phases = 3*len(self.nodes)
+        # the swing voltages enter as -system_ur*V0
+        self.root_term = -(system[:,root_phases] @ np.tile(self.V0, len(self.roots)))
+        self.system_matrix = system[:,unknowns].tocsc()
+        self.factor()
+        self.from_inds = from_inds
+        self.to_inds = to_inds
+        self.Y_br_T = np.ascontiguousarray(Y_br.transpose(0,2,1))
+        self.YA_T = np.ascontiguousarray((Y_br @ A).transpose(0,2,1))
+        self.D_T = np.ascontiguousarray(D.transpose(0,2,1))
+
+    def factor(self):
+        if len(self.nodes) > 0:
+            try:
+                self.lu = splu(self.system_matrix)
+            except RuntimeError:
+                raise ValueError("The admittance matrix of the feeder is singular.")
+
+    def solve_system(self, I_load):
+        # voltages (T,n,3) and branch current unknowns (T,n_currents) for the load currents I_load (T,n,3)
+        num_times = I_load.shape[0]
+        rhs = np.tile(self.root_term, (num_times,1))
+        rhs[:,:self.num_node_phases] -= I_load.reshape(num_times,-1)
+        x = self.lu.solve(rhs.T).T
+        return x[:,:self.num_node_phases].reshape(I_load.shape), x[:,self.num_node_phases:]
+
+    def initial_voltages(self, num_times=1):
+        # no-load voltages (carry the transformer phase shifts)
+        V, _ = self.solve_system(np.zeros((1,len(self.nodes),3), dtype=complex))
+        return np.repeat(V, num_times, axis=0)
+
+    def load_currents(self, s, V):
+        return np.divide(np.conj(s), np.conj(V), out=np.zeros_like(V), where=V != 0)
+
+    def update(self, s, V):
+        V_new, _ = self.solve_system(self.load_currents(s, V))
+        return V_new
+
+    def branch_currents(self, s, V):
+        _, I_unknown = self.solve_system(self.load_currents(s, V))
+        V_all = np.zeros((V.shape[0],self.num_nodes,3), dtype=complex)
+        V_all[:,self.roots] = self.V0
+        V_all[:,self.nodes] = V
+        I = apply_blocks(self.Y_br_T, V_all[:,self.from_inds]) - apply_blocks(self.YA_T, V_all[:,self.to_inds])
+        I[:,self.current_branch,self.current_phase] = I_unknown
+        I_br = np.zeros((V.shape[0],self.num_branches,3), dtype=complex)
+        I_br[:,self.branches] = I
+        return I_br
+
+    def substation_currents(self, s, V):
+        # currents sent from the roots into their branches (D_br*I_br at from nodes, -I_br at to nodes)
+        I = self.branch_currents(s, V)[:,self.branches]
+        root_pos = np.full(self.num_nodes, -1, dtype=np.int64)
+        root_pos[self.roots] = np.arange(len(self.roots))
+        from_root = root_pos[self.from_inds] >= 0
+        to_root = root_pos[self.to_inds] >= 0
+        I_sub = np.zeros((V.shape[0],len(self.roots),3), dtype=complex)
+        np.add.at(I_sub, (slice(None), root_pos[self.from_inds[from_root]]), apply_blocks(self.D_T[from_root], I[:,from_root]))
+        np.add.at(I_sub, (slice(None), root_pos[self.to_inds[to_root]]), -I[:,to_root])
+        return I_sub
+
+POWER_FLOW_SOLVERS = {"fbs": FBSPowerFlow, "zbus": ZBusPowerFlow}
+
+def solve_power_flow(Model, t_ind=0, tol=1e-9, max_iter=100, method="fbs"):
+    # method: "fbs" (radial feeders) or "zbus" (also meshed ones)
+    if method not in POWER_FLOW_SOLVERS:
+        raise ValueError(f"Unknown power flow method {method}, use one of {list(POWER_FLOW_SOLVERS)}.")
+    return POWER_FLOW_SOLVERS[method](Model).solve(t_ind, tol=tol, max_iter=max_iter)
+
+def power_flow_residuals(Model, V, I_br, t_ind=0, s_net=None):
+    # Largest residuals of the equations of solve_3ph_pf.jl at (V, I_br): Ohm's law on the closed
+    # branches and the power balance at the energized nodes other than the SWING node(s)
+    topology = Model.topology
+    if s_net is None:
+        s_net = node_injections(Model, t_ind)
+    closed = np.flatnonzero(topology.branch_closed)
+    from_inds = topology.from_node[closed]
+    to_inds = topology.to_node[closed]
+    A = Model.A_br[closed]
+    B = Model.B_br[closed]
+    D = Model.D_br[closed]
+    I = I_br[closed]
+    V_from = (A @ V[to_inds][:,:,None] + B @ I[:,:,None])[:,:,0]
+    ohm_residual = V[from_inds] - V_from
+
+    s = s_net.copy()
+    capacitors = [shunt for shunt in Model.Shunts if shunt.type in ["capacitor"]]
+    for shunt in capacitors:
+        status = np.array([getattr(shunt, f"switch{ph}") == "CLOSED" for ph in "ABC"])
+        V_cap = V[shunt.parent_node_ind]
+        s[shunt.parent_node_ind] += status*np.diag(np.outer(V_cap, np.conj(V_cap)) @ np.conj(shunt.Ycap))
+    balance = np.zeros((topology.num_nodes,3), dtype=complex)
+    np.add.at(balance, from_inds, V_from*np.conj((D @ I[:,:,None])[:,:,0]))
+    np.add.at(balance, to_inds, -V[to_inds]*np.conj(I))
+    balance_residual = balance + s
+    balance_residual[topology.roots] = 0.0
+    balance_residual[~topology.reached] = 0.0
+    return np.max(np.abs(ohm_residual), initial=0.0), np.max(np.abs(balance_residual), initial=0.0)
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+
+def write_synthetic_feeder(root_dir, substation_name, impedance_dump_name, n_nodes=3000, seed=0):
+    # Writes a randomly generated radial feeder in the same layout as the CYME exports
+    # (Feeder_Data/<substation>/Input_Data/<substation>.glm and the matching impedance
+    # dump in Output_Data/) so the parsing and power flow tools can be benchmarked
+    # without access to the real feeder data.
+
+    rng = np.random.default_rng(seed)
+
+    glm_file_dir = f"{root_dir}/Feeder_Data/{substation_name}/Input_Data/"
+    glm_file = os.path.join(glm_file_dir,f"{substation_name}.glm")
+    xml_file_dir = f"{root_dir}/Feeder_Data/{substation_name}/Output_Data/"
+    xml_file = os.path.join(xml_file_dir,f"{impedance_dump_name}.xml")
+    for fdir in [glm_file_dir, xml_file_dir]:
+        if not os.path.exists(fdir):
+            os.makedirs(fdir)
+
+    Vprim = 7200.0
+    Vsec = 120.0
+    n_line_configs = 20
+
+    header = ("clock {\n\ttimezone EST+5EDT;\n\tstarttime '2024-01-01 00:00:00';\n\tstoptime '2024-01-02 00:00:00';\n}\n\n"
+              "module powerflow {\n\tsolver_method NR;\n}\n\n"
+              "module connection;\n\n")
+
+    objs = []
+    xml_lines = []
+
+    objs.append(f"object helics_msg {{\n\tname {substation_name};\n\tconfigure Feeder_Data/{substation_name}/Config_Files/{substation_name}_glm_fed_config.json;\n}}")
+
+    # line configurations (impedances provided by the impedance dump)
+    line_config_Z = []
+    for ind in range(n_line_configs):
+        r = rng.uniform(0.1,0.6)
+        x = rng.uniform(0.4,1.2)
+        Z = np.array([[complex(r,x),complex(r/3,x/3),complex(r/3,x/3)],
+                      [complex(r/3,x/3),complex(r,x),complex(r/3,x/3)],
+                      [complex(r/3,x/3),complex(r/3,x/3),complex(r,x)]])
+        line_config_Z.append(Z)
+        objs.append(f"object line_configuration {{\n\tname line_configuration{ind};\n}}")
+    # cable configuration with explicit impedances
+    z_strs = ['11','12','13','21','22','23','31','32','33']
+    z_body = "".join(f"\tz{z_str} {0.25 if z_str[0] == z_str[1] else 0.05:+.4f}{0.3 if z_str[0] == z_str[1] else 0.1:+.4f}j;\n" for z_str in z_strs)
+    objs.append(f"object line_configuration {{\n\tname cable_configuration;\n{z_body}}}")
+    objs.append("object transformer_configuration {\n\tname xfmr_config_1ph;\n\tconnect_type SINGLE_PHASE;\n\tinstall_type POLETOP;\n\tpower_rating 50.0;\n\tprimary_voltage 7200.0;\n\tsecondary_voltage 120.0;\n\tresistance 0.011;\n\treactance 0.018;\n}")
+    objs.append("object regulator_configuration {\n\tname reg_config_1;\n\tconnect_type WYE_WYE;\n\tband_center 122.0;\n\tband_width 2.0;\n\tregulation 0.1;\n\traise_taps 16;\n\tlower_taps 16;\n\tCT_phase ABC;\n\tPT_phase ABC;\n\tType B;\n\tControl OUTPUT_VOLTAGE;\n\tcontrol_level INDIVIDUAL;\n\ttap_pos_A 0;\n\ttap_pos_B 0;\n\ttap_pos_C 0;\n}")
+
+    # primary tree
+    phases = ["ABCN"]
+    objs.append(f"object node {{\n\tname node_0;\n\tphases ABCN;\n\tnominal_voltage {Vprim};\n\tbustype SWING;\n\tvoltage_A {Vprim:+.1f}+0.0j;\n\tvoltage_B -3600.0-6235.4j;\n\tvoltage_C -3600.0+6235.4j;\n}}")
+    n_lines = 0
+    last_3ph_name = "node_0"
+    for ind in range(1,n_nodes):
+        # prefer recent nodes as parents so the feeder is long rather than bushy
+        parent_ind = int(max(0, ind - 1 - rng.geometric(0.3)))
+        parent_phases = phases[parent_ind]
+        if parent_phases == "ABCN" and ind > 1 and rng.random() < 0.15:
+            node_phases = "ABC"[rng.integers(3)] + "N"
+        else:
+            node_phases = parent_phases
+        phases.append(node_phases)
+        objs.append(f"object node {{\n\tname node_{ind};\n\tphases {node_phases};\n\tnominal_voltage {Vprim};\n}}")
+
+        from_name = f"node_{parent_ind}"
+        to_name = f"node_{ind}"
+        r = rng.random()
+        if ind == 1:
+            objs.append(f"object regulator {{\n\tname regulator_0;\n\tphases {node_phases};\n\tfrom {from_name};\n\tto {to_name};\n\tconfiguration reg_config_1;\n\tsense_node {to_name};\n}}")
+        elif r < 0.85:
+            config_ind = int(rng.integers(n_line_configs))
+            length = float(rng.uniform(50,500))
+            line_name = f"overhead_line{n_lines}"
+            n_lines += 1
+            objs.append(f"object overhead_line {{\n\tname {line_name};\n\tphases {node_phases};\n\tfrom {from_name};\n\tto {to_name};\n\tlength {length:.3f};\n\tconfiguration line_configuration{config_ind};\n}}")
+            # impedance dump entry (ohms, full length)
+            b_matrix = line_config_Z[config_ind]*length/5280.0
+            b_entries = "".join(f"<b{row+1}{col+1}>{b_matrix[row,col].real:+.8f}{b_matrix[row,col].imag:+.8f}j</b{row+1}{col+1}>" for row in range(3) for col in range(3))
+            xml_lines.append(f"\t<overhead_line>\n\t\t<name>{line_name}</name>\n\t\t<from>{from_name}</from>\n\t\t<to>{to_name}</to>\n\t\t<length>{length:.3f}</length>\n\t\t<b_matrix>{b_entries}</b_matrix>\n\t</overhead_line>\n")
+        elif r < 0.90:
+            length = float(rng.uniform(50,300))
+            objs.append(f"object underground_line {{\n\tname underground_line{ind};\n\tphases {node_phases};\n\tfrom {from_name};\n\tto {to_name};\n\tlength {length:.3f};\n\tconfiguration cable_configuration;\n}}")
+        elif r < 0.95:
+            objs.append(f"object fuse {{\n\tname fuse{ind};\n\tphases {node_phases};\n\tfrom {from_name};\n\tto {to_name};\n\tcurrent_limit 100.0 A;\n\tmean_replacement_time 3600.0;\n\trepair_dist_type NONE;\n}}")
+        elif r < 0.98:
+            objs.append(f"object switch {{\n\tname switch{ind};\n\tphases {node_phases};\n\tfrom {from_name};\n\tto {to_name};\n\tstatus CLOSED;\n}}")
+        else:
+            objs.append(f"object recloser {{\n\tname recloser{ind};\n\tphases {node_phases};\n\tfrom {from_name};\n\tto {to_name};\n\tmax_number_of_tries 3;\n}}")
+
+        # service transformer, meter and load on a fraction of single-phase nodes
+        if len(node_phases) == 2 and rng.random() < 0.6:
+            ph = node_phases[0]
+            sec_name = f"node_{ind}_sec"
+            objs.append(f"object node {{\n\tname {sec_name};\n\tphases {ph}N;\n\tnominal_voltage {Vsec};\n}}")
+            objs.append(f"object transformer {{\n\tname transformer{ind};\n\tphases {ph}N;\n\tfrom {to_name};\n\tto {sec_name};\n\tconfiguration xfmr_config_1ph;\n}}")
+            meter_name = f"meter_{ind}"
+            objs.append(f"object meter {{\n\tname {meter_name};\n\tparent {sec_name};\n\tphases {ph}N;\n\tnominal_voltage {Vsec};\n}}")
+            P = rng.uniform(500,5000)
+            Q = 0.2*P
+            objs.append(f"object load {{\n\tname _{ind}_cons;\n\tparent {meter_name};\n\tphases {ph}N;\n\tnominal_voltage {Vsec};\n\tconstant_power_{ph} {P:+.2f}{Q:+.2f}j;\n}}")
+            if rng.random() < 0.1:
+                objs.append(f"object load {{\n\tname gene_{ind}_negLdGen;\n\tparent {meter_name};\n\tphases {ph}N;\n\tnominal_voltage {Vsec};\n\tconstant_power_{ph} {-0.5*P:+.2f}+0.00j;\n}}")
+
+        if node_phases == "ABCN":
+            last_3ph_name = to_name
+        if ind % 500 == 0:
+            objs.append(f"object capacitor {{\n\tname capacitor{ind};\n\tparent {last_3ph_name};\n\tphases ABCN;\n\tphases_connected ABCN;\n\tnominal_voltage {Vprim};\n\tcapacitor_A 100000.0;\n\tcapacitor_B 100000.0;\n\tcapacitor_C 100000.0;\n\tcontrol_level INDIVIDUAL;\n\tcontrol MANUAL;\n\tpt_phase ABC;\n\tswitchA CLOSED;\n\tswitchB CLOSED;\n\tswitchC CLOSED;\n}}")
+
+    objs.append(f"object recorder {{\n\tname substation_recorder;\n\tparent regulator_0;\n\tproperty power_in.real,power_in.imag;\n\tfile Feeder_Data/{substation_name}/Output_Data/substation_power.csv;\n\tinterval 3600;\n}}")
+    objs.append(f"object impedance_dump {{\n\tfilename Feeder_Data/{substation_name}/Output_Data/{impedance_dump_name}.xml;\n}}")
+
+    with open(glm_file, 'w') as file:
+        file.write(header)
+        for obj in objs:
+            file.write(obj)
+            file.write("\n\n")
+
+    with open(xml_file, 'w') as file:
+        file.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<impedance_dump>\n")
+        for xml_line in xml_lines:
+            file.write(xml_line)
+        file.write("</impedance_dump>\n")
+
+    return glm_file, xml_file
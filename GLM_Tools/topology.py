@@ -0,0 +1,127 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import breadth_first_order, depth_first_order
+
+# Array index of the feeder graph, built once from a PowerSystemModel (Model.topology). The traversals run
+# in scipy.sparse.csgraph, so nothing walks the per-node Python lists.
+#   CSR adjacency: out_ptr/out_branches (branches leaving each node), in_ptr/in_branches (entering),
+#     adj_ptr/adj_nodes/adj_branches (both directions)
+#   BFS from the SWING node(s) over closed branches (open switches are skipped):
+#     bfs_order (nodes by level), level_ptr (level l is bfs_order[level_ptr[l]:level_ptr[l+1]]), depth,
+#     parent_node, parent_branch (-1 at the roots and for nodes that can't be reached)
+#   Euler tour: the subtree of node v is euler_order[tin[v]:tout[v]]
+
+def csr_from_pairs(rows, values, num_rows):
+    # CSR arrays (ptr, values) of values grouped by row, keeping the order of values within a row
+    perm = np.argsort(rows, kind="stable")
+    ptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=ptr[1:])
+    return ptr, values[perm]
+
+class RadialTopology:
+    def __init__(self, Model):
+        self.num_nodes = len(Model.Nodes)
+        self.num_branches = len(Model.Branches)
+        self.from_node = np.array([branch.from_node_ind for branch in Model.Branches], dtype=np.int64)
+        self.to_node = np.array([branch.to_node_ind for branch in Model.Branches], dtype=np.int64)
+        self.branch_closed = np.array([not (branch.type in ["switch"] and branch.status == "OPEN") for branch in Model.Branches], dtype=bool)
+        self.roots = np.array([node.index for node in Model.Nodes if node.node_type == "SWING"], dtype=np.int64)
+        if len(self.roots) == 0:
+            raise ValueError("Could not find a SWING node to build the feeder topology from.")
+
+        branch_inds = np.arange(self.num_branches, dtype=np.int64)
+        self.out_ptr, self.out_branches = csr_from_pairs(self.from_node, branch_inds, self.num_nodes)
+        self.in_ptr, self.in_branches = csr_from_pairs(self.to_node, branch_inds, self.num_nodes)
+        self.adj_ptr, adj = csr_from_pairs(np.concatenate([self.from_node, self.to_node]),
+                                           np.concatenate([np.stack([self.to_node, branch_inds], axis=1),
+                                                           np.stack([self.from_node, branch_inds], axis=1)]), self.num_nodes)
+        self.adj_nodes = adj[:,0].copy()
+        self.adj_branches = adj[:,1].copy()
+
+        self.bfs()
+        self.euler_tour()
+
+    def tree_graph(self, parents, children):
+        # sparse graph with an extra node (num_nodes) linked to every root, so several roots are traversed
+        # as one tree
+        rows = np.concatenate([np.full(len(self.roots), self.num_nodes), parents])
+        cols = np.concatenate([self.roots, children])
+        return sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(self.num_nodes + 1, self.num_nodes + 1))
+
+    def bfs(self):
+        closed = np.flatnonzero(self.branch_closed)
+        graph = self.tree_graph(self.from_node[closed], self.to_node[closed])
+        bfs_order, predecessors = breadth_first_order(graph, self.num_nodes, directed=False, return_predecessors=True)
+        self.bfs_order = bfs_order[1:].astype(np.int64)
+        self.reached = np.zeros(self.num_nodes, dtype=bool)
+        self.reached[self.bfs_order] = True
+        self.parent_node = np.where(self.reached, predecessors[:-1], -1).astype(np.int64)
+        self.parent_node[self.roots] = -1
+
+        # parents come before their children in BFS order
+        depth = [-1]*(self.num_nodes + 1)
+        for node_ind, parent_ind in zip(self.bfs_order.tolist(), self.parent_node[self.bfs_order].tolist()):
+            depth[node_ind] = depth[parent_ind] + 1
+        self.depth = np.array(depth[:-1], dtype=np.int64)
+        self.num_levels = int(self.depth.max()) + 1
+        self.level_ptr = np.zeros(self.num_levels + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.depth[self.reached], minlength=self.num_levels), out=self.level_ptr[1:])
+
+        # branch linking each node to its parent (any one of them for parallel branches)
+        self.parent_branch = np.full(self.num_nodes, -1, dtype=np.int64)
+        for child, parent in [(self.to_node, self.from_node), (self.from_node, self.to_node)]:
+            tree_branch = self.branch_closed & (self.parent_node[child] == parent)
+            self.parent_branch[child[tree_branch]] = np.flatnonzero(tree_branch)
+        # branch from_node -> to_node points away from the root
+        self.parent_branch_forward = np.zeros(self.num_nodes, dtype=bool)
+        has_parent = self.parent_branch >= 0
+        self.parent_branch_forward[has_parent] = self.from_node[self.parent_branch[has_parent]] == self.parent_node[has_parent]
+
+    def euler_tour(self):
+        # DFS preorder of the BFS tree: every subtree is a contiguous range of it
+        children = np.flatnonzero(self.parent_node >= 0)
+        graph = self.tree_graph(self.parent_node[children], children)
+        self.euler_order = depth_first_order(graph, self.num_nodes, directed=True, return_predecessors=False)[1:].astype(np.int64)
+        self.tin = np.full(self.num_nodes, -1, dtype=np.int64)
+        self.tin[self.euler_order] = np.arange(len(self.euler_order))
+        # subtree sizes, children before parents
+        size = self.reached.astype(np.int64).tolist() + [0]
+        parent_node = self.parent_node.tolist()
+        for node_ind in self.bfs_order[::-1].tolist():
+            size[parent_node[node_ind]] += size[node_ind]
+        self.subtree_size = np.array(size[:-1], dtype=np.int64)
+        self.tout = np.where(self.reached, self.tin + self.subtree_size, -1)
+
+    def level(self, level):
+        return self.bfs_order[self.level_ptr[level]:self.level_ptr[level+1]]
+
+    def outgoing_branches(self, node_ind):
+        return self.out_branches[self.out_ptr[node_ind]:self.out_ptr[node_ind+1]]
+
+    def incoming_branches(self, node_ind):
+        return self.in_branches[self.in_ptr[node_ind]:self.in_ptr[node_ind+1]]
+
+    def subtree_nodes(self, node_ind):
+        # node_ind and everything downstream of it
+        if not self.reached[node_ind]:
+            return np.array([node_ind], dtype=np.int64)
+        return self.euler_order[self.tin[node_ind]:self.tout[node_ind]]
+
+    def subtree_branches(self, node_ind):
+        # parent branches of the nodes downstream of node_ind
+        return self.parent_branch[self.subtree_nodes(node_ind)[1:]]
+
+    def in_subtree(self, node_inds, root_ind):
+        # True for the nodes of node_inds that are in the subtree of root_ind
+        node_inds = np.asarray(node_inds)
+        return self.reached[node_inds] & (self.tin[node_inds] >= self.tin[root_ind]) & (self.tin[node_inds] < self.tout[root_ind])
+
+    def path_to_root(self, node_ind):
+        # nodes from node_ind up to its root
+        path = [node_ind]
+        while self.parent_node[path[-1]] >= 0:
+            path.append(int(self.parent_node[path[-1]]))
+        return np.array(path, dtype=np.int64)
+
+    def __repr__(self):
+        return f"RadialTopology(Nodes={self.num_nodes},Branches={self.num_branches},Levels={self.num_levels},Unreached={self.num_nodes - len(self.euler_order)})"
@@ -0,0 +1,126 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from GLM_Tools.columnar_model import phase_mask
+
+# Linearized three-phase voltage sensitivities of a radial feeder around an operating point, to screen
+# what-if changes of the loads (e.g. a load growing 20%) with a matrix product instead of a power flow each.
+# A change dS_k of the power consumed at node k changes its current by dI_k = conj(dS_k/V_k), which changes
+# the voltage of node i by -Z_common(i,k) dI_k. Z_common(i,k) is the impedance (Z_pu_3ph) of the path that
+# i and k share from the SWING node down to their common ancestor. The other loads are held at their
+# current (first order), so the error grows with the loading: small on a lightly loaded feeder, tens of
+# percent of the voltage change near the loadability limit. Per unit of power consumed:
+#   dV_i/dP_k = -Z_common(i,k)/conj(V_k), dV_i/dQ_k = -j dV_i/dP_k
+# and the magnitude sensitivities are their projections on V_i, d|V_i| = Re(conj(V_i) dV_i)/|V_i|.
+# Rows are the phases of the observed nodes, columns the phases of the injection nodes. Z_common only
+# depends on the network and is computed once. The sensitivities are cached per operating point.
+
+def node_phase_pairs(node_inds, node_phases):
+    # (node indices, phases 0-2) of every phase of the nodes node_inds
+    rows, phases = np.nonzero(node_phases[node_inds])
+    return node_inds[rows], phases
+
+class VoltageSensitivity:
+    # node_inds: observed nodes (default: every energized node). Only their rows are held, so selecting
+    #   the nodes of interest bounds the memory to (observed phases x injection phases).
+    # injection_node_inds: nodes whose load changes are screened (default: every energized node)
+    # max_cached: operating points kept, least recently used dropped first
+    def __init__(self, Model, node_inds=None, injection_node_inds=None, max_cached=4, chunk_size=64):
+        self.Model = Model
+        topology = Model.topology
+        self.topology = topology
+        self.max_cached = max_cached
+        self.chunk_size = chunk_size
+        self.cache = OrderedDict()
+        self.Z_common = None
+
+        # the path impedances only hold for branches that keep the per unit voltages and currents as is
+        energized = topology.bfs_order[len(topology.roots):]
+        tree_branches = topology.parent_branch[energized]
+        for array_name in ["Z_pu_3ph_br", "A_br", "D_br"]:
+            if array_name not in Model.array_rows_set or not Model.array_rows_set[array_name][tree_branches].all():
+                raise ValueError(f"Some branches have no {array_name}. Run compute_impedances() first.")
+        identity = np.all(np.isclose(Model.A_br[tree_branches], np.eye(3)), axis=(1,2)) & \
+                   np.all(np.isclose(Model.D_br[tree_branches], np.eye(3)), axis=(1,2))
+        if not identity.all():
+            branch = Model.Branches[tree_branches[~identity][0]]
+            raise ValueError(f"Branch {branch.name} shifts the phases of the voltages (A_br or D_br is not the identity), "
+                             "the path impedance sensitivities need wye connected transformers.")
+
+        node_phases = np.array([phase_mask(node.phases) for node in Model.Nodes], dtype=bool).reshape(-1,3)
+        node_inds = energized if node_inds is None else np.asarray(node_inds, dtype=np.int64)
+        injection_node_inds = energized if injection_node_inds is None else np.asarray(injection_node_inds, dtype=np.int64)
+        if not (topology.reached[node_inds].all() and topology.reached[injection_node_inds].all()):
+            raise ValueError("Nodes cut off by open switches have no voltage sensitivities.")
+        self.row_nodes, self.row_phases = node_phase_pairs(node_inds, node_phases)
+        self.col_nodes, self.col_phases = node_phase_pairs(injection_node_inds, node_phases)
+        self.row_lookup = np.full((len(Model.Nodes),3), -1, dtype=np.int64)
+        self.row_lookup[self.row_nodes,self.row_phases] = np.arange(len(self.row_nodes))
+        self.col_lookup = np.full((len(Model.Nodes),3), -1, dtype=np.int64)
+        self.col_lookup[self.col_nodes,self.col_phases] = np.arange(len(self.col_nodes))
+
+    def path_impedances(self):
+        # Z_common (n_rows,n_cols), by chunks of observed nodes: the impedance of every branch on the path of
+        # an observed node to its root is added to the Euler tour range of the subtree below the branch
+        topology = self.topology
+        Z_br = self.Model.Z_pu_3ph_br
+        num_tour = len(topology.euler_order)
+        col_tin = topology.tin[self.col_nodes]
+        observed = np.unique(self.row_nodes)
+        Z_common = np.zeros((len(self.row_nodes),len(self.col_nodes)), dtype=complex)
+        for start in range(0, len(observed), self.chunk_size):
+            chunk = observed[start:start + self.chunk_size]
+            chunk_rows, path_nodes = [], []
+            for chunk_row, node_ind in enumerate(chunk.tolist()):
+                path = topology.path_to_root(node_ind)[:-1]
+                chunk_rows.extend([chunk_row]*len(path))
+                path_nodes.extend(path.tolist())
+            path_nodes = np.array(path_nodes, dtype=np.int64)
+            Z = Z_br[topology.parent_branch[path_nodes]]
+            diff = np.zeros((len(chunk),num_tour + 1,3,3), dtype=complex)
+            np.add.at(diff, (chunk_rows, topology.tin[path_nodes]), Z)
+            np.add.at(diff, (chunk_rows, topology.tout[path_nodes]), -Z)
+            np.cumsum(diff, axis=1, out=diff)
+            rows = np.flatnonzero(np.isin(self.row_nodes, chunk))
+            chunk_rows = np.searchsorted(chunk, self.row_nodes[rows])
+            Z_common[rows] = diff[chunk_rows[:,None],col_tin[None,:],self.row_phases[rows][:,None],self.col_phases[None,:]]
+        return Z_common
+
+    def sensitivities(self, V):
+        # (d|V|/dP, d|V|/dQ) (n_rows,n_cols) in per unit voltage per per unit power consumed, at the operating
+        # point V (n_nodes,3), e.g. the PowerFlowResult.V of the base case
+        V = np.asarray(V, dtype=complex)
+        key = hashlib.sha256(np.ascontiguousarray(V).tobytes()).hexdigest()
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if self.Z_common is None:
+            self.Z_common = self.path_impedances()
+        V_row = V[self.row_nodes,self.row_phases]
+        V_col = V[self.col_nodes,self.col_phases]
+        # conj(V_i)/|V_i| dV_i/dP_k, whose imaginary part is the projection of dV_i/dQ_k = -j dV_i/dP_k
+        projected = (np.conj(V_row)/np.abs(V_row))[:,None]*(-self.Z_common/np.conj(V_col)[None,:])
+        result = (projected.real, projected.imag)
+        if self.max_cached > 0:
+            self.cache[key] = result
+            while len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+        return result
+
+    def column_values(self, values):
+        # per node values (n_nodes,3), e.g. a change of node_injections, or (n_cases,n_nodes,3) -> (n_cols,)
+        # or (n_cols,n_cases) in the column order
+        values = np.asarray(values)
+        if values.ndim == 3:
+            return values[:,self.col_nodes,self.col_phases].T
+        return values[self.col_nodes,self.col_phases]
+
+    def screen(self, V, dP, dQ=None):
+        # linearized voltage magnitudes of the observed node phases, (n_rows,) or (n_rows,n_cases), after the
+        # changes dP, dQ (n_cols,) or (n_cols,n_cases) of the per unit power consumed, around V
+        dV_dP, dV_dQ = self.sensitivities(V)
+        V_mag = np.abs(np.asarray(V)[self.row_nodes,self.row_phases])
+        dV = dV_dP @ np.asarray(dP, dtype=float)
+        if dQ is not None:
+            dV += dV_dQ @ np.asarray(dQ, dtype=float)
+        return (V_mag[:,None] if dV.ndim == 2 else V_mag) + dV
@@ -126,6 +126,13 @@ end
 # print(model)
 optimize!(model)
 
+## Compare results to the native forward-backward sweep solver (same equations)
+power_flow = pyimport("GLM_Tools.power_flow")
+fbs_result = power_flow.solve_power_flow(psm, t_ind-1)
+Vph_fbs = permutedims(fbs_result.V)
+println("FBS converged: $(fbs_result.converged) in $(fbs_result.iterations) iterations")
+println("Max |V_ipopt - V_fbs| (pu): ", maximum(abs.(value.(Vph) - Vph_fbs)))
+
 ## Compare results to GLD
 output_file_path = "$(root_directory)/Feeder_Data/$(substation_name)/Output_Data/"
 meter_test = "$(output_file_path)meter_voltage_mags_A.csv"
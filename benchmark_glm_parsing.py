@@ -0,0 +1,111 @@
+import GLM_Tools.parsing_tools as glm_parser
+import GLM_Tools.modif_tools as glm_modif_tools
+from GLM_Tools.synthetic_feeder import write_synthetic_feeder
+from GLM_Tools.glm_reader import iter_glm_objects
+import re
+import time
+import os
+
+root_dir = "."
+substation_name = "Synthetic_Rochester"
+impedance_dump_name = "impedancedump_1"
+
+# Synthetic Feeder Settings
+n_nodes = 3000 # primary nodes, gives roughly the same object count as Rochester (~13k objects)
+seed = 0
+
+# Benchmark Settings
+n_repeats = 5
+num_parse_workers = 1 # Number of processes used to parse GLM objects (1 = serial)
+
+#############################################################################################################
+
+class FieldSearch:
+    # Baseline for the lexer: the property lookups of the builders answered like before tokenize_glm_object,
+    # by one re.search over the object text per field read
+    def __init__(self, obj_string):
+        self.obj_string = obj_string
+
+    def get(self, key, default=None):
+        match = re.search(rf"{key}\s+([^\s][^;]*);", self.obj_string, re.S)
+        return match.group(1).rstrip() if match else default
+
+def parse_glm_object_per_field(obj_type, obj_string, config_impedance_matrices):
+    # parse_glm_object with the per-field searches of FieldSearch instead of the tokenized property dict
+    props = FieldSearch(obj_string)
+    if obj_type in ["node","meter"]:
+        return "node", glm_parser.parse_node(obj_string,props)
+    elif obj_type in ["overhead_line", "underground_line", "transformer", "fuse", "switch", "sectionalizer", "recloser", "regulator"]:
+        return "branch", glm_parser.parse_branch(obj_type,obj_string,props)
+    elif obj_type in ["load"]:
+        name = props.get("name")
+        if "negLdGen" in name or "PV" in name:
+            return "generator", glm_parser.parse_generator(obj_string,props)
+        return "load", glm_parser.parse_load(obj_string,props)
+    elif obj_type in ["capacitor"]:
+        return "shunt", glm_parser.parse_shunt(obj_type,obj_string,props)
+    elif obj_type in ["regulator_configuration", "transformer_configuration", "line_configuration"]:
+        return "config", glm_parser.parse_config(obj_type,obj_string,config_impedance_matrices,props)
+    return None, None
+
+#############################################################################################################
+
+if __name__ == "__main__":
+
+    glm_file = f"{root_dir}/Feeder_Data/{substation_name}/Input_Data/{substation_name}.glm"
+    if not os.path.isfile(glm_file):
+        write_synthetic_feeder(root_dir, substation_name, impedance_dump_name, n_nodes, seed)
+
+    # time the streaming reader
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        objs = [(glm_obj.obj_type, glm_obj.text) for glm_obj in iter_glm_objects(glm_file)]
+    t_read = (time.perf_counter() - t_start)/n_repeats
+    config_impedance_matrices = glm_modif_tools.pull_line_impedances(root_dir, substation_name, impedance_dump_name)
+
+    # time the lexer on its own
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        for obj_type, obj_string in objs:
+            glm_parser.tokenize_glm_object(obj_string)
+    t_lex = (time.perf_counter() - t_start)/n_repeats
+
+    # time lexing + building the typed components
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        for obj_type, obj_string in objs:
+            glm_parser.parse_glm_object(obj_type, obj_string, config_impedance_matrices)
+    t_objs = (time.perf_counter() - t_start)/n_repeats
+
+    # time the same with one re.search per field read (the parser before tokenize_glm_object), and check
+    # both give the same components
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        for obj_type, obj_string in objs:
+            parse_glm_object_per_field(obj_type, obj_string, config_impedance_matrices)
+    t_objs_per_field = (time.perf_counter() - t_start)/n_repeats
+    for obj_type, obj_string in objs:
+        obj_class, component = glm_parser.parse_glm_object(obj_type, obj_string, config_impedance_matrices)
+        if component is not None and repr(component) != repr(parse_glm_object_per_field(obj_type, obj_string, config_impedance_matrices)[1]):
+            raise ValueError(f"Per-field parse differs for: {obj_string}")
+
+    # time the full GLM -> pkl conversion (includes impedance dump, model setup and pickling)
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        glm_parser.parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name, num_parse_workers, use_cache=False)
+    t_parse = (time.perf_counter() - t_start)/n_repeats
+
+    # time a re-run with unchanged inputs (cache hit)
+    glm_parser.parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name, num_parse_workers)
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        glm_parser.parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name, num_parse_workers)
+    t_cached = (time.perf_counter() - t_start)/n_repeats
+
+    print(f"Objects: {len(objs)}")
+    print(f"Read all objects: {1000*t_read:.1f} ms")
+    print(f"Tokenize all objects: {1000*t_lex:.1f} ms ({1e6*t_lex/len(objs):.2f} us/object)")
+    print(f"Parse all objects: {1000*t_objs:.1f} ms ({1e6*t_objs/len(objs):.2f} us/object), "
+          f"{1000*t_objs_per_field:.1f} ms with one re.search per field read by the same builders ({t_objs_per_field/t_objs:.2f}x)")
+    print(f"parse_glm_to_pkl ({num_parse_workers} workers): {1000*t_parse:.1f} ms")
+    print(f"parse_glm_to_pkl (cached): {1000*t_cached:.2f} ms")
@@ -0,0 +1,92 @@
+import GLM_Tools.parsing_tools as glm_parser
+import GLM_Tools.power_flow as power_flow
+import GLM_Tools.parallel_power_flow as parallel_power_flow
+from GLM_Tools.synthetic_feeder import write_synthetic_feeder
+import numpy as np
+import time
+import os
+from GLM_Tools.glm_reader import load_model
+
+root_dir = "."
+substation_name = "Synthetic_Rochester"
+impedance_dump_name = "impedancedump_1"
+
+# Synthetic Feeder Settings
+n_nodes = 3000 # primary nodes, gives roughly the same object count as Rochester (~13k objects)
+seed = 0
+load_scale = 0.1 # the synthetic feeder is long and weak, at full load it has no power flow solution
+
+# Benchmark Settings
+n_repeats = 20
+n_hours = 168 # time steps of the batched solve, a week of hourly loads
+n_workers = os.cpu_count() # processes of the parallel time series
+
+#############################################################################################################
+
+if __name__ == "__main__":
+
+    glm_file = f"{root_dir}/Feeder_Data/{substation_name}/Input_Data/{substation_name}.glm"
+    if not os.path.isfile(glm_file):
+        write_synthetic_feeder(root_dir, substation_name, impedance_dump_name, n_nodes, seed)
+    pkl_file = glm_parser.parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name)
+    Model = load_model(pkl_file)
+
+    # time the solver setup (topology, sweep matrices and their factorization)
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        Model.reset_topology()
+        solver = power_flow.FBSPowerFlow(Model)
+    t_setup = (time.perf_counter() - t_start)/n_repeats
+
+    # time a snapshot solve
+    s_net = load_scale*power_flow.node_injections(Model)
+    t_start = time.perf_counter()
+    for _ in range(n_repeats):
+        result = solver.solve(s_net=s_net)
+    t_solve = (time.perf_counter() - t_start)/n_repeats
+
+    # time a week of hourly loads solved one snapshot at a time and as one batch
+    rng = np.random.default_rng(seed)
+    for load in Model.Loads:
+        load.Sload = load_scale*np.asarray(load.Sload)[None,:]*(0.5 + rng.random((n_hours,1)))
+    # restack the profiles as (n,T,3), as populate_ami_loads_pkl and load_model leave them
+    Model.link_injection_arrays()
+    t_start = time.perf_counter()
+    for t_ind in range(n_hours):
+        solver.solve(t_ind)
+    t_snapshots = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    batch = solver.solve_time_series()
+    t_batch = time.perf_counter() - t_start
+
+    # the hours one after the other, from the no-load voltages vs warm started with the adaptive tolerance
+    cold = solver.solve_sequence(warm_start=False, adaptive_tol=False, residuals=False)
+    warm = solver.solve_sequence(residuals=False)
+
+    # the batch split over a process pool
+    t_start = time.perf_counter()
+    parallel_batch = parallel_power_flow.solve_time_series_parallel(solver, num_workers=n_workers)
+    t_parallel = time.perf_counter() - t_start
+
+    # the same with the Z-bus solver: factored once, reused by every iteration and hour
+    t_start = time.perf_counter()
+    zbus_solver = power_flow.ZBusPowerFlow(Model)
+    t_zbus_setup = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    zbus_batch = zbus_solver.solve_time_series()
+    t_zbus_batch = time.perf_counter() - t_start
+    zbus_difference = np.abs(zbus_batch.V - batch.V).max()
+
+    ohm_residual, balance_residual = power_flow.power_flow_residuals(Model, result.V, result.I_br, s_net=s_net)
+    V_mag = np.abs(result.V[Model.topology.reached])
+
+    print(f"Nodes: {len(Model.Nodes)}, Branches: {len(Model.Branches)}, Levels: {Model.topology.num_levels}")
+    print(f"Solver setup: {1000*t_setup:.1f} ms")
+    print(f"Snapshot solve: {1000*t_solve:.1f} ms ({result.iterations} iterations, converged: {result.converged})")
+    print(f"Max residuals: Ohm's law {ohm_residual:.2e} pu, power balance {balance_residual:.2e} pu")
+    print(f"Voltage range: {V_mag.min():.4f} - {V_mag.max():.4f} pu")
+    print(f"{n_hours} hours: {t_snapshots:.2f} s as snapshots, {t_batch:.2f} s as one batch ({np.count_nonzero(batch.converged)} converged)")
+    print(f"{n_hours} hours on {n_workers} processes: {t_parallel:.2f} s, max voltage difference to the batch {np.abs(parallel_batch.V - batch.V).max():.1e} pu")
+    print(f"Z-bus solver: setup {1000*t_zbus_setup:.1f} ms, {n_hours} hours {t_zbus_batch:.2f} s, max voltage difference to the sweeps {zbus_difference:.1e} pu")
+    print(f"Sequential {n_hours} hours: {cold.trace.iterations.sum()} iterations ({cold.trace.wall_time.sum():.2f} s) cold started, "
+          f"{warm.trace.iterations.sum()} ({warm.trace.wall_time.sum():.2f} s) warm started with the adaptive tolerance")
@@ -1,6 +1,8 @@
 import GLM_Tools.parsing_tools as glm_parser
 import GLM_Tools.modif_tools as glm_modif_tools
+import GLM_Tools.feeder_partition as feeder_partition
 import os
+from GLM_Tools.glm_reader import load_model
 
 CYME_flag = 1
 root_dir = "C:/Users/egseg"
@@ -14,6 +16,20 @@ branches_to_remove = ["overhead_line2079"]
 #branches_to_remove = ["overhead_line216", "overhead_line1835", "overhead_line_2_158"] # test
 #branches_to_remove = ["overhead_line1648", "overhead_line_2_117"] # test_2
 
-glm_modif_tools.create_subfeeder(root_dir, substation_name, subfeeder_name, CYME_flag, start_node, branches_to_remove)
+# Automatic partitioning: instead of the cut above, split the whole feeder into n_pieces subfeeders of
+# balanced size (0 to use the cut above)
+n_pieces = 0
+partition_weight = "nodes" # "nodes" or "load" (AMI load)
+n_workers = os.cpu_count() # processes writing the subfeeders
 
+if __name__ == "__main__":
 
+    if n_pieces > 0:
+        pkl_file = f"{root_dir}/Feeder_Data/{substation_name}/Python_Model/{substation_name}_Model.pkl"
+        Model = load_model(pkl_file)
+        node_piece, pieces = feeder_partition.partition_feeder(Model, n_pieces, partition_weight)
+        print(pieces)
+        subfeeder_specs = feeder_partition.partition_subfeeder_specs(pieces, prefix=f"{subfeeder_name}_")
+        glm_modif_tools.create_subfeeders(root_dir, substation_name, subfeeder_specs, CYME_flag, Model=Model, num_workers=n_workers)
+    else:
+        glm_modif_tools.create_subfeeder(root_dir, substation_name, subfeeder_name, CYME_flag, start_node, branches_to_remove)
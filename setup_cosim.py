@@ -1,7 +1,9 @@
 import AMI_Player_Tools.setup_tools as setup_tools
 import GLM_Tools.parsing_tools as glm_parser
 import GLM_Tools.modif_tools as glm_modif_tools
+import GLM_Tools.columnar_model as columnar_model
 import os
+import getpass
 
 root_dir = "C:/Users/egseg"
 substation_name = "Rochester_1"
@@ -16,11 +18,23 @@ mysql_query_start_time = "2024-01-01 00:00:00"
 mysql_query_end_time = "2025-01-01 00:00:00"
 max_meters_per_query = 2000 # Set this to avoid massive queries that time out. This will break up into multiple queries.
 
+# AMI Database Fetch Settings: run the queries above directly (max_meters_per_query meters per query, several at
+# a time) and parse the reads as they arrive, instead of writing the MySQL query files and re-running this script
+fetch_ami_data_flag = False
+ami_db_module = "pymysql" # Any DB-API module (e.g. "sqlite3" with {"database": "file.db"})
+ami_db_connect_kwargs = {"user": "UVM"} # connect() arguments; for pymysql the host and password are asked for when run
+num_ami_db_connections = 4 # Number of queries run at a time
+
 # AMI Data Parsing Settings
 parse_ami_data_flag = False
+chunked_ami_parsing = False # Parse the exports in bounded memory and compute the true load in the same pass
+num_ami_workers = 1 # Number of processes used by the chunked AMI parsing (1 = serial)
 
 # Parse GLM Settings
 parse_glm_flag = True
+num_parse_workers = 1 # Number of processes used to parse GLM objects (1 = serial)
+use_glm_cache = True # Reuse the existing pkl if the GLM, impedance dump and parser version are unchanged
+export_columnar_model_flag = False # Also save the model as memory-mappable .npy arrays (Python_Model/<substation>_Model_Columnar)
 
 # Create Simulation Settings
 create_new_sim_flag = False
@@ -39,44 +53,62 @@ CYME_flag = True
 
 #############################################################################################################
 
-if build_meter_dicts_flag:
-    setup_tools.get_meter_numbers(substation_name)
-
-if generate_MySQL_query_flag:
-    setup_tools.query_writer(substation_name, mysql_query_start_time, mysql_query_end_time, max_meters_per_query)
-    print("Please perform MySQL queries and add AMI data to the proper folder. Set generate_MySQL_query_flag to False and re-run this script to continue.")
-    exit()
-
-if parse_ami_data_flag:
-    setup_tools.parse_ami_data(substation_name, "Load")
-    setup_tools.parse_ami_data(substation_name, "Gen")
-    setup_tools.calculate_true_load(substation_name)
-
-if parse_glm_flag:
-    glm_parser.parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name)
-
-if create_new_sim_flag:
-    # make sure the appropriate Output_Data folder exists
-    sim_output_dir = f"Feeder_Data/{substation_name}/Output_Data"
-    if not os.path.exists(sim_output_dir):
-        os.makedirs(sim_output_dir)
-    # modify glm clock to correct datetimes and build new runner files
-    glm_modif_tools.modify_glm_clock(substation_name, sim_start_time, sim_end_time)
-    # modify regulators (if desired)
-    if not (regulator_control == "DEFAULT"):
-        glm_modif_tools.modify_reg_controls(substation_name,regulator_control)
-    # set up HELICS runner files
-    setup_tools.find_diff_GIS_GLM(substation_name)
-    setup_tools.create_runner_files(substation_name, sim_start_time, sim_end_time, ami_load_fixed_pf, include_hc)
-    print(f"Co-simulation runner files have been created. To run the co-simulation, copy and paste the following command into the command line:")
-    print(f"helics run --path Runner_Files/{substation_name}/{substation_name}_cosim_runner.json")
-
-if add_ami_to_pkl_flag:
-    glm_parser.populate_ami_loads_pkl(substation_name, sim_start_time, sim_end_time, ami_load_fixed_pf)
-
-if add_coords_to_pkl_flag:    
-    glm_parser.add_coords_to_pkl(root_dir,substation_name)
-    if CYME_flag == 1:
-        glm_parser.plot_CYME_feeder(root_dir,substation_name)
-    else:
-        glm_parser.plot_feeder(substation_name)
+if __name__ == "__main__": # required for the process pools used by the parsers on Windows
+
+    if build_meter_dicts_flag:
+        setup_tools.get_meter_numbers(substation_name)
+
+    if generate_MySQL_query_flag:
+        setup_tools.query_writer(substation_name, mysql_query_start_time, mysql_query_end_time, max_meters_per_query)
+        print("Please perform MySQL queries and add AMI data to the proper folder. Set generate_MySQL_query_flag to False and re-run this script to continue.")
+        exit()
+
+    if fetch_ami_data_flag:
+        connect_kwargs = dict(ami_db_connect_kwargs)
+        if ami_db_module == "pymysql":
+            if "host" not in connect_kwargs:
+                connect_kwargs["host"] = input("Please enter VEC MySQL server address (XX.XX.X.XXX): ")
+            if "password" not in connect_kwargs:
+                connect_kwargs["password"] = getpass.getpass("MySQL password: ")
+        fetcher = setup_tools.AMIFetcher(ami_db_module, connect_kwargs, mysql_query_start_time, mysql_query_end_time,
+                                         max_meters_per_query, num_ami_db_connections)
+        setup_tools.parse_true_ami_data_chunked(substation_name, num_workers=num_ami_workers, fetcher=fetcher)
+    elif parse_ami_data_flag:
+        if chunked_ami_parsing:
+            setup_tools.parse_true_ami_data_chunked(substation_name, num_workers=num_ami_workers)
+        else:
+            setup_tools.parse_ami_data(substation_name, "Load")
+            setup_tools.parse_ami_data(substation_name, "Gen")
+            setup_tools.calculate_true_load(substation_name)
+
+    if parse_glm_flag:
+        glm_parser.parse_glm_to_pkl(root_dir, substation_name, impedance_dump_name, num_parse_workers, use_glm_cache)
+
+    if export_columnar_model_flag:
+        columnar_model.export_pkl_to_columnar(root_dir, substation_name)
+
+    if create_new_sim_flag:
+        # make sure the appropriate Output_Data folder exists
+        sim_output_dir = f"Feeder_Data/{substation_name}/Output_Data"
+        if not os.path.exists(sim_output_dir):
+            os.makedirs(sim_output_dir)
+        # modify glm clock to correct datetimes and build new runner files
+        glm_modif_tools.modify_glm_clock(substation_name, sim_start_time, sim_end_time)
+        # modify regulators (if desired)
+        if not (regulator_control == "DEFAULT"):
+            glm_modif_tools.modify_reg_controls(substation_name,regulator_control)
+        # set up HELICS runner files
+        setup_tools.find_diff_GIS_GLM(substation_name)
+        setup_tools.create_runner_files(substation_name, sim_start_time, sim_end_time, ami_load_fixed_pf, include_hc)
+        print(f"Co-simulation runner files have been created. To run the co-simulation, copy and paste the following command into the command line:")
+        print(f"helics run --path Runner_Files/{substation_name}/{substation_name}_cosim_runner.json")
+
+    if add_ami_to_pkl_flag:
+        glm_parser.populate_ami_loads_pkl(substation_name, sim_start_time, sim_end_time, ami_load_fixed_pf)
+
+    if add_coords_to_pkl_flag:    
+        glm_parser.add_coords_to_pkl(root_dir,substation_name)
+        if CYME_flag == 1:
+            glm_parser.plot_CYME_feeder(root_dir,substation_name)
+        else:
+            glm_parser.plot_feeder(substation_name)
@@ -0,0 +1,70 @@
+import io
+import pickle
+import contextlib
+import numpy as np
+import pandas as pd
+import pytest
+import GLM_Tools.parsing_tools as glm_parser
+from GLM_Tools.synthetic_feeder import write_synthetic_feeder
+
+N_HOURS = 24
+
+@pytest.fixture(scope="session")
+def synthetic_pkl(tmp_path_factory):
+    # pkl of a small synthetic feeder, parsed once for the whole session
+    root_dir = str(tmp_path_factory.mktemp("feeder"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_synthetic_feeder(root_dir, "Synth", "Synth_imp", n_nodes=200, seed=0)
+        return glm_parser.parse_glm_to_pkl(root_dir, "Synth", "Synth_imp")
+
+def set_profiles(Model, load_scale=0.1, seed=0):
+    # give every load an hourly (N_HOURS,3) profile around its constant power, like populate_ami_loads_pkl,
+    # and restack them on the model. Returns the profiles (n_loads,N_HOURS,3).
+    rng = np.random.default_rng(seed)
+    profiles = load_scale*np.array([load.Sload for load in Model.Loads])[:,None,:]*(0.5 + rng.random((len(Model.Loads),N_HOURS,1)))
+    for load, profile in zip(Model.Loads, profiles):
+        load.Sload = profile
+    Model.link_injection_arrays()
+    return profiles
+
+def profile_injections(Model, profiles, t_ind):
+    # node_injections computed by hand from the load profiles and the constant generators
+    s_net = np.zeros((len(Model.Nodes),3), dtype=complex)
+    np.add.at(s_net, [load.parent_node_ind for load in Model.Loads], profiles[:,t_ind])
+    np.add.at(s_net, [gen.parent_node_ind for gen in Model.Generators], -np.array([gen.Sgen for gen in Model.Generators]).reshape(-1,3))
+    return s_net
+
+def save_model(Model, root_dir):
+    # pickle a model into a Feeder_Data tree under root_dir, like populate_ami_loads_pkl, and return the pkl
+    pkl_file = root_dir/"Feeder_Data"/"Synth"/"Python_Model"/"Synth_Model.pkl"
+    pkl_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(pkl_file, 'wb') as file:
+        pickle.dump(Model, file)
+    return str(pkl_file)
+
+def write_ami_exports(root_dir, substation_name, num_meters=30, num_days=2, num_files=3, duplicates=0, seed=0):
+    # AMI exports (Feeder_Data/<substation>/AMI_Data/<substation>_<Load|Gen>_AMI_Data_<n>.txt) of 15 minute
+    # reads, shuffled across num_files files, and the meter number files. duplicates: reads repeated with
+    # another value in another file. Returns {"Load": meter numbers, "Gen": meter numbers}.
+    rng = np.random.default_rng(seed)
+    ami_dir = root_dir/"Feeder_Data"/substation_name/"AMI_Data"
+    ami_dir.mkdir(parents=True, exist_ok=True)
+    times = pd.date_range("2024-01-01", periods=96*num_days, freq="15min").strftime("%Y-%m-%dT%H:%M:%S.000000")
+    meters = {}
+    for ami_type, first_meter in [("Load", 100000000), ("Gen", 200000000)]:
+        meters[ami_type] = (first_meter + rng.choice(10**8, num_meters, replace=False)).tolist()
+        reads = pd.DataFrame({"asset_id": np.repeat(meters[ami_type], len(times)), "start_date_time": np.tile(times, num_meters)})
+        reads["value"] = np.round(rng.random(len(reads)), 3)
+        repeated = reads.sample(duplicates, random_state=seed).assign(value=lambda df: np.round(df["value"] + 1 + rng.random(len(df)), 3))
+        file_inds = rng.integers(num_files, size=len(reads))
+        repeated_inds = rng.integers(num_files, size=len(repeated))
+        for file_ind in range(num_files):
+            export = pd.concat([reads[file_inds == file_ind], repeated[repeated_inds == file_ind]]).sample(frac=1, random_state=file_ind)
+            export.insert(0, "id", np.arange(len(export)))
+            export.insert(3, "end_date_time", "x")
+            export.to_csv(ami_dir/f"{substation_name}_{ami_type}_AMI_Data_{file_ind + 1}.txt", sep="\t", index=False)
+    pd.DataFrame({"Meter Number": meters["Load"], "Has Separate Gen Meter": "N", "Gen Meter": np.nan}).to_csv(
+        root_dir/"Feeder_Data"/substation_name/"meter_number_data.csv", index=False)
+    pd.DataFrame({"Meter Number": meters["Gen"], "Net Meter Switched": np.where(np.arange(num_meters) % 3 == 0, "Y", "N")}).to_csv(
+        root_dir/"Feeder_Data"/substation_name/"gen_meter_number_data.csv", index=False)
+    return meters
@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+import pandas as pd
+import pytest
+from AMI_Player_Tools import setup_tools
+from conftest import write_ami_exports
+
+class RecordingConnection:
+    # sqlite3 connection that records the threads that open and close it
+    def __init__(self, conn):
+        self.conn = conn
+        self.thread = threading.get_ident()
+        self.close_thread = None
+
+    def cursor(self):
+        return self.conn.cursor()
+
+    def close(self):
+        self.close_thread = threading.get_ident()
+        self.conn.close()
+
+class RecordingSqlite:
+    # DB-API module wrapping sqlite3 that keeps every connection it opens
+    paramstyle = sqlite3.paramstyle
+
+    def __init__(self):
+        self.connections = []
+
+    def connect(self, **kwargs):
+        conn = RecordingConnection(sqlite3.connect(**kwargs))
+        self.connections.append(conn)
+        return conn
+
+@pytest.fixture
+def ami_database(tmp_path, monkeypatch):
+    # exports of substation S and the same reads in an in-memory database shared by the connections of the
+    # process, kept alive while the test runs
+    monkeypatch.chdir(tmp_path)
+    write_ami_exports(tmp_path, "S")
+    database = {"database": f"file:ami_{id(tmp_path)}?mode=memory&cache=shared", "uri": True}
+    conn = sqlite3.connect(**database)
+    for file_path in sorted((tmp_path/"Feeder_Data"/"S"/"AMI_Data").glob("S_Load_AMI_Data_*.txt")):
+        pd.read_csv(file_path, sep="\t")[setup_tools.AMI_COLUMNS].to_sql("meter_reads_interval", conn, if_exists="append", index=False)
+    yield database
+    conn.close()
+
+def read_output(ami_type):
+    with open(f"Feeder_Data/S/AMI_Data/S_{ami_type}_AMI_Data.csv") as file:
+        return file.read()
+
+def test_fetch_matches_exports(ami_database):
+    setup_tools.parse_ami_data("S", "Load", chunked=True)
+    expected = read_output("Load")
+
+    db_module = RecordingSqlite()
+    fetcher = setup_tools.AMIFetcher(db_module, ami_database, "2024-01-01 00:00:00", "2025-01-01 00:00:00", max_k=7,
+                                     num_connections=3, table="meter_reads_interval")
+    setup_tools.parse_ami_data("S", "Load", fetcher=fetcher)
+    assert read_output("Load") == expected
+
+    # 5 queries on at most one connection per thread, each closed by the thread that opened it
+    assert 1 <= len(db_module.connections) <= 3
+    assert len({conn.thread for conn in db_module.connections}) == len(db_module.connections)
+    assert all(conn.close_thread == conn.thread for conn in db_module.connections)
+
+def test_failed_query_closes_connection(ami_database):
+    db_module = RecordingSqlite()
+    fetcher = setup_tools.AMIFetcher(db_module, ami_database, "2024-01-01 00:00:00", "2025-01-01 00:00:00", max_k=7,
+                                     num_connections=3, table="missing_table")
+    with pytest.raises(sqlite3.OperationalError):
+        setup_tools.parse_ami_data("S", "Load", fetcher=fetcher)
+    assert len(db_module.connections) >= 1
+    assert all(conn.close_thread == conn.thread for conn in db_module.connections)
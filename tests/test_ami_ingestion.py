@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+from AMI_Player_Tools import setup_tools
+from conftest import write_ami_exports
+
+def read_output(ami_type):
+    return pd.read_csv(f"Feeder_Data/S/AMI_Data/S_{ami_type}_AMI_Data.csv")
+
+@pytest.mark.parametrize("ami_type", ["Load", "Gen"])
+def test_chunked_matches_legacy(tmp_path, monkeypatch, ami_type):
+    # reads repeated across the exports keep the same first read in both modes (the chunked mode holds the
+    # reads as float32, hence the tolerance)
+    monkeypatch.chdir(tmp_path)
+    write_ami_exports(tmp_path, "S", num_files=4, duplicates=200)
+    setup_tools.parse_ami_data("S", ami_type)
+    legacy = read_output(ami_type)
+    setup_tools.parse_ami_data("S", ami_type, chunked=True, chunk_rows=500, partition_freq="1D")
+    pd.testing.assert_frame_equal(read_output(ami_type), legacy, check_exact=False, rtol=0, atol=1e-5)
@@ -0,0 +1,17 @@
+import pandas as pd
+from GLM_Tools.glm_reader import load_model
+from GLM_Tools.hosting_capacity import hosting_capacity
+from conftest import N_HOURS, set_profiles, profile_injections, save_model
+
+def test_reloaded_profiles_hosting_capacity(synthetic_pkl, tmp_path):
+    # base case from the AMI profiles of a reloaded model (Sload stacked as (n,T,3))
+    Model = load_model(synthetic_pkl)
+    profiles = set_profiles(Model)
+    Model = load_model(save_model(Model, tmp_path))
+    assert Model.Sload.shape == (len(Model.Loads),N_HOURS,3)
+
+    node_names = [node.name for node in Model.Nodes[1:40]]
+    table = hosting_capacity(Model, node_names=node_names, t_ind=7, max_kw=50000.0, resolution_kw=50.0)
+    expected = hosting_capacity(Model, node_names=node_names, s_net=profile_injections(Model, profiles, 7), max_kw=50000.0, resolution_kw=50.0)
+    assert (table.limit == "voltage").any() and (table.limit == "thermal").any()
+    pd.testing.assert_frame_equal(table, expected)
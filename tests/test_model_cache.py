@@ -0,0 +1,28 @@
+import io
+import pickle
+import contextlib
+import GLM_Tools.parsing_tools as glm_parser
+from GLM_Tools.glm_reader import load_model
+from GLM_Tools.synthetic_feeder import write_synthetic_feeder
+
+def parse(root_dir):
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        pkl_file = glm_parser.parse_glm_to_pkl(root_dir, "Synth", "Synth_imp")
+    return pkl_file, "Using cached Python model" in output.getvalue()
+
+def test_cache_hit_only_for_the_parsed_pkl(tmp_path):
+    root_dir = str(tmp_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_synthetic_feeder(root_dir, "Synth", "Synth_imp", n_nodes=50, seed=0)
+    pkl_file, cached = parse(root_dir)
+    assert not cached
+    assert parse(root_dir)[1]
+
+    # a pkl rewritten outside the parser (e.g. with AMI profiles or coordinates) is parsed again
+    Model = load_model(pkl_file)
+    Model.Loads[0].Sload = 2*Model.Loads[0].Sload
+    with open(pkl_file, 'wb') as file:
+        pickle.dump(Model, file)
+    assert not parse(root_dir)[1]
+    assert parse(root_dir)[1]
+
@@ -0,0 +1,20 @@
+import numpy as np
+import GLM_Tools.modif_tools as glm_modif_tools
+from GLM_Tools.glm_reader import load_model
+
+def test_set_switch_status_updates_topology_only(synthetic_pkl):
+    Model = load_model(synthetic_pkl)
+    switch = next(branch for branch in Model.Branches if branch.type == "switch")
+    A_br = Model.A_br.copy()
+    B_br = Model.B_br.copy()
+    assert Model.topology.reached[switch.to_node_ind]
+
+    glm_modif_tools.set_switch_status(Model, switch.name, "OPEN")
+    assert "status OPEN;" in switch.glm_string
+    assert not Model.topology.branch_closed[switch.index]
+    assert not Model.topology.reached[switch.to_node_ind]
+    np.testing.assert_array_equal(Model.A_br, A_br)
+    np.testing.assert_array_equal(Model.B_br, B_br)
+
+    glm_modif_tools.set_switch_status(Model, switch.name, "CLOSED")
+    assert Model.topology.reached[switch.to_node_ind]
@@ -0,0 +1,17 @@
+import numpy as np
+import GLM_Tools.power_flow as power_flow
+import GLM_Tools.parallel_power_flow as parallel_power_flow
+from GLM_Tools.glm_reader import load_model
+from conftest import N_HOURS, set_profiles
+
+def test_stacked_profiles_parallel(synthetic_pkl):
+    Model = load_model(synthetic_pkl)
+    set_profiles(Model)
+    assert Model.Sload.shape == (len(Model.Loads),N_HOURS,3)
+    solver = power_flow.FBSPowerFlow(Model)
+    expected = solver.solve_time_series()
+    for num_workers in [1, 2]:
+        result = parallel_power_flow.solve_time_series_parallel(solver, num_workers=num_workers, batch_size=8)
+        assert len(result.t_inds) == N_HOURS and result.converged.all()
+        np.testing.assert_allclose(result.V, expected.V, atol=1e-10)
+        np.testing.assert_allclose(result.S_sub, expected.S_sub, atol=1e-10)
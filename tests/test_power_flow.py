@@ -0,0 +1,53 @@
+import pickle
+import numpy as np
+import GLM_Tools.power_flow as power_flow
+from GLM_Tools.glm_reader import load_model
+from conftest import N_HOURS, set_profiles, profile_injections, save_model
+
+def test_stacked_profiles_solve(synthetic_pkl):
+    # every load holds a profile, so link_injection_arrays stacks Sload as (n,T,3)
+    Model = load_model(synthetic_pkl)
+    profiles = set_profiles(Model)
+    assert Model.Sload.shape == (len(Model.Loads),N_HOURS,3)
+    assert power_flow.num_profile_times(Model) == N_HOURS
+    np.testing.assert_allclose(power_flow.node_injections(Model, 5), profile_injections(Model, profiles, 5))
+    np.testing.assert_allclose(power_flow.node_injection_profiles(Model, [2,7])[1], profile_injections(Model, profiles, 7))
+
+    solver = power_flow.FBSPowerFlow(Model)
+    snapshot = solver.solve(5)
+    expected = solver.solve(s_net=profile_injections(Model, profiles, 5))
+    assert snapshot.converged
+    np.testing.assert_allclose(snapshot.V, expected.V)
+
+    series = solver.solve_time_series()
+    assert len(series.t_inds) == N_HOURS and series.converged.all()
+    np.testing.assert_allclose(series.V[5], snapshot.V.T, atol=1e-8)
+
+def test_profiled_pkl_solve_power_flow(synthetic_pkl, tmp_path):
+    # the check of Opt_Tools/solve_3ph_pf.jl: a pkl with AMI profiles, loaded with pickle.load, solved at one
+    # time index by both native solvers
+    Model = load_model(synthetic_pkl)
+    profiles = set_profiles(Model)
+    with open(save_model(Model, tmp_path), 'rb') as file:
+        Model = pickle.load(file)
+    for method in power_flow.POWER_FLOW_SOLVERS:
+        result = power_flow.solve_power_flow(Model, 3, method=method)
+        assert result.converged
+        ohm_residual, balance_residual = power_flow.power_flow_residuals(Model, result.V, result.I_br, t_ind=3)
+        assert ohm_residual < 1e-8 and balance_residual < 1e-8
+        np.testing.assert_allclose(power_flow.node_injections(Model, 3), profile_injections(Model, profiles, 3))
+
+def test_reloaded_profiles_solve_sequence(synthetic_pkl, tmp_path):
+    # a pkl saved with profiles, as populate_ami_loads_pkl leaves it, is restacked by load_model
+    Model = load_model(synthetic_pkl)
+    profiles = set_profiles(Model)
+    Model = load_model(save_model(Model, tmp_path))
+    assert Model.Sload.shape == (len(Model.Loads),N_HOURS,3)
+
+    solver = power_flow.FBSPowerFlow(Model)
+    for warm_start in [False, True]:
+        sequence = solver.solve_sequence(warm_start=warm_start)
+        assert len(sequence.t_inds) == N_HOURS and len(sequence.trace) == N_HOURS and sequence.converged.all()
+        for t_ind in [0, N_HOURS - 1]:
+            expected = solver.solve(s_net=profile_injections(Model, profiles, t_ind))
+            np.testing.assert_allclose(sequence.V[t_ind], expected.V.T, atol=1e-8)